@@ -3,7 +3,6 @@
 Script to add module-specific permissions to the database
 """
 
-import sqlite3
 from user_management_db import UserManagementDB
 
 def add_module_permissions():
@@ -67,32 +66,20 @@ def add_module_permissions():
         ]
     }
     
-    conn = sqlite3.connect(db.db_path, check_same_thread=False)
-    cursor = conn.cursor()
-    
     try:
-        # Add all module permissions
+        # Add all module permissions through the database layer, which also drops its compiled permission bits
         for module, permissions in module_permissions.items():
             for perm_name, module_name, description in permissions:
-                # Check if permission already exists
-                cursor.execute("SELECT id FROM permissions WHERE name = ?", (perm_name,))
-                if not cursor.fetchone():
-                    cursor.execute('''
-                        INSERT INTO permissions (name, module, description)
-                        VALUES (?, ?, ?)
-                    ''', (perm_name, module_name, description))
+                try:
+                    db.create_permission(perm_name, module_name, description)
                     print(f"Added permission: {perm_name}")
-                else:
+                except ValueError:
                     print(f"Permission already exists: {perm_name}")
         
-        conn.commit()
         print("✅ All module permissions added successfully!")
         
     except Exception as e:
         print(f"❌ Error adding permissions: {e}")
-        conn.rollback()
-    finally:
-        conn.close()
 
 if __name__ == "__main__":
     add_module_permissions()
@@ -15,6 +15,7 @@ import random
 
 from sqlite_auth import db_auth
 from faq_database import faq_db
+from faq_transition_model import faq_transition_model
 
 router = APIRouter()
 security = HTTPBearer()
@@ -303,6 +304,7 @@ async def update_faq(faq_id: str, faq_data: dict):
         updated_faq = faq_db.update_faq(faq_id, **updates)
         
         if updated_faq:
+            faq_transition_model.invalidate_faq(faq_id)
             return {"message": "FAQ updated successfully", "faq": updated_faq}
         else:
             raise HTTPException(status_code=404, detail="FAQ not found")
@@ -314,6 +316,7 @@ async def delete_faq(faq_id: str):
     """Delete an FAQ from database (soft delete)"""
     try:
         if faq_db.delete_faq(faq_id):
+            faq_transition_model.invalidate_faq(faq_id)
             return {"message": "FAQ deleted successfully"}
         else:
             raise HTTPException(status_code=404, detail="FAQ not found")
@@ -325,6 +328,7 @@ async def hard_delete_faq(faq_id: str):
     """Permanently delete an FAQ from database (hard delete)"""
     try:
         if faq_db.hard_delete_faq(faq_id):
+            faq_transition_model.invalidate_faq(faq_id)
             return {"message": "FAQ permanently deleted successfully"}
         else:
             raise HTTPException(status_code=404, detail="FAQ not found")
@@ -0,0 +1,81 @@
+"""
+Support Agent Directory
+Small in-memory cache of agent display names, filled with batched lookups through the user repository
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+DIRECTORY_TTL_SECONDS = 300
+MAX_DIRECTORY_ENTRIES = 2000
+
+
+class AgentDirectory:
+    """Agent ID -> display name, refreshed after a TTL and invalidated when a user changes"""
+
+    def __init__(self, ttl: float = DIRECTORY_TTL_SECONDS, max_entries: int = MAX_DIRECTORY_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries: Dict[int, Tuple[float, Optional[str]]] = {}  # agent_id -> (fetched_at, name)
+        self.lock = threading.Lock()
+
+    def get_names(self, agent_ids: Iterable) -> Dict[int, Optional[str]]:
+        """Get display names for agent IDs; None for agents that don't exist"""
+        ids = set()
+        for agent_id in agent_ids:
+            try:
+                ids.add(int(agent_id))
+            except (TypeError, ValueError):
+                continue
+
+        now = time.time()
+        names: Dict[int, Optional[str]] = {}
+        with self.lock:
+            for agent_id in ids:
+                entry = self.entries.get(agent_id)
+                if entry and now - entry[0] < self.ttl:
+                    names[agent_id] = entry[1]
+
+        missing = ids - names.keys()
+        if missing:
+            fetched = self._fetch(missing)
+            with self.lock:
+                if len(self.entries) + len(missing) > self.max_entries:
+                    self.entries.clear()
+                for agent_id in missing:
+                    names[agent_id] = fetched.get(agent_id)
+                    self.entries[agent_id] = (now, names[agent_id])
+        return names
+
+    def get_name(self, agent_id) -> Optional[str]:
+        return next(iter(self.get_names([agent_id]).values()), None)
+
+    def invalidate(self, agent_id=None):
+        """Forget one agent after their profile changes, or everyone"""
+        with self.lock:
+            if agent_id is None:
+                self.entries.clear()
+            else:
+                try:
+                    self.entries.pop(int(agent_id), None)
+                except (TypeError, ValueError):
+                    pass
+
+    def _fetch(self, agent_ids) -> Dict[int, str]:
+        try:
+            from user_repository import user_repository
+            users = user_repository.get_users_by_ids(agent_ids)
+        except Exception as e:
+            print(f"Error loading agent names: {e}")
+            return {}
+        return {
+            user_id: user.get("full_name") or user.get("username")
+            for user_id, user in users.items()
+        }
+
+
+# Global agent directory
+agent_directory = AgentDirectory()
@@ -7,9 +7,13 @@ import asyncio
 import json
 import random
 import time
-import sqlite3
 from datetime import datetime, timedelta
 from fastapi.responses import StreamingResponse
+from db_executor import run_db
+from sqlite_pool import connect_db
+from chat_queries import (
+    AVG_SESSION_DURATION_SQL, FEEDBACK_TODAY_SQL, LIVE_USERS_SQL, MESSAGES_TODAY_SQL, POSITIVE_FEEDBACK_TODAY_SQL,
+)
 
 # Global analytics data
 analytics_data = {
@@ -26,45 +30,27 @@ def get_real_analytics_data():
     """Get real analytics data from database"""
     try:
         # Connect to main database
-        conn = sqlite3.connect('venturing.db')
+        conn = connect_db('venturing.db', readonly=True)
         cursor = conn.cursor()
         
         # Get live users from chat_sessions (active in last 5 minutes)
-        cursor.execute("""
-            SELECT COUNT(DISTINCT user_id) FROM chat_sessions 
-            WHERE started_at > datetime('now', '-5 minutes')
-        """)
+        cursor.execute(LIVE_USERS_SQL)
         live_users = cursor.fetchone()[0] or 0
         
         # Get messages today from chat_messages
-        cursor.execute("""
-            SELECT COUNT(*) FROM chat_messages 
-            WHERE date(created_at) = date('now')
-        """)
+        cursor.execute(MESSAGES_TODAY_SQL)
         messages_today = cursor.fetchone()[0] or 0
         
         # Get average response time from chat_sessions
-        cursor.execute("""
-            SELECT AVG(
-                (julianday(ended_at) - julianday(started_at)) * 24 * 60 * 60 * 1000
-            ) FROM chat_sessions 
-            WHERE ended_at IS NOT NULL 
-            AND started_at > datetime('now', '-1 day')
-        """)
+        cursor.execute(AVG_SESSION_DURATION_SQL)
         avg_response_time = cursor.fetchone()[0] or 200
         avg_response_time = max(200, int(avg_response_time))
         
         # Get conversion rate from chat_feedback
-        cursor.execute("""
-            SELECT COUNT(*) FROM chat_feedback 
-            WHERE overall_rating >= 4 AND date(created_at) = date('now')
-        """)
+        cursor.execute(POSITIVE_FEEDBACK_TODAY_SQL)
         positive_feedback = cursor.fetchone()[0] or 0
         
-        cursor.execute("""
-            SELECT COUNT(*) FROM chat_feedback 
-            WHERE date(created_at) = date('now')
-        """)
+        cursor.execute(FEEDBACK_TODAY_SQL)
         total_feedback = cursor.fetchone()[0] or 1
         
         conversion_rate = (positive_feedback / total_feedback) * 100
@@ -81,13 +67,10 @@ def get_real_analytics_data():
         print(f"Error getting real analytics: {e}")
         return None
 
-def generate_analytics_update():
-    """Generate analytics update with real data"""
+def generate_analytics_update(real_data):
+    """Generate analytics update from data read by get_real_analytics_data"""
     global analytics_data
     
-    # Get real data from database
-    real_data = get_real_analytics_data()
-    
     if real_data:
         # Use ONLY real data - no random variations
         analytics_data["liveUsers"] = real_data["liveUsers"]
@@ -139,8 +122,8 @@ async def analytics_stream():
     """Stream analytics data using Server-Sent Events"""
     while True:
         try:
-            # Generate new analytics data
-            data = generate_analytics_update()
+            # Generate new analytics data; the queries run off the event loop
+            data = generate_analytics_update(await run_db(get_real_analytics_data))
             
             # Add timestamp for real-time feel
             data["lastUpdated"] = datetime.now().strftime("%H:%M:%S")
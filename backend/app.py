@@ -10,12 +10,20 @@ from admin_dashboard_db import router as admin_router
 from auth_router import router as auth_router
 from ticket_api import router as ticket_router
 from user_management_api import router as user_management_router
-from live_chat_api import router as live_chat_router
+from live_chat_api import router as live_chat_router, init_chat_messages_table, init_agent_skills_table, notify_request_timeouts
+from chat_request_expiry import chat_request_expiry
+from schema_migrations import apply_migrations
+from db_executor import db_executor, loop_lag_monitor
+from password_hashing import hash_executor
+from login_activity import login_activity
 from reports_api import router as reports_router
 from chat_management_api import router as chat_management_router
 from sqlite_auth import db_auth
 from analytics_stream import analytics_stream, get_current_analytics
 from notification_stream import create_notification_routes
+from conversation_memory import conversation_memory
+from faq_transition_model import faq_transition_model
+from faq_database import faq_db
 
 app = FastAPI(title="Venturing Digitally Chatbot", version="2.0.0")
 
@@ -32,6 +40,28 @@ app.add_middleware(
 @app.on_event("startup")
 async def startup_event():
     db_auth.init_database()
+    init_chat_messages_table()
+    init_agent_skills_table()
+    apply_migrations()
+    faq_db.load_autocomplete()
+
+    # Seed the FAQ transition model from stored conversations, then keep it updated in the background
+    if not faq_transition_model.counts:
+        faq_transition_model.build_from_sessions(conversation_memory.get_all_sessions())
+    faq_transition_model.start()
+    conversation_memory.start()
+    chat_request_expiry.start(notify_request_timeouts)
+    loop_lag_monitor.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    faq_transition_model.stop()
+    conversation_memory.stop()
+    await chat_request_expiry.stop()
+    await loop_lag_monitor.stop()
+    login_activity.stop()
+    db_executor.shutdown()
+    hash_executor.shutdown()
 
 # Include routers
 app.include_router(auth_router)
@@ -74,6 +104,11 @@ async def get_analytics():
 def health():
     return {"status": "ok", "message": "Venturing Digitally Chatbot API is running"}
 
+@app.get("/health/loop")
+def loop_health():
+    """Event loop lag and executor stats"""
+    return {"loop": loop_lag_monitor.stats(), "db": db_executor.stats(), "hashing": hash_executor.stats()}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,138 @@
+"""
+Authenticated Principals
+Signed identity claims for access tokens and a short-lived cache of verified principals keyed by token hash,
+so most authenticated requests never touch the user databases
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from user_repository import user_repository
+
+PRINCIPAL_TTL_SECONDS = 30
+# Other workers never hear about a user's role change or deactivation, so claims are trusted only this soon after issue
+CLAIMS_MAX_AGE_SECONDS = 30
+MAX_PRINCIPALS = 10000
+
+# Principal field -> JWT claim; profile_image is left out since it can be a large data URL
+CLAIMS = {
+    "id": "uid",
+    "email": "email",
+    "full_name": "name",
+    "is_admin": "adm",
+    "is_active": "act",
+    "user_type": "utype",
+    "role_id": "rid",
+    "role_name": "role",
+}
+
+
+def token_claims(user: Dict[str, Any]) -> Dict[str, Any]:
+    """Claims to sign into an access token for a user as returned by /auth/verify"""
+    claims = {"sub": user["username"], "iat": int(time.time())}
+    for field, claim in CLAIMS.items():
+        if field in user:
+            claims[claim] = user[field]
+    return claims
+
+
+def principal_from_claims(payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Rebuild the principal from a verified token's claims; None for tokens issued without them"""
+    if "uid" not in payload or "utype" not in payload:
+        return None
+    principal = {"username": payload["sub"]}
+    for field, claim in CLAIMS.items():
+        if claim in payload:
+            principal[field] = payload[claim]
+    return principal
+
+
+def token_key(token: str) -> str:
+    # Tokens are bearer credentials; only their hash is kept in memory
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class PrincipalCache:
+    """Token hash -> verified principal, dropped after a TTL, at token expiry or when the user changes
+
+    Claims are trusted only for tokens issued in the last claims_max_age seconds, after this process started
+    and after the user's last change; other tokens are resolved from the user databases once and then cached
+    like any other.
+    """
+
+    def __init__(self, ttl: float = PRINCIPAL_TTL_SECONDS, max_entries: int = MAX_PRINCIPALS,
+                 claims_max_age: float = CLAIMS_MAX_AGE_SECONDS):
+        self.ttl = ttl
+        self.claims_max_age = claims_max_age
+        self.max_entries = max_entries
+        self.started_at = time.time()
+        self.principals: Dict[str, Tuple[float, str, Dict[str, Any]]] = {}  # token hash -> (expires_at, username, principal)
+        self.changed_at: Dict[str, float] = {}  # username -> last profile, role or password change
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        key = token_key(token)
+        now = time.time()
+        with self.lock:
+            entry = self.principals.get(key)
+            if entry and entry[0] > now:
+                self.hits += 1
+                return dict(entry[2])
+            if entry:
+                del self.principals[key]
+            self.misses += 1
+        return None
+
+    def put(self, token: str, principal: Dict[str, Any], payload: Dict[str, Any], from_claims: bool = False):
+        expires_at = time.time() + self.ttl
+        if isinstance(payload.get("exp"), (int, float)):
+            expires_at = min(expires_at, payload["exp"])
+        if from_claims:
+            # A principal built from claims lasts no longer than the claims are trusted
+            expires_at = min(expires_at, payload["iat"] + self.claims_max_age)
+        with self.lock:
+            if len(self.principals) >= self.max_entries:
+                self.principals.clear()
+            self.principals[token_key(token)] = (expires_at, principal["username"], dict(principal))
+
+    def trusts_claims(self, payload: Dict[str, Any]) -> bool:
+        issued_at = payload.get("iat")
+        if not isinstance(issued_at, (int, float)):
+            return False
+        with self.lock:
+            changed_at = self.changed_at.get(payload.get("sub"), 0)
+        # iat has one-second resolution, so a token from the same second as a change is not trusted
+        return (issued_at > int(self.started_at) and issued_at > changed_at
+                and time.time() - issued_at < self.claims_max_age)
+
+    def invalidate(self, username: Optional[str] = None):
+        """Forget cached principals for one user, or everyone, and stop trusting their older tokens' claims"""
+        now = time.time()
+        with self.lock:
+            if username is None:
+                self.principals.clear()
+                self.started_at = now
+                self.changed_at.clear()
+                return
+            self.changed_at[username] = now
+            for key in [key for key, entry in self.principals.items() if entry[1] == username]:
+                del self.principals[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"cached": len(self.principals), "hits": self.hits, "misses": self.misses}
+
+
+# Global principal cache
+principal_cache = PrincipalCache()
+
+
+def invalidate_user(username: Optional[str] = None):
+    """Drop everything cached about a user after their profile, role or password changes"""
+    user_repository.invalidate(username)
+    principal_cache.invalidate(username)
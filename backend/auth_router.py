@@ -10,6 +10,12 @@ from pydantic import BaseModel
 from typing import Optional
 from sqlite_auth import db_auth
 from user_management_db import user_db
+from agent_directory import agent_directory
+from user_repository import user_repository
+from auth_principals import principal_cache, principal_from_claims, token_claims, invalidate_user
+from db_executor import run_db
+from password_hashing import run_hashing
+from login_activity import login_activity
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 security = HTTPBearer()
@@ -39,14 +45,15 @@ async def login(login_data: LoginRequest):
         
         # First try to authenticate with main admin database
         print(f"Trying admin auth for user: {login_data.username}")
-        user = db_auth.authenticate_user(login_data.username, login_data.password)
+        # Password checks are deliberately slow, so they run on the hashing pool
+        user = await run_hashing(db_auth.authenticate_user, login_data.username, login_data.password)
         if user:
             print(f"Admin auth successful for user: {login_data.username}")
             is_admin_user = True
         else:
             # If not found in admin DB, try user management database
             print(f"Trying user management auth for user: {login_data.username}")
-            user = user_db.authenticate_user(login_data.username, login_data.password)
+            user = await run_hashing(user_db.authenticate_user, login_data.username, login_data.password)
             if user:
                 print(f"User management auth successful for user: {login_data.username}")
                 is_admin_user = False
@@ -60,12 +67,6 @@ async def login(login_data: LoginRequest):
                 headers={"WWW-Authenticate": "Bearer"},
             )
         
-        # Create access token
-        access_token = db_auth.create_access_token(
-            data={"sub": user["username"]},
-            expires_delta=None
-        )
-        
         # Prepare user response based on which database the user came from
         if is_admin_user:
             user_response = {
@@ -93,6 +94,12 @@ async def login(login_data: LoginRequest):
                 "profile_image": user.get("profile_image")
             }
         
+        # Sign the identity into the token so most requests can skip the user lookup
+        access_token = db_auth.create_access_token(
+            data=token_claims(user_response),
+            expires_delta=None
+        )
+        
         return LoginResponse(
             access_token=access_token,
             token_type="bearer",
@@ -106,7 +113,8 @@ async def login(login_data: LoginRequest):
 async def register(register_data: RegisterRequest):
     """Register a new user"""
     try:
-        result = db_auth.create_user(
+        result = await run_hashing(
+            db_auth.create_user,
             username=register_data.username,
             password=register_data.password,
             email=register_data.email,
@@ -122,12 +130,17 @@ async def register(register_data: RegisterRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/verify")
 async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """Verify JWT token and return user info - checks both admin and user databases"""
+    """Verify JWT token and return user info - from the principal cache, the token's claims, or both user databases"""
     try:
+        token = credentials.credentials
+        principal = principal_cache.get(token)
+        if principal is not None:
+            login_activity.touch(principal.get("user_type"), principal.get("id"))
+            return {"valid": True, "user": principal}
+        
         # Verify token
-        payload = db_auth.verify_token(credentials.credentials)
+        payload = db_auth.verify_token(token)
         if payload is None:
             raise HTTPException(
                 status_code=401,
@@ -143,60 +156,41 @@ async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(secur
                 headers={"WWW-Authenticate": "Bearer"},
             )
         
-        user = None
-        is_admin_user = False
-        
-        # First try to find user in main admin database
-        user = db_auth.get_user_by_username(username)
-        if user:
-            is_admin_user = True
-        else:
-            # If not found in admin DB, try user management database
-            user = user_db.get_user_by_username(username)
-            if user:
-                is_admin_user = False
-        
-        if user is None:
-            raise HTTPException(
-                status_code=401,
-                detail="User not found",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        
-        # Prepare user response based on which database the user came from
-        if is_admin_user:
-            user_response = {
-                "id": user["id"],
-                "username": user["username"],
-                "email": user["email"],
-                "full_name": user["full_name"],
-                "is_admin": user["is_admin"],
-                "is_active": user["is_active"],
-                "user_type": "admin",
-                "role_name": "Super Admin",
-                "profile_image": user.get("profile_image")
-            }
-        else:
-            user_response = {
-                "id": user["id"],
-                "username": user["username"],
-                "email": user["email"],
-                "full_name": user["full_name"],
-                "is_admin": False,
-                "is_active": user["is_active"],
-                "user_type": "user",
-                "role_id": user.get("role_id", 1),
-                "role_name": user_db.get_role_by_id(user.get("role_id", 1))["name"] if user.get("role_id") and user_db.get_role_by_id(user.get("role_id", 1)) else "User",
-                "profile_image": user.get("profile_image")
-            }
-        
-        return {"valid": True, "user": user_response}
+        principal = principal_from_claims(payload) if principal_cache.trusts_claims(payload) else None
+        from_claims = principal is not None
+        if principal is None:
+            # Admin and user management databases are resolved in one query, off the event loop
+            principal = await run_db(user_repository.get_identity, username)
+            if principal is None:
+                raise HTTPException(
+                    status_code=401,
+                    detail="User not found",
+                    headers={"WWW-Authenticate": "Bearer"},
+                )
+            principal.pop("profile_image", None)
+        
+        principal_cache.put(token, principal, payload, from_claims)
+        login_activity.touch(principal.get("user_type"), principal.get("id"))
+        return {"valid": True, "user": principal}
         
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/verify")
+async def verify(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Verify JWT token and return the user's full profile"""
+    result = await verify_token(credentials)
+    user = await run_db(user_repository.get_identity, result["user"]["username"])
+    if user is None:
+        raise HTTPException(
+            status_code=401,
+            detail="User not found",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return {"valid": True, "user": user}
+
 @router.post("/logout")
 async def logout(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Logout user (invalidate token)"""
@@ -257,6 +251,7 @@ async def update_profile(profile_data: ProfileUpdate, credentials: HTTPAuthoriza
             )
             if not updated_user:
                 raise HTTPException(status_code=400, detail="Failed to update profile")
+            invalidate_user(username)
             
             user_response = {
                 "id": updated_user["id"],
@@ -279,6 +274,8 @@ async def update_profile(profile_data: ProfileUpdate, credentials: HTTPAuthoriza
             )
             if not updated_user:
                 raise HTTPException(status_code=400, detail="Failed to update profile")
+            agent_directory.invalidate(updated_user["id"])
+            invalidate_user(username)
             
             # Get role name
             role_name = "User"
@@ -334,20 +331,21 @@ async def change_password(password_data: PasswordChange, credentials: HTTPAuthor
         
         # Verify current password
         if is_admin_user:
-            if not db_auth.verify_password(password_data.current_password, user["password_hash"]):
+            if not await run_hashing(db_auth.verify_password, password_data.current_password, user["password_hash"]):
                 raise HTTPException(status_code=400, detail="Current password is incorrect")
             
             # Update password in admin database
-            success = db_auth.update_user_password(user["id"], password_data.new_password)
+            success = await run_hashing(db_auth.update_user_password, user["id"], password_data.new_password)
         else:
-            if not user_db.verify_password(password_data.current_password, user["password_hash"]):
+            if not await run_hashing(user_db.verify_password, password_data.current_password, user["password_hash"]):
                 raise HTTPException(status_code=400, detail="Current password is incorrect")
             
             # Update password in user management database
-            success = user_db.update_user_password(user["id"], password_data.new_password)
+            success = await run_hashing(user_db.update_user_password, user["id"], password_data.new_password)
         
         if not success:
             raise HTTPException(status_code=400, detail="Failed to update password")
+        invalidate_user(username)
         
         return {"message": "Password changed successfully"}
         
@@ -389,6 +387,7 @@ async def update_profile_image(image_data: ProfileImageUpdate, credentials: HTTP
         
         if not success:
             raise HTTPException(status_code=400, detail="Failed to update profile image")
+        invalidate_user(username)
         
         return {"message": "Profile image updated successfully"}
         
@@ -0,0 +1,112 @@
+"""
+Live Chat Assignment Engine
+Routes each chat request to the least-loaded online agent with a matching category skill
+"""
+
+from __future__ import annotations
+
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set
+
+# Skill key for agents without configured skills; they can take any category
+ANY_CATEGORY = None
+
+
+class AgentAssignmentEngine:
+    """Online agents bucketed by skill and current session count"""
+
+    def __init__(self, max_sessions_per_agent: int = 3):
+        self.max_sessions = max_sessions_per_agent
+        self.load: Dict[str, int] = {}  # agent_id -> active sessions
+        self.skills: Dict[str, FrozenSet[Optional[int]]] = {}  # agent_id -> category IDs, or {ANY_CATEGORY}
+        self.names: Dict[str, str] = {}
+        # skill -> buckets[load] = agents with that many sessions; full agents sit in no bucket
+        self.buckets: Dict[Optional[int], List[Set[str]]] = {}
+
+    def agent_online(self, agent_id: str, skills: Iterable[int], active_sessions: int = 0, name: Optional[str] = None):
+        """Start routing to an agent; no skills means every category"""
+        self.agent_offline(agent_id)
+        self.skills[agent_id] = frozenset(skills) or frozenset([ANY_CATEGORY])
+        self.load[agent_id] = active_sessions
+        if name:
+            self.names[agent_id] = name
+        self._place(agent_id)
+
+    def agent_offline(self, agent_id: str):
+        if agent_id in self.load:
+            self._unplace(agent_id)
+            del self.load[agent_id]
+            del self.skills[agent_id]
+
+    def is_online(self, agent_id: str) -> bool:
+        return agent_id in self.load
+
+    def session_started(self, agent_id: str):
+        self._adjust(agent_id, 1)
+
+    def session_ended(self, agent_id: str):
+        self._adjust(agent_id, -1)
+
+    def reserve(self, agent_id: str, category_id: Optional[int]) -> bool:
+        """Hold a session slot on an agent who can take the category; release() it if the assignment fails"""
+        if not self.can_take(agent_id, category_id):
+            return False
+        self._adjust(agent_id, 1)
+        return True
+
+    def release(self, agent_id: str):
+        """Give back a slot reserved by pick() or reserve() for an assignment that didn't happen"""
+        self._adjust(agent_id, -1)
+
+    def has_capacity(self, agent_id: str) -> bool:
+        return agent_id in self.load and self.load[agent_id] < self.max_sessions
+
+    def can_take(self, agent_id: str, category_id: Optional[int]) -> bool:
+        """Whether an online agent has room for and the skill to handle a category"""
+        skills = self.skills.get(agent_id)
+        return bool(skills) and self.has_capacity(agent_id) and (
+            ANY_CATEGORY in skills or category_id in skills
+        )
+
+    def pick(self, category_id: Optional[int]) -> Optional[str]:
+        """Get the least-loaded agent who can take the category, or None if nobody can
+
+        The chosen agent's slot is reserved straight away, so requests picked while an earlier
+        assignment is still being written spread across agents; release() it if the assignment fails.
+        """
+        specialists = self.buckets.get(category_id) if category_id is not ANY_CATEGORY else None
+        generalists = self.buckets.get(ANY_CATEGORY)
+        for load in range(self.max_sessions):
+            for buckets in (specialists, generalists):
+                if buckets and buckets[load]:
+                    agent_id = next(iter(buckets[load]))
+                    self._adjust(agent_id, 1)
+                    return agent_id
+        return None
+
+    def _adjust(self, agent_id: str, delta: int):
+        if agent_id not in self.load:
+            return
+        self._unplace(agent_id)
+        self.load[agent_id] = max(0, self.load[agent_id] + delta)
+        self._place(agent_id)
+
+    def _place(self, agent_id: str):
+        load = self.load[agent_id]
+        if load >= self.max_sessions:
+            return
+        for skill in self.skills[agent_id]:
+            buckets = self.buckets.setdefault(skill, [set() for _ in range(self.max_sessions)])
+            buckets[load].add(agent_id)
+
+    def _unplace(self, agent_id: str):
+        load = self.load[agent_id]
+        if load >= self.max_sessions:
+            return
+        for skill in self.skills[agent_id]:
+            buckets = self.buckets.get(skill)
+            if buckets:
+                buckets[load].discard(agent_id)
+
+
+# Global assignment engine
+assignment_engine = AgentAssignmentEngine()
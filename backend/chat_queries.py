@@ -0,0 +1,117 @@
+"""
+Hot Chat Queries
+SQL for the chat queries that run on every page load, poll or socket connect, shared by the modules that run them
+and by `schema_migrations.py --check`, which verifies each one is index-backed
+"""
+
+# Pending queue, oldest first (live_chat_api.load_pending_requests)
+PENDING_REQUESTS_SQL = """
+    SELECT cr.*, cc.name as category_name, cs.name as subcategory_name
+    FROM chat_requests cr
+    JOIN chat_categories cc ON cr.category_id = cc.id
+    LEFT JOIN chat_subcategories cs ON cr.subcategory_id = cs.id
+    WHERE cr.status = 'pending' AND cr.expires_at > datetime('now')
+    ORDER BY cr.created_at ASC
+"""
+
+# Pending requests to reschedule after a restart (chat_request_expiry.restore)
+PENDING_EXPIRIES_SQL = """
+    SELECT id, user_id, expires_at FROM chat_requests
+    WHERE status = 'pending'
+"""
+
+# Rejected requests, newest first (live_chat_api.get_rejected_requests)
+REJECTED_REQUESTS_SQL = """
+    SELECT cr.*, cc.name as category_name, cs.name as subcategory_name, u.username as rejected_by
+    FROM chat_requests cr
+    JOIN chat_categories cc ON cr.category_id = cc.id
+    LEFT JOIN chat_subcategories cs ON cr.subcategory_id = cs.id
+    LEFT JOIN users u ON cr.rejected_by = u.id
+    WHERE cr.status = 'rejected'
+    ORDER BY cr.created_at DESC
+"""
+
+# An agent's load (live_chat_api.load_agent_profile); params: support_user_id
+AGENT_ACTIVE_SESSION_COUNT_SQL = """
+    SELECT COUNT(*) FROM chat_sessions
+    WHERE support_user_id = ? AND status = 'active'
+"""
+
+# An agent's active sessions, newest first (live_chat_api.get_chat_sessions); params: support_user_id
+AGENT_ACTIVE_SESSIONS_SQL = """
+    SELECT cs.id, cs.request_id, cs.user_id, cs.support_user_id, cs.status,
+           COALESCE(cs.started_at_local, datetime(cs.started_at, 'localtime')) as started_at,
+           COALESCE(cs.ended_at_local, datetime(cs.ended_at, 'localtime')) as ended_at,
+           cr.user_name, cr.user_email, cc.name as category_name
+    FROM chat_sessions cs
+    JOIN chat_requests cr ON cs.request_id = cr.id
+    JOIN chat_categories cc ON cr.category_id = cc.id
+    WHERE cs.support_user_id = ? AND cs.status = 'active'
+    ORDER BY cs.started_at DESC
+"""
+
+# Every session, newest first, keyset-paginated on (started_at, id) (live_chat_api.get_all_sessions)
+_ALL_SESSIONS_SQL = """
+    SELECT cs.id, cs.request_id, cs.user_id, cs.support_user_id, cs.status,
+           COALESCE(cs.started_at_local, datetime(cs.started_at, 'localtime')) as started_at,
+           COALESCE(cs.ended_at_local, datetime(cs.ended_at, 'localtime')) as ended_at,
+           cr.user_name, cr.user_email, cc.name as category_name, cs_sub.name as subcategory_name,
+           cs.started_at as started_at_key
+    FROM chat_sessions cs
+    JOIN chat_requests cr ON cs.request_id = cr.id
+    JOIN chat_categories cc ON cr.category_id = cc.id
+    LEFT JOIN chat_subcategories cs_sub ON cr.subcategory_id = cs_sub.id
+    {keyset}
+    ORDER BY cs.started_at DESC, cs.id DESC
+    LIMIT ?
+"""
+# params: limit
+ALL_SESSIONS_SQL = _ALL_SESSIONS_SQL.format(keyset="")
+# The row value comparison is a single range on idx_chat_sessions_started_at; params: before, before_id, limit
+ALL_SESSIONS_BEFORE_SQL = _ALL_SESSIONS_SQL.format(keyset="WHERE (cs.started_at, cs.id) < (?, ?)")
+
+# One page of a session's messages, keyset on (session_id, id) (live_chat_api.fetch_session_messages)
+MESSAGE_COLUMNS = "id, session_id, sender_type, sender_id, message, message_type, is_read, created_at"
+# params: session_id, after_id, limit
+SESSION_MESSAGES_AFTER_SQL = f"""
+    SELECT {MESSAGE_COLUMNS} FROM chat_messages
+    WHERE session_id = ? AND id > ?
+    ORDER BY id ASC
+    LIMIT ?
+"""
+# params: session_id, before_id, limit
+SESSION_MESSAGES_BEFORE_SQL = f"""
+    SELECT {MESSAGE_COLUMNS} FROM chat_messages
+    WHERE session_id = ? AND id < ?
+    ORDER BY id DESC
+    LIMIT ?
+"""
+
+# Dashboard counters (analytics_stream, reports_api)
+LIVE_USERS_SQL = """
+    SELECT COUNT(DISTINCT user_id) FROM chat_sessions
+    WHERE started_at > datetime('now', '-5 minutes')
+"""
+SESSIONS_TODAY_SQL = """
+    SELECT COUNT(*) FROM chat_sessions
+    WHERE started_at >= date('now') AND started_at < date('now', '+1 day')
+"""
+MESSAGES_TODAY_SQL = """
+    SELECT COUNT(*) FROM chat_messages
+    WHERE created_at >= date('now') AND created_at < date('now', '+1 day')
+"""
+AVG_SESSION_DURATION_SQL = """
+    SELECT AVG(
+        (julianday(ended_at) - julianday(started_at)) * 24 * 60 * 60 * 1000
+    ) FROM chat_sessions
+    WHERE ended_at IS NOT NULL
+    AND started_at > datetime('now', '-1 day')
+"""
+POSITIVE_FEEDBACK_TODAY_SQL = """
+    SELECT COUNT(*) FROM chat_feedback
+    WHERE overall_rating >= 4 AND created_at >= date('now') AND created_at < date('now', '+1 day')
+"""
+FEEDBACK_TODAY_SQL = """
+    SELECT COUNT(*) FROM chat_feedback
+    WHERE created_at >= date('now') AND created_at < date('now', '+1 day')
+"""
@@ -0,0 +1,172 @@
+"""
+Chat Request Expiry
+One scheduler times out every pending live chat request instead of a sleeping task per request
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlite_pool import connect_db
+from chat_queries import PENDING_EXPIRIES_SQL
+from db_executor import run_db
+
+REQUEST_TIMEOUT_SECONDS = 120
+TIMEOUT_REASON = "Request timed out - no support agent available"
+EXPIRES_AT_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def format_db_time(timestamp: float) -> str:
+    """Format epoch seconds as UTC in SQLite's datetime('now') format, so the two compare as strings"""
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime(EXPIRES_AT_FORMAT)
+
+
+def parse_expires_at(value: str) -> float:
+    """Parse a stored expiry (UTC, or an older ISO string) to epoch seconds"""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def expires_at_to_iso(value: Optional[str]) -> Optional[str]:
+    """Stored expiry as an ISO timestamp with an explicit UTC offset, for clients"""
+    if not value:
+        return value
+    try:
+        return datetime.fromtimestamp(parse_expires_at(value), timezone.utc).isoformat()
+    except ValueError:
+        return value
+
+
+class ChatRequestExpiry:
+    """Min-heap of request deadlines swept by a single asyncio task"""
+
+    def __init__(self, db_path: str = "venturing.db", max_batch: int = 500):
+        self.db_path = db_path
+        self.max_batch = max_batch
+        self.heap: List[Tuple[float, int]] = []  # (expires_at, request_id), may hold cancelled entries
+        self.pending: Dict[int, Tuple[float, str]] = {}  # request_id -> (expires_at, user_id)
+        self.on_expired: Optional[Callable[[List[Tuple[int, str]]], Awaitable[None]]] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def schedule(self, request_id: int, user_id: str, expires_at: float):
+        """Time out a request at expires_at unless it is cancelled first"""
+        self.pending[request_id] = (expires_at, user_id)
+        heapq.heappush(self.heap, (expires_at, request_id))
+        # Wake the sweeper if this is now the earliest deadline
+        if self._wakeup and self.heap[0][1] == request_id:
+            self._wakeup.set()
+
+    def cancel(self, request_id: int):
+        """Forget a request that was accepted, rejected or canceled; its heap entry is skipped later"""
+        self.pending.pop(request_id, None)
+
+    def restore(self):
+        """Reschedule pending requests from the database after a restart"""
+        try:
+            conn = connect_db(self.db_path, readonly=True)
+            rows = conn.execute(PENDING_EXPIRIES_SQL).fetchall()
+            conn.close()
+        except Exception as e:
+            print(f"Error restoring chat request expiries: {e}")
+            return
+
+        now = time.time()
+        for request_id, user_id, expires_at in rows:
+            try:
+                deadline = parse_expires_at(expires_at)
+            except (TypeError, ValueError):
+                deadline = now
+            self.schedule(request_id, user_id, deadline)
+
+    def start(self, on_expired: Callable[[List[Tuple[int, str]]], Awaitable[None]]):
+        """Restore pending requests and start sweeping; on_expired gets (request_id, user_id) pairs"""
+        self.on_expired = on_expired
+        if self._task and not self._task.done():
+            return
+        self._wakeup = asyncio.Event()
+        self.restore()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _pop_due(self, now: float) -> List[Tuple[int, str]]:
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            expires_at, request_id = heapq.heappop(self.heap)
+            entry = self.pending.get(request_id)
+            # Skip cancelled requests and entries superseded by a later schedule()
+            if entry and entry[0] == expires_at:
+                del self.pending[request_id]
+                due.append((request_id, entry[1]))
+        return due
+
+    def _next_delay(self) -> Optional[float]:
+        if not self.heap:
+            return None
+        return max(0.0, self.heap[0][0] - time.time())
+
+    def expire(self, due: List[Tuple[int, str]]) -> List[Tuple[int, str]]:
+        """Time out due requests that are still pending, in batched UPDATEs"""
+        expired = []
+        conn = connect_db(self.db_path)
+        try:
+            for start in range(0, len(due), self.max_batch):
+                batch = due[start:start + self.max_batch]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(f"""
+                    UPDATE chat_requests
+                    SET status = 'timeout',
+                        rejected_at = CURRENT_TIMESTAMP,
+                        rejection_reason = ?
+                    WHERE status = 'pending' AND id IN ({placeholders})
+                    RETURNING id, user_id
+                """, (TIMEOUT_REASON, *[request_id for request_id, _ in batch])).fetchall()
+                conn.commit()
+                expired.extend(rows)
+        finally:
+            conn.close()
+        return expired
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._next_delay())
+            except asyncio.TimeoutError:
+                pass
+
+            due = self._pop_due(time.time())
+            if not due:
+                continue
+            try:
+                expired = await run_db(self.expire, due)
+            except Exception as e:
+                print(f"Error expiring chat requests: {e}")
+                # Try again shortly rather than leave the requests pending forever
+                for request_id, user_id in due:
+                    self.schedule(request_id, user_id, time.time() + 5)
+                continue
+
+            if expired and self.on_expired:
+                try:
+                    await self.on_expired(expired)
+                except Exception as e:
+                    print(f"Error notifying timed out chat requests: {e}")
+
+
+# Global chat request expiry scheduler
+chat_request_expiry = ChatRequestExpiry()
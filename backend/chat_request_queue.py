@@ -0,0 +1,60 @@
+"""
+Pending Chat Request Queue
+In-memory copy of the live chat queue, kept current from request lifecycle events
+"""
+
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Set
+
+
+class PendingRequestQueue:
+    """Pending chat requests in arrival order"""
+
+    def __init__(self):
+        self.requests: Dict[int, Dict] = {}  # request_id -> request, insertion ordered
+        self.loaded = False
+        # Set while the database is read off the event loop; changes meanwhile are merged into the result
+        self.loading = False
+        self.removed_while_loading: Set[int] = set()
+
+    def start_loading(self):
+        self.requests = {}
+        self.removed_while_loading = set()
+        self.loading = True
+
+    def load(self, requests: List[Dict]):
+        """Replace the queue with requests read from the database, keeping changes made while they were read"""
+        added = self.requests
+        self.requests = {
+            request["id"]: request for request in requests
+            if request["id"] not in self.removed_while_loading
+        }
+        for request_id, request in added.items():
+            self.requests.setdefault(request_id, request)
+        self.removed_while_loading = set()
+        self.loading = False
+        self.loaded = True
+
+    def abandon_loading(self):
+        self.requests = {}
+        self.removed_while_loading = set()
+        self.loading = False
+
+    def add(self, request: Dict):
+        # Until the queue is loaded the database is the source of truth
+        if self.loaded or self.loading:
+            self.requests[request["id"]] = request
+
+    def remove(self, request_id: int) -> Optional[Dict]:
+        """Drop a request that left the queue; None if it wasn't queued"""
+        if self.loading:
+            self.removed_while_loading.add(request_id)
+        return self.requests.pop(request_id, None)
+
+    def snapshot(self) -> List[Dict]:
+        return list(self.requests.values())
+
+
+# Global pending request queue
+pending_requests = PendingRequestQueue()
@@ -54,6 +54,15 @@ CREATE TABLE IF NOT EXISTS chat_messages (
     FOREIGN KEY (session_id) REFERENCES chat_sessions(id)
 );
 
+CREATE INDEX IF NOT EXISTS idx_chat_messages_session_id ON chat_messages(session_id, id);
+CREATE INDEX IF NOT EXISTS idx_chat_messages_created_at ON chat_messages(created_at);
+
+-- Query indexes (also applied to existing databases by schema_migrations.py)
+CREATE INDEX IF NOT EXISTS idx_chat_sessions_started_at ON chat_sessions(started_at);
+CREATE INDEX IF NOT EXISTS idx_chat_sessions_recent ON chat_sessions(started_at, user_id, ended_at);
+CREATE INDEX IF NOT EXISTS idx_chat_sessions_support_status ON chat_sessions(support_user_id, status, started_at);
+CREATE INDEX IF NOT EXISTS idx_chat_requests_status_created ON chat_requests(status, created_at);
+
 -- Insert default chat categories
 INSERT OR IGNORE INTO chat_categories (name, description) VALUES
 ('General Support', 'General questions and support'),
@@ -1,177 +1,293 @@
 from __future__ import annotations
 
-import json
-import os
+import threading
+import time
+from collections import OrderedDict
 from typing import Dict, List, Optional
-from datetime import datetime, timedelta
+from datetime import datetime
+from conversation_store import ConversationStore, WriteBehindPersister, create_conversation_store, to_timestamp
+
+class SessionShard:
+    """One stripe of the session map with its own lock and LRU order"""
+
+    def __init__(self, max_sessions: int):
+        self.max_sessions = max_sessions
+        # Ordered least recently active first, so expiry and eviction only look at the front
+        self.sessions: OrderedDict[str, Dict] = OrderedDict()
+        self.lock = threading.Lock()
 
 class ConversationMemory:
     """Advanced conversation memory system"""
-    
-    def __init__(self, max_sessions: int = 100, session_timeout: int = 3600):
+
+    def __init__(self, max_sessions: int = 5000, session_timeout: int = 3600,
+                 store: Optional[ConversationStore] = None, compaction_interval: int = 600,
+                 shard_count: int = 16):
         self.max_sessions = max_sessions
         self.session_timeout = session_timeout
-        self.sessions: Dict[str, Dict] = {}
-        self.memory_file = "conversation_memory.json"
+        self.compaction_interval = compaction_interval
+        # Sessions are striped across shards so concurrent visitors don't contend on one lock
+        self.shards = [SessionShard(max(1, max_sessions // shard_count)) for _ in range(shard_count)]
+        self.store = store or create_conversation_store()
+        self.persister = WriteBehindPersister(self.store, self._snapshot_session)
+        self._compaction_stop = threading.Event()
+        self._compaction_thread: Optional[threading.Thread] = None
         self.load_memory()
-    
+
+    def _shard(self, session_id: str) -> SessionShard:
+        return self.shards[hash(session_id) % len(self.shards)]
+
     def load_memory(self):
-        """Load conversation memory from file"""
+        """Load conversation memory from the storage backend"""
         try:
-            if os.path.exists(self.memory_file):
-                with open(self.memory_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.sessions = data.get('sessions', {})
+            sessions = self.store.load_sessions()
         except Exception as e:
             print(f"Error loading memory: {e}")
-            self.sessions = {}
-    
+            sessions = {}
+
+        for session in sessions.values():
+            session['created_at'] = to_timestamp(session.get('created_at'))
+            session['last_activity'] = to_timestamp(session.get('last_activity'))
+
+        for session_id, session in sorted(sessions.items(), key=lambda item: item[1]['last_activity']):
+            shard = self._shard(session_id)
+            with shard.lock:
+                shard.sessions[session_id] = session
+
+    def get_all_sessions(self) -> List[Dict]:
+        """Get a copy of every session currently held in memory"""
+        sessions = []
+        for shard in self.shards:
+            with shard.lock:
+                session_ids = list(shard.sessions)
+            for session_id in session_ids:
+                snapshot = self._snapshot_session(session_id)
+                if snapshot is not None:
+                    sessions.append(snapshot)
+        return sessions
+
     def save_memory(self):
-        """Save conversation memory to file"""
+        """Save every session to the storage backend now"""
+        for shard in self.shards:
+            with shard.lock:
+                session_ids = list(shard.sessions)
+            for session_id in session_ids:
+                self.persister.mark_dirty(session_id)
+        self.persister.flush()
+
+    def save_session(self, session_id: str):
+        """Mark a session for the next background flush, or write it straight through to a shared store"""
+        if not self.store.shared:
+            self.persister.mark_dirty(session_id)
+            return
+        snapshot = self._snapshot_session(session_id)
+        if snapshot is None:
+            return
         try:
-            data = {
-                'sessions': self.sessions,
-                'last_updated': datetime.now().isoformat()
-            }
-            with open(self.memory_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            self.store.save_sessions({session_id: snapshot})
+        except Exception as e:
+            print(f"Error saving session {session_id}: {e}")
+
+    def _refresh_session(self, session_id: str):
+        """Pull the latest copy of a session from a shared store, which another worker may have updated"""
+        if not self.store.shared:
+            return
+        try:
+            session = self.store.load_session(session_id)
         except Exception as e:
-            print(f"Error saving memory: {e}")
-    
+            print(f"Error loading session {session_id}: {e}")
+            return
+        if session is None:
+            return
+
+        session['created_at'] = to_timestamp(session.get('created_at'))
+        session['last_activity'] = to_timestamp(session.get('last_activity'))
+        shard = self._shard(session_id)
+        with shard.lock:
+            shard.sessions[session_id] = session
+            shard.sessions.move_to_end(session_id)
+
+    def _forget_sessions(self, session_ids: List[str]):
+        """Delete evicted sessions from a private store; a shared store expires them by TTL instead"""
+        if session_ids and not self.store.shared:
+            self.persister.mark_deleted(session_ids)
+
+    def _snapshot_session(self, session_id: str) -> Optional[Dict]:
+        """Copy a session so it can be serialized outside the lock"""
+        shard = self._shard(session_id)
+        with shard.lock:
+            session = shard.sessions.get(session_id)
+            if session is None:
+                return None
+            snapshot = dict(session)
+            snapshot['conversation'] = list(session['conversation'])
+            snapshot['user_preferences'] = dict(session.get('user_preferences', {}))
+            snapshot['context'] = dict(session.get('context', {}))
+            return snapshot
+
+    def start(self):
+        """Start background compaction of the storage backend"""
+        if self._compaction_thread and self._compaction_thread.is_alive():
+            return
+        self._compaction_stop.clear()
+        self._compaction_thread = threading.Thread(
+            target=self._run_compaction, name="conversation-compaction", daemon=True
+        )
+        self._compaction_thread.start()
+
+    def stop(self):
+        """Stop background compaction and flush pending writes"""
+        self._compaction_stop.set()
+        if self._compaction_thread:
+            self._compaction_thread.join(timeout=5)
+            self._compaction_thread = None
+        self.persister.stop()
+
+    def _run_compaction(self):
+        while not self._compaction_stop.wait(self.compaction_interval):
+            try:
+                self.store.compact(self.session_timeout)
+            except Exception as e:
+                print(f"Error compacting conversation store: {e}")
+
     def get_session_id(self, user_id: str = "default") -> str:
         """Get or create session ID for user"""
         return f"session_{user_id}"
-    
-    def add_to_conversation(self, user_id: str, query: str, response: str, intent: str = "general"):
-        """Add conversation turn to memory"""
+
+    def _touch_session(self, shard: SessionShard, user_id: str, now: float) -> Dict:
+        """Get or create a session and mark it as the most recently active (callers hold the shard lock)"""
         session_id = self.get_session_id(user_id)
-        current_time = datetime.now()
-        
-        if session_id not in self.sessions:
-            self.sessions[session_id] = {
+        session = shard.sessions.get(session_id)
+
+        if session is None:
+            session = {
                 'user_id': user_id,
-                'created_at': current_time.isoformat(),
-                'last_activity': current_time.isoformat(),
+                'created_at': now,
+                'last_activity': now,
                 'conversation': [],
                 'user_preferences': {},
                 'context': {}
             }
-        
-        # Add conversation turn
-        turn = {
-            'timestamp': current_time.isoformat(),
-            'query': query,
-            'response': response,
-            'intent': intent
-        }
-        
-        self.sessions[session_id]['conversation'].append(turn)
-        self.sessions[session_id]['last_activity'] = current_time.isoformat()
-        
-        # Keep only last 10 conversation turns
-        if len(self.sessions[session_id]['conversation']) > 10:
-            self.sessions[session_id]['conversation'] = self.sessions[session_id]['conversation'][-10:]
-        
-        # Clean up old sessions
-        self.cleanup_old_sessions()
-        
-        # Save memory
-        self.save_memory()
-    
+            shard.sessions[session_id] = session
+        else:
+            session['last_activity'] = now
+            shard.sessions.move_to_end(session_id)
+
+        return session
+
+    def add_to_conversation(self, user_id: str, query: str, response: str, intent: str = "general",
+                            faq_id: Optional[str] = None):
+        """Add conversation turn to memory"""
+        session_id = self.get_session_id(user_id)
+        shard = self._shard(session_id)
+        self._refresh_session(session_id)
+        now = time.time()
+
+        with shard.lock:
+            session = self._touch_session(shard, user_id, now)
+
+            # Add conversation turn
+            turn = {
+                'timestamp': datetime.fromtimestamp(now).isoformat(),
+                'query': query,
+                'response': response,
+                'intent': intent
+            }
+            if faq_id:
+                turn['faq_id'] = faq_id
+
+            session['conversation'].append(turn)
+
+            # Keep only last 10 conversation turns
+            if len(session['conversation']) > 10:
+                session['conversation'] = session['conversation'][-10:]
+
+            # Clean up old sessions in this shard
+            expired = self._evict_locked(shard, now)
+
+        self._forget_sessions(expired)
+
+        # Persist only this session, off the request path
+        self.save_session(session_id)
+
     def get_conversation_context(self, user_id: str) -> Dict:
         """Get conversation context for user"""
         session_id = self.get_session_id(user_id)
-        
-        if session_id not in self.sessions:
-            return {'conversation': [], 'context': {}, 'preferences': {}}
-        
-        session = self.sessions[session_id]
-        
-        # Check if session is still valid
-        last_activity = datetime.fromisoformat(session['last_activity'])
-        if datetime.now() - last_activity > timedelta(seconds=self.session_timeout):
-            return {'conversation': [], 'context': {}, 'preferences': {}}
-        
-        return {
-            'conversation': session['conversation'][-5:],  # Last 5 turns
-            'context': session.get('context', {}),
-            'preferences': session.get('user_preferences', {})
-        }
-    
+        shard = self._shard(session_id)
+        self._refresh_session(session_id)
+
+        with shard.lock:
+            session = shard.sessions.get(session_id)
+
+            # Check if session is still valid
+            if session is None or time.time() - session['last_activity'] > self.session_timeout:
+                return {'conversation': [], 'context': {}, 'preferences': {}}
+
+            return {
+                'conversation': session['conversation'][-5:],  # Last 5 turns
+                'context': dict(session.get('context', {})),
+                'preferences': dict(session.get('user_preferences', {}))
+            }
+
     def update_user_preference(self, user_id: str, key: str, value: str):
         """Update user preferences"""
         session_id = self.get_session_id(user_id)
-        
-        if session_id not in self.sessions:
-            self.sessions[session_id] = {
-                'user_id': user_id,
-                'created_at': datetime.now().isoformat(),
-                'last_activity': datetime.now().isoformat(),
-                'conversation': [],
-                'user_preferences': {},
-                'context': {}
-            }
-        
-        self.sessions[session_id]['user_preferences'][key] = value
-        self.sessions[session_id]['last_activity'] = datetime.now().isoformat()
-        self.save_memory()
-    
+        shard = self._shard(session_id)
+        self._refresh_session(session_id)
+        with shard.lock:
+            session = self._touch_session(shard, user_id, time.time())
+            session['user_preferences'][key] = value
+        self.save_session(session_id)
+
     def update_context(self, user_id: str, key: str, value: str):
         """Update conversation context"""
         session_id = self.get_session_id(user_id)
-        
-        if session_id not in self.sessions:
-            self.sessions[session_id] = {
-                'user_id': user_id,
-                'created_at': datetime.now().isoformat(),
-                'last_activity': datetime.now().isoformat(),
-                'conversation': [],
-                'user_preferences': {},
-                'context': {}
-            }
-        
-        self.sessions[session_id]['context'][key] = value
-        self.sessions[session_id]['last_activity'] = datetime.now().isoformat()
-        self.save_memory()
-    
-    def cleanup_old_sessions(self):
-        """Remove old sessions"""
-        current_time = datetime.now()
+        shard = self._shard(session_id)
+        self._refresh_session(session_id)
+        with shard.lock:
+            session = self._touch_session(shard, user_id, time.time())
+            session['context'][key] = value
+        self.save_session(session_id)
+
+    def cleanup_old_sessions(self, now: Optional[float] = None):
+        """Expire idle sessions and evict the least recently active ones in every shard"""
+        now = now if now is not None else time.time()
         sessions_to_remove = []
-        
-        for session_id, session in self.sessions.items():
-            last_activity = datetime.fromisoformat(session['last_activity'])
-            if current_time - last_activity > timedelta(seconds=self.session_timeout):
-                sessions_to_remove.append(session_id)
-        
-        for session_id in sessions_to_remove:
-            del self.sessions[session_id]
-        
-        # Limit number of sessions
-        if len(self.sessions) > self.max_sessions:
-            # Remove oldest sessions
-            sorted_sessions = sorted(
-                self.sessions.items(),
-                key=lambda x: x[1]['last_activity']
-            )
-            for session_id, _ in sorted_sessions[:len(self.sessions) - self.max_sessions]:
-                del self.sessions[session_id]
-    
+
+        for shard in self.shards:
+            with shard.lock:
+                sessions_to_remove.extend(self._evict_locked(shard, now))
+
+        self._forget_sessions(sessions_to_remove)
+
+    def _evict_locked(self, shard: SessionShard, now: float) -> List[str]:
+        """Pop expired or over-capacity sessions off the front of a shard (callers hold its lock)"""
+        cutoff = now - self.session_timeout
+        evicted = []
+
+        # The front of the ordered dict is always the least recently active session
+        while shard.sessions:
+            session_id, session = next(iter(shard.sessions.items()))
+            if session['last_activity'] >= cutoff and len(shard.sessions) <= shard.max_sessions:
+                break
+            shard.sessions.popitem(last=False)
+            evicted.append(session_id)
+
+        return evicted
+
     def get_conversation_summary(self, user_id: str) -> str:
         """Get conversation summary for context"""
         context = self.get_conversation_context(user_id)
         conversation = context['conversation']
-        
+
         if not conversation:
             return ""
-        
+
         summary_parts = []
         for turn in conversation[-3:]:  # Last 3 turns
             summary_parts.append(f"User: {turn['query'][:50]}...")
             summary_parts.append(f"Bot: {turn['response'][:50]}...")
-        
+
         return " | ".join(summary_parts)
 
 # Global conversation memory instance
 conversation_memory = ConversationMemory()
-
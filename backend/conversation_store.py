@@ -0,0 +1,312 @@
+"""
+Storage backends for ConversationMemory
+Sessions are persisted one row (or one key) per session instead of one shared file
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Optional, Set
+
+import orjson
+
+from session_store import KeyValueStore, create_session_store
+from write_behind import WriteBehind
+
+
+def to_timestamp(value) -> float:
+    """Convert a stored timestamp (float, or ISO string from older files) to epoch seconds"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class ConversationStore:
+    """Interface every conversation storage backend implements"""
+
+    # True when several workers share the store, so sessions are read and written through per turn
+    shared = False
+
+    def load_sessions(self) -> Dict[str, Dict]:
+        """Load every stored session keyed by session ID"""
+        raise NotImplementedError
+
+    def load_session(self, session_id: str) -> Optional[Dict]:
+        """Load a single session, or None if it isn't stored"""
+        return None
+
+    def save_sessions(self, sessions: Dict[str, Dict]):
+        """Insert or replace the given sessions"""
+        raise NotImplementedError
+
+    def delete_sessions(self, session_ids: Iterable[str]):
+        """Remove the given sessions"""
+        raise NotImplementedError
+
+    def compact(self, max_age_seconds: int):
+        """Drop sessions idle for longer than max_age_seconds and reclaim space"""
+
+    def close(self):
+        """Release any resources held by the store"""
+
+
+class JSONFileConversationStore(ConversationStore):
+    """Legacy backend: the whole memory lives in one JSON file"""
+
+    def __init__(self, memory_file: str = "conversation_memory.json"):
+        self.memory_file = memory_file
+        self.sessions: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def load_sessions(self) -> Dict[str, Dict]:
+        try:
+            if os.path.exists(self.memory_file):
+                with open(self.memory_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                    self.sessions = data.get('sessions', {})
+        except Exception as e:
+            print(f"Error loading memory: {e}")
+            self.sessions = {}
+        return dict(self.sessions)
+
+    def save_sessions(self, sessions: Dict[str, Dict]):
+        with self._lock:
+            self.sessions.update(sessions)
+            self._write()
+
+    def delete_sessions(self, session_ids: Iterable[str]):
+        with self._lock:
+            for session_id in session_ids:
+                self.sessions.pop(session_id, None)
+            self._write()
+
+    def _write(self):
+        """Write the file atomically: compact orjson to a temp file, then rename over the original"""
+        try:
+            data = {
+                'sessions': self.sessions,
+                'last_updated': datetime.now().isoformat()
+            }
+            tmp_file = f"{self.memory_file}.tmp"
+            with open(tmp_file, 'wb') as f:
+                f.write(orjson.dumps(data))
+            os.replace(tmp_file, self.memory_file)
+        except Exception as e:
+            print(f"Error saving memory: {e}")
+
+
+class SQLiteConversationStore(ConversationStore):
+    """One row per session, keyed and indexed by session ID"""
+
+    def __init__(self, db_path: str = "conversation_memory.db",
+                 legacy_json_file: str = "conversation_memory.json"):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.init_database()
+        self._migrate_from_json(legacy_json_file)
+
+    def init_database(self):
+        """Create the sessions table"""
+        with self._lock:
+            cursor = self.conn.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS conversation_sessions (
+                    session_id TEXT PRIMARY KEY,
+                    user_id TEXT,
+                    last_activity REAL NOT NULL,
+                    data TEXT NOT NULL
+                )
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_conversation_sessions_last_activity
+                ON conversation_sessions(last_activity)
+            ''')
+            self.conn.commit()
+
+    def _migrate_from_json(self, json_file: str):
+        """Import sessions from the legacy JSON file the first time the table is empty"""
+        if not json_file or not os.path.exists(json_file):
+            return
+
+        with self._lock:
+            has_rows = self.conn.execute("SELECT 1 FROM conversation_sessions LIMIT 1").fetchone()
+        if has_rows:
+            return
+
+        sessions = JSONFileConversationStore(json_file).load_sessions()
+        if sessions:
+            self.save_sessions(sessions)
+            print(f"Migrated {len(sessions)} conversation sessions from {json_file}")
+
+    def load_sessions(self) -> Dict[str, Dict]:
+        sessions = {}
+        with self._lock:
+            rows = self.conn.execute("SELECT session_id, data FROM conversation_sessions").fetchall()
+        for session_id, data in rows:
+            try:
+                sessions[session_id] = orjson.loads(data)
+            except orjson.JSONDecodeError as e:
+                print(f"Skipping corrupt conversation session {session_id}: {e}")
+        return sessions
+
+    def save_sessions(self, sessions: Dict[str, Dict]):
+        if not sessions:
+            return
+        rows = [
+            (
+                session_id,
+                session.get('user_id'),
+                to_timestamp(session.get('last_activity')),
+                orjson.dumps(session).decode('utf-8')
+            )
+            for session_id, session in sessions.items()
+        ]
+        with self._lock:
+            self.conn.executemany('''
+                INSERT INTO conversation_sessions (session_id, user_id, last_activity, data)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(session_id) DO UPDATE SET
+                    user_id = excluded.user_id,
+                    last_activity = excluded.last_activity,
+                    data = excluded.data
+            ''', rows)
+            self.conn.commit()
+
+    def delete_sessions(self, session_ids: Iterable[str]):
+        rows = [(session_id,) for session_id in session_ids]
+        if not rows:
+            return
+        with self._lock:
+            self.conn.executemany("DELETE FROM conversation_sessions WHERE session_id = ?", rows)
+            self.conn.commit()
+
+    def compact(self, max_age_seconds: int):
+        cutoff = time.time() - max_age_seconds
+        with self._lock:
+            self.conn.execute("DELETE FROM conversation_sessions WHERE last_activity < ?", (cutoff,))
+            self.conn.commit()
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+class KeyValueConversationStore(ConversationStore):
+    """One key per session in a key-value store, expired by the store itself"""
+
+    def __init__(self, kv: KeyValueStore, key_prefix: str = "conversation:", session_timeout: int = 3600):
+        self.kv = kv
+        self.key_prefix = key_prefix
+        self.session_timeout = session_timeout
+        self.shared = kv.shared
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.key_prefix}{session_id}"
+
+    def load_sessions(self) -> Dict[str, Dict]:
+        # A shared store may hold every worker's sessions; those are fetched on demand instead
+        if self.shared:
+            return {}
+        sessions = {}
+        for key, data in self.kv.scan(self.key_prefix).items():
+            try:
+                sessions[key[len(self.key_prefix):]] = orjson.loads(data)
+            except orjson.JSONDecodeError as e:
+                print(f"Skipping corrupt conversation session {key}: {e}")
+        return sessions
+
+    def load_session(self, session_id: str) -> Optional[Dict]:
+        data = self.kv.get_many([self._key(session_id)])[0]
+        if data is None:
+            return None
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError as e:
+            print(f"Skipping corrupt conversation session {session_id}: {e}")
+            return None
+
+    def save_sessions(self, sessions: Dict[str, Dict]):
+        self.kv.set_many(
+            {self._key(session_id): orjson.dumps(session) for session_id, session in sessions.items()},
+            ttl=self.session_timeout
+        )
+
+    def delete_sessions(self, session_ids: Iterable[str]):
+        self.kv.delete_many(self._key(session_id) for session_id in session_ids)
+
+    def compact(self, max_age_seconds: int):
+        self.kv.purge_expired()
+
+
+class WriteBehindPersister(WriteBehind):
+    """Coalesces session mutations and flushes them to a store from a background thread"""
+
+    def __init__(self, store: ConversationStore, snapshot: Callable[[str], Optional[Dict]],
+                 flush_interval: float = 2.0, max_dirty: int = 50):
+        super().__init__("conversation-persister", flush_interval)
+        self.store = store
+        self.snapshot = snapshot  # session_id -> copy of the session, or None if it is gone
+        self.max_dirty = max_dirty
+        self._dirty: Set[str] = set()
+        self._deleted: Set[str] = set()
+
+    def mark_dirty(self, session_id: str):
+        """Schedule a session to be written on the next flush"""
+        with self._lock:
+            self._deleted.discard(session_id)
+            self._dirty.add(session_id)
+            pending = len(self._dirty)
+        self._schedule(flush_now=pending >= self.max_dirty)
+
+    def mark_deleted(self, session_ids: Iterable[str]):
+        """Schedule sessions to be removed on the next flush"""
+        with self._lock:
+            for session_id in session_ids:
+                self._dirty.discard(session_id)
+                self._deleted.add(session_id)
+        self._schedule()
+
+    def _flush(self):
+        """Write every pending change to the store"""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            deleted, self._deleted = self._deleted, set()
+
+        sessions = {}
+        for session_id in dirty:
+            session = self.snapshot(session_id)
+            if session is not None:
+                sessions[session_id] = session
+
+        try:
+            if sessions:
+                self.store.save_sessions(sessions)
+            if deleted:
+                self.store.delete_sessions(deleted)
+        except Exception as e:
+            print(f"Error flushing conversation memory: {e}")
+            # Put the work back so the next flush retries it
+            with self._lock:
+                self._dirty |= dirty - self._deleted
+                self._deleted |= deleted - self._dirty
+
+
+def create_conversation_store() -> ConversationStore:
+    """Create the backend selected by the CONVERSATION_STORE environment variable"""
+    backend = os.getenv("CONVERSATION_STORE", "kv" if os.getenv("SESSION_STORE_URL") else "sqlite").lower()
+    if backend == "kv":
+        return KeyValueConversationStore(create_session_store())
+    if backend == "json":
+        return JSONFileConversationStore(os.getenv("CONVERSATION_MEMORY_FILE", "conversation_memory.json"))
+    return SQLiteConversationStore(os.getenv("CONVERSATION_MEMORY_DB", "conversation_memory.db"))
@@ -0,0 +1,126 @@
+"""
+Database Executor
+Runs blocking SQLite work on a bounded thread pool so async handlers never stall the event loop,
+and measures how long the loop is blocked when something does
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+DB_WORKERS = 8
+DB_MAX_PENDING = 64  # calls queued or running before callers wait their turn
+LOOP_LAG_INTERVAL_SECONDS = 0.05
+LOOP_LAG_THRESHOLD_SECONDS = 0.1
+
+
+class BoundedExecutor:
+    """A dedicated thread pool for one kind of blocking work, with a cap on calls in flight
+
+    The database executor's workers each keep their own pooled connections.
+    """
+
+    def __init__(self, max_workers: int = DB_WORKERS, max_pending: int = DB_MAX_PENDING, name: str = "db"):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._slots_loop: Optional[asyncio.AbstractEventLoop] = None
+        self.calls = 0
+        self.max_wait = 0.0  # longest a call waited for a free slot
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run fn(*args, **kwargs) on one of the pool's threads and await its result"""
+        loop = asyncio.get_running_loop()
+        slots = self._get_slots(loop)
+        queued_at = time.perf_counter()
+        async with slots:
+            self.max_wait = max(self.max_wait, time.perf_counter() - queued_at)
+            self.calls += 1
+            return await loop.run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "calls": self.calls,
+            "max_wait_ms": round(self.max_wait * 1000, 2),
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+    def _get_slots(self, loop: asyncio.AbstractEventLoop) -> asyncio.Semaphore:
+        # Semaphores belong to one event loop; tests and reloads may start another
+        if self._slots is None or self._slots_loop is not loop:
+            self._slots = asyncio.Semaphore(self.max_pending)
+            self._slots_loop = loop
+        return self._slots
+
+
+class LoopLagMonitor:
+    """Sleeps in short ticks and records how late each tick wakes up, i.e. how long the loop was blocked"""
+
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL_SECONDS,
+                 threshold: float = LOOP_LAG_THRESHOLD_SECONDS):
+        self.interval = interval
+        self.threshold = threshold
+        self.max_lag = 0.0
+        self.last_lag = 0.0
+        self.blocked_count = 0  # ticks later than the threshold
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def reset(self):
+        self.max_lag = 0.0
+        self.last_lag = 0.0
+        self.blocked_count = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_lag_ms": round(self.max_lag * 1000, 2),
+            "last_lag_ms": round(self.last_lag * 1000, 2),
+            "blocked_count": self.blocked_count,
+            "threshold_ms": round(self.threshold * 1000, 2),
+        }
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - started - self.interval)
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            if lag > self.threshold:
+                self.blocked_count += 1
+                print(f"Event loop blocked for {lag * 1000:.0f} ms")
+
+
+# Global database executor and loop lag monitor
+db_executor = BoundedExecutor(DB_WORKERS, DB_MAX_PENDING, "db")
+loop_lag_monitor = LoopLagMonitor()
+
+
+async def run_db(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run blocking database work off the event loop"""
+    return await db_executor.run(fn, *args, **kwargs)
@@ -0,0 +1,130 @@
+"""
+FAQ Autocomplete Index
+Sorted-array prefix index over normalized FAQ questions for type-ahead
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+from bisect import bisect_left, insort
+from typing import Dict, List, Tuple
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace"""
+    return " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+
+
+class FAQAutocompleteIndex:
+    """Prefix index over FAQ questions, ranked by views"""
+
+    def __init__(self, max_scan: int = 500):
+        self.max_scan = max_scan
+        # Sorted (key, faq_id) pairs; every word start of a question is a key.
+        # Writers build a new list and swap the reference, so search never sees one mid-update
+        self.keys: List[Tuple[str, str]] = []
+        self.faqs: Dict[str, Dict] = {}  # faq_id -> {"question", "views", "category", "keys"}
+        self.loaded = False
+        self._lock = threading.Lock()
+
+    def load(self, faqs: List[Dict]):
+        """Build the index from scratch"""
+        keys = []
+        entries = {}
+        for faq in faqs:
+            entry = self._make_entry(faq)
+            entries[faq["id"]] = entry
+            keys.extend((key, faq["id"]) for key in entry["keys"])
+        keys.sort()
+
+        with self._lock:
+            self.keys = keys
+            self.faqs = entries
+            self.loaded = True
+
+    def upsert(self, faq: Dict):
+        """Add or replace a single FAQ in the index"""
+        entry = self._make_entry(faq)
+        with self._lock:
+            keys, faqs = self._copy_without_locked(faq["id"])
+            faqs[faq["id"]] = entry
+            for key in entry["keys"]:
+                insort(keys, (key, faq["id"]))
+            self.keys = keys
+            self.faqs = faqs
+
+    def remove(self, faq_id: str):
+        """Drop a FAQ from the index"""
+        with self._lock:
+            self.keys, self.faqs = self._copy_without_locked(faq_id)
+
+    def increment_views(self, faq_id: str):
+        """Bump the view count used for ranking"""
+        entry = self.faqs.get(faq_id)
+        if entry:
+            entry["views"] += 1
+
+    def search(self, prefix: str, limit: int = 5) -> List[Dict]:
+        """Get FAQs with a word starting with the prefix, most viewed first"""
+        normalized = normalize_text(prefix)
+        if not normalized:
+            return []
+
+        keys = self.keys
+        faqs = self.faqs
+        matches = {}
+        index = bisect_left(keys, (normalized,))
+        end = min(len(keys), index + self.max_scan)
+        while index < end:
+            key, faq_id = keys[index]
+            if not key.startswith(normalized):
+                break
+            entry = faqs.get(faq_id)
+            if entry is not None:
+                # A match at the start of the question beats a match mid-sentence
+                starts_question = key == entry["keys"][0]
+                if faq_id not in matches or starts_question:
+                    matches[faq_id] = (entry, starts_question)
+            index += 1
+
+        ranked = sorted(
+            matches.items(),
+            key=lambda item: (-item[1][0]["views"], not item[1][1], item[1][0]["question"])
+        )
+
+        return [
+            {
+                "id": faq_id,
+                "text": entry["question"],
+                "category": entry["category"],
+                "views": entry["views"]
+            }
+            for faq_id, (entry, _) in ranked[:limit]
+        ]
+
+    def _copy_without_locked(self, faq_id: str) -> Tuple[List[Tuple[str, str]], Dict[str, Dict]]:
+        """Copies of the key list and FAQ map with one FAQ taken out"""
+        keys = list(self.keys)
+        faqs = dict(self.faqs)
+        entry = faqs.pop(faq_id, None)
+        if entry:
+            for key in entry["keys"]:
+                position = bisect_left(keys, (key, faq_id))
+                if position < len(keys) and keys[position] == (key, faq_id):
+                    del keys[position]
+        return keys, faqs
+
+    def _make_entry(self, faq: Dict) -> Dict:
+        words = normalize_text(faq.get("question", "")).split()
+        keys = []
+        for i in range(len(words)):
+            key = " ".join(words[i:])
+            if key not in keys:
+                keys.append(key)
+        return {
+            "question": faq.get("question", ""),
+            "views": faq.get("views") or 0,
+            "category": faq.get("category", "General"),
+            "keys": keys or [""]
+        }
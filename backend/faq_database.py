@@ -4,21 +4,23 @@ Database-based FAQ System
 This allows any company to use the chatbot by just updating their database
 """
 
-import sqlite3
 import json
 from datetime import datetime
 from typing import List, Dict, Any, Optional
+from faq_autocomplete import FAQAutocompleteIndex
+from sqlite_pool import connect_db
 
 class FAQDatabase:
     """Database-based FAQ management system"""
     
     def __init__(self, db_path: str = "venturing.db"):
         self.db_path = db_path
+        self.autocomplete = FAQAutocompleteIndex()
         self.init_database()
     
     def init_database(self):
         """Initialize FAQ tables in database"""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect_db(self.db_path)
         cursor = conn.cursor()
         
         # Create FAQ categories table
@@ -67,7 +69,7 @@ class FAQDatabase:
     
     def _insert_default_categories(self):
         """Insert default FAQ categories"""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect_db(self.db_path)
         cursor = conn.cursor()
         
         default_categories = [
@@ -90,7 +92,7 @@ class FAQDatabase:
     
     def create_faq(self, question: str, answer: str, category_name: str = "General", custom_category: str = "") -> Dict[str, Any]:
         """Create a new FAQ in database"""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect_db(self.db_path)
         cursor = conn.cursor()
         
         try:
@@ -109,6 +111,14 @@ class FAQDatabase:
             
             conn.commit()
             
+            if self.autocomplete.loaded:
+                self.autocomplete.upsert({
+                    "id": f"faq_{faq_id}",
+                    "question": question,
+                    "category": category_name,
+                    "views": 0
+                })
+            
             return {
                 "id": faq_id,
                 "question": question,
@@ -129,7 +139,7 @@ class FAQDatabase:
     
     def get_all_faqs(self, active_only: bool = True) -> List[Dict[str, Any]]:
         """Get all FAQs from database"""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect_db(self.db_path)
         cursor = conn.cursor()
         
         query = '''
@@ -165,6 +175,16 @@ class FAQDatabase:
         conn.close()
         return faqs
     
+    def autocomplete_questions(self, prefix: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """Get FAQ questions matching a typed prefix, most viewed first"""
+        if not self.autocomplete.loaded:
+            self.load_autocomplete()
+        return self.autocomplete.search(prefix, limit)
+
+    def load_autocomplete(self):
+        """Build the autocomplete index from every active FAQ (done at startup, or off the event loop)"""
+        self.autocomplete.load(self.get_all_faqs())
+    
     def find_matching_faq(self, query: str) -> Optional[Dict[str, Any]]:
         """Find matching FAQ using improved keyword matching"""
         query_lower = query.lower().strip()
@@ -175,7 +195,7 @@ class FAQDatabase:
         # Extract meaningful keywords from query
         query_words = [word for word in query_lower.split() if word not in stop_words and len(word) > 2]
         
-        conn = sqlite3.connect(self.db_path)
+        conn = connect_db(self.db_path)
         cursor = conn.cursor()
         
         # Get all active FAQs
@@ -281,7 +301,7 @@ class FAQDatabase:
             # Extract numeric ID from faq_id (e.g., "faq_123" -> 123)
             numeric_id = int(faq_id.replace("faq_", ""))
             
-            conn = sqlite3.connect(self.db_path)
+            conn = connect_db(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -291,6 +311,8 @@ class FAQDatabase:
             
             conn.commit()
             conn.close()
+            
+            self.autocomplete.increment_views(faq_id)
             return True
         except Exception as e:
             print(f"Error incrementing views: {e}")
@@ -301,7 +323,7 @@ class FAQDatabase:
         try:
             numeric_id = int(faq_id.replace("faq_", ""))
             
-            conn = sqlite3.connect(self.db_path)
+            conn = connect_db(self.db_path)
             cursor = conn.cursor()
             
             # Build update query dynamically
@@ -330,7 +352,15 @@ class FAQDatabase:
                 conn.commit()
             
             conn.close()
-            return self.get_faq_by_id(faq_id)
+            
+            updated_faq = self.get_faq_by_id(faq_id)
+            if updated_faq and updated_faq["is_active"]:
+                if self.autocomplete.loaded:
+                    self.autocomplete.upsert(updated_faq)
+            else:
+                # Inactive or gone: it must not be suggested any more
+                self.autocomplete.remove(faq_id)
+            return updated_faq
         except Exception as e:
             print(f"Error updating FAQ: {e}")
             return None
@@ -340,7 +370,7 @@ class FAQDatabase:
         try:
             numeric_id = int(faq_id.replace("faq_", ""))
             
-            conn = sqlite3.connect(self.db_path)
+            conn = connect_db(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -350,6 +380,8 @@ class FAQDatabase:
             
             conn.commit()
             conn.close()
+            
+            self.autocomplete.remove(faq_id)
             return True
         except Exception as e:
             print(f"Error deleting FAQ: {e}")
@@ -360,7 +392,7 @@ class FAQDatabase:
         try:
             numeric_id = int(faq_id.replace("faq_", ""))
             
-            conn = sqlite3.connect(self.db_path)
+            conn = connect_db(self.db_path)
             cursor = conn.cursor()
             
             # First check if FAQ exists
@@ -374,6 +406,8 @@ class FAQDatabase:
             
             conn.commit()
             conn.close()
+            
+            self.autocomplete.remove(faq_id)
             return True
         except Exception as e:
             print(f"Error hard deleting FAQ: {e}")
@@ -384,7 +418,7 @@ class FAQDatabase:
         try:
             numeric_id = int(faq_id.replace("faq_", ""))
             
-            conn = sqlite3.connect(self.db_path)
+            conn = connect_db(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -0,0 +1,188 @@
+"""
+FAQ Transition Model for Venturing Digitally Chatbot
+Learns which FAQ users tend to ask after which, from conversation history
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+
+
+class FAQTransitionModel:
+    """Sparse FAQ -> next-FAQ transition counts with precomputed top-k rows"""
+
+    def __init__(self, model_file: str = "data/faq_transitions.json", top_k: int = 5,
+                 rebuild_interval: int = 30):
+        self.model_file = model_file
+        self.top_k = top_k
+        self.rebuild_interval = rebuild_interval
+
+        # Sparse matrix in dictionary-of-keys form: from_faq -> {to_faq: count}
+        self.counts: Dict[str, Dict[str, int]] = {}
+        # Served rows: from_faq -> ((to_faq, question), ...) sorted by count, at most top_k long
+        self.rows: Dict[str, Tuple[Tuple[str, str], ...]] = {}
+        self.questions: Dict[str, str] = {}
+
+        self._pending: Deque[Tuple[str, str]] = deque()
+        # FAQs edited or deleted since the last flush; their cached questions are dropped by the worker
+        self._invalidated: Deque[str] = deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+
+        self.load_model()
+
+    def load_model(self):
+        """Load transition counts from file and rebuild the served rows"""
+        try:
+            if os.path.exists(self.model_file):
+                with open(self.model_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self.counts = {
+                    from_id: {to_id: int(count) for to_id, count in row.items()}
+                    for from_id, row in data.get('transitions', {}).items()
+                }
+                self.questions = data.get('questions', {})
+                self._rebuild_rows(self.counts.keys())
+        except Exception as e:
+            print(f"Error loading FAQ transition model: {e}")
+            self.counts = {}
+            self.rows = {}
+
+    def save_model(self, snapshot: Optional[Dict] = None):
+        """Save transition counts to file, from a snapshot taken under the lock when given"""
+        if snapshot is None:
+            snapshot = {'transitions': self.counts, 'questions': self.questions}
+        try:
+            directory = os.path.dirname(self.model_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_file = f"{self.model_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_file, self.model_file)
+        except Exception as e:
+            print(f"Error saving FAQ transition model: {e}")
+
+    def record_transition(self, from_faq_id: Optional[str], to_faq_id: str):
+        """Queue an observed FAQ -> FAQ transition (O(1), safe to call on the chat path)"""
+        if not from_faq_id or not to_faq_id or from_faq_id == to_faq_id:
+            return
+        self._pending.append((from_faq_id, to_faq_id))
+
+    def build_from_sessions(self, sessions: Iterable[Dict]):
+        """Mine transitions from stored conversation sessions (offline build)"""
+        for session in sessions:
+            previous_faq_id = None
+            for turn in session.get('conversation', []):
+                faq_id = turn.get('faq_id')
+                if faq_id:
+                    self.record_transition(previous_faq_id, faq_id)
+                previous_faq_id = faq_id
+        self.flush_pending()
+
+    def get_next_questions(self, faq_id: str, limit: int = 3) -> List[Tuple[str, str]]:
+        """Get the most likely next FAQs as (faq_id, question) pairs"""
+        return list(self.rows.get(faq_id, ())[:limit])
+
+    def flush_pending(self) -> int:
+        """Fold queued transitions and FAQ invalidations into the model and rebuild the touched rows"""
+        with self._lock:
+            touched = set()
+            folded = 0
+            while self._pending:
+                from_id, to_id = self._pending.popleft()
+                row = self.counts.setdefault(from_id, {})
+                row[to_id] = row.get(to_id, 0) + 1
+                touched.add(from_id)
+                folded += 1
+
+            invalidated = set()
+            while self._invalidated:
+                faq_id = self._invalidated.popleft()
+                self.questions.pop(faq_id, None)
+                invalidated.add(faq_id)
+            if invalidated:
+                touched.update(from_id for from_id, row in self.rows.items()
+                               if any(to_id in invalidated for to_id, _ in row))
+
+            if not touched and not invalidated:
+                return folded
+
+            self._rebuild_rows(touched)
+            snapshot = {
+                'transitions': {from_id: dict(row) for from_id, row in self.counts.items()},
+                'questions': dict(self.questions),
+            }
+
+        self.save_model(snapshot)
+        return folded
+
+    def _rebuild_rows(self, faq_ids: Iterable[str]):
+        """Recompute the served top-k rows for the given source FAQs"""
+        for faq_id in list(faq_ids):
+            row = self.counts.get(faq_id, {})
+            ranked = sorted(row.items(), key=lambda item: item[1], reverse=True)
+
+            top = []
+            for to_id, _ in ranked:
+                question = self._resolve_question(to_id)
+                if question:
+                    top.append((to_id, question))
+                    if len(top) >= self.top_k:
+                        break
+
+            self.rows[faq_id] = tuple(top)
+
+    def _resolve_question(self, faq_id: str) -> Optional[str]:
+        """Look up the question text for an FAQ, skipping inactive or deleted FAQs"""
+        if faq_id in self.questions:
+            return self.questions[faq_id]
+
+        try:
+            from faq_database import faq_db
+            faq = faq_db.get_faq_by_id(faq_id)
+        except Exception as e:
+            print(f"Error resolving FAQ {faq_id}: {e}")
+            return None
+
+        if not faq or not faq.get('is_active'):
+            return None
+
+        self.questions[faq_id] = faq['question']
+        return faq['question']
+
+    def invalidate_faq(self, faq_id: str):
+        """Queue an edited or deleted FAQ; the background job re-resolves the rows that suggest it"""
+        self._invalidated.append(faq_id)
+
+    def start(self):
+        """Start the background job that folds new transitions into the model"""
+        if self._worker and self._worker.is_alive():
+            return
+        self._wakeup.clear()
+        self._worker = threading.Thread(target=self._run, name="faq-transition-model", daemon=True)
+        self._worker.start()
+
+    def stop(self):
+        """Stop the background job and fold anything still pending"""
+        self._wakeup.set()
+        if self._worker:
+            self._worker.join(timeout=5)
+            self._worker = None
+        self.flush_pending()
+
+    def _run(self):
+        while not self._wakeup.wait(self.rebuild_interval):
+            try:
+                self.flush_pending()
+            except Exception as e:
+                print(f"Error rebuilding FAQ transition model: {e}")
+
+
+# Global instance
+faq_transition_model = FAQTransitionModel()
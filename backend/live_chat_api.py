@@ -3,13 +3,26 @@ from __future__ import annotations
 import json
 import sqlite3
 import asyncio
-from datetime import datetime, timedelta
-from typing import List, Optional
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException, Depends, BackgroundTasks
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set, Tuple, Union
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from auth_router import verify_token
+from message_envelope import MessageEnvelope, envelope
+from chat_request_expiry import REQUEST_TIMEOUT_SECONDS, chat_request_expiry, expires_at_to_iso, format_db_time
+from chat_request_queue import pending_requests
+from chat_assignment import assignment_engine
+from agent_directory import agent_directory
+from chat_queries import (
+    AGENT_ACTIVE_SESSION_COUNT_SQL, AGENT_ACTIVE_SESSIONS_SQL, ALL_SESSIONS_BEFORE_SQL, ALL_SESSIONS_SQL,
+    PENDING_REQUESTS_SQL, REJECTED_REQUESTS_SQL, SESSION_MESSAGES_AFTER_SQL, SESSION_MESSAGES_BEFORE_SQL,
+)
+from user_management_db import user_db
+from sqlite_pool import connect_db
+from db_executor import run_db
 
 router = APIRouter(prefix="/chat")
 security = HTTPBearer()
@@ -50,6 +63,9 @@ class ChatMessage(BaseModel):
     message_type: str = "text"
     created_at: str
 
+class AgentSkillsUpdate(BaseModel):
+    category_ids: List[int]
+
 class ChatSession(BaseModel):
     id: int
     request_id: int
@@ -60,98 +76,255 @@ class ChatSession(BaseModel):
     ended_at: Optional[str]
 
 # Database connection
+MESSAGE_PAGE_SIZE = 50
+SESSION_PAGE_SIZE = 100
+MAX_SESSION_PAGE_SIZE = 500
+MAX_MESSAGE_PAGE_SIZE = 200
+
+# Route new requests straight to the least-loaded eligible agent instead of waiting for a click
+AUTO_ASSIGN_CHATS = True
+HELD_MESSAGE_TTL_SECONDS = 300
+SUPPORT_ROLES = {"Super Admin", "Support"}
+CHAT_MESSAGE_FIELDS = ("session_id", "sender_type", "sender_id", "message")
+
+# Outgoing WebSocket queues
+SEND_QUEUE_SIZE = 100
+SEND_TIMEOUT_SECONDS = 5.0
+SLOW_CONSUMER_POLICY = "close"  # "close" the socket or "drop_oldest" queued message when a queue is full
+
 def get_db_connection():
-    conn = sqlite3.connect('venturing.db', check_same_thread=False)
+    conn = connect_db('venturing.db')
     conn.row_factory = sqlite3.Row
     return conn
 
-def save_message_to_json(session_id: int, sender_type: str, sender_id: str, message: str, message_type: str = "text"):
-    """Save message to database in JSON format"""
+async def start_chat_session(request_id: int, request, session_id: int, agent_id, support_name: str):
+    """Wire up a session an agent has just taken and tell the user"""
+    agent_id = str(agent_id)
+    chat_request_expiry.cancel(request_id)
+    manager.open_session(session_id, request["user_id"], agent_id)
+    await publish_request_removed(request_id, "accepted")
+    
+    # Notify user, holding the message if their socket isn't open yet
+    notification_data = {
+        "type": "chat_accepted",
+        "data": {
+            "session_id": session_id,
+            "support_user_id": agent_id,
+            "support_name": support_name,
+            "user_name": request["user_name"] if request["user_name"] else "User",
+            "message": "Your chat request has been accepted. You can now start chatting!"
+        }
+    }
+    await manager.send_to_user(request["user_id"], envelope(notification_data), hold=True)
+
+async def assign_to_agent(request_id: int, agent_id: str) -> bool:
+    """Give a pending request to an agent holding a reserved slot, without waiting for them to accept it"""
+    try:
+        accepted = await run_db(accept_request_atomically, request_id, agent_id)
+    except Exception:
+        assignment_engine.release(agent_id)
+        raise
+    if not accepted:
+        assignment_engine.release(agent_id)
+        return False
+    request, session_id = accepted
+    
+    await start_chat_session(request_id, request, session_id, agent_id,
+                             assignment_engine.names.get(agent_id, "Support Agent"))
+    await manager.send_to_support(agent_id, envelope({
+        "type": "chat_assigned",
+        "data": {
+            "session_id": session_id,
+            "request_id": request_id,
+            "user_id": request["user_id"],
+            "user_name": request["user_name"] or "Anonymous"
+        }
+    }))
+    return True
+
+async def auto_assign_request(request_id: int, category_id: Optional[int]) -> bool:
+    """Assign a new request to the least-loaded eligible agent; False means it waits in the queue"""
+    if not AUTO_ASSIGN_CHATS:
+        return False
+    agent_id = assignment_engine.pick(category_id)
+    if agent_id is None:
+        return False
+    return await assign_to_agent(request_id, agent_id)
+
+async def assign_pending_requests(agent_id: str):
+    """Fill an agent's free capacity from the queue, oldest request first"""
+    if not AUTO_ASSIGN_CHATS:
+        return
+    for request in await get_pending_requests():
+        if not assignment_engine.has_capacity(agent_id):
+            break
+        if assignment_engine.reserve(agent_id, request.get("category_id")):
+            await assign_to_agent(request["id"], agent_id)
+
+def init_chat_messages_table():
+    """Create the append-only chat_messages table, migrating legacy per-session JSON blobs into rows"""
     conn = get_db_connection()
     cursor = conn.cursor()
     
-    # Check if session already has messages
-    cursor.execute("""
-        SELECT messages_json, message_count FROM chat_messages 
-        WHERE session_id = ?
-    """, (session_id,))
-    
-    existing = cursor.fetchone()
-    
-    if existing:
-        # Update existing session
-        messages_data = json.loads(existing[0])
-        messages_data.append({
-            "sender_type": sender_type,
-            "sender_id": sender_id,
-            "message": message,
-            "message_type": message_type,
-            "created_at": datetime.now().isoformat()
-        })
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        columns = [row["name"] for row in cursor.execute("PRAGMA table_info(chat_messages)").fetchall()]
+        legacy = "messages_json" in columns
+        if legacy:
+            cursor.execute("ALTER TABLE chat_messages RENAME TO chat_messages_legacy")
         
         cursor.execute("""
-            UPDATE chat_messages 
-            SET messages_json = ?, message_count = ?, last_message = ?, 
-                last_sender = ?, updated_at = ?
-            WHERE session_id = ?
-        """, (
-            json.dumps(messages_data),
-            len(messages_data),
-            message,
-            sender_type,
-            datetime.now().isoformat(),
-            session_id
-        ))
-    else:
-        # Create new session
-        messages_data = [{
-            "sender_type": sender_type,
-            "sender_id": sender_id,
-            "message": message,
-            "message_type": message_type,
-            "created_at": datetime.now().isoformat()
-        }]
-        
+            CREATE TABLE IF NOT EXISTS chat_messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id INTEGER NOT NULL,
+                sender_type TEXT NOT NULL,
+                sender_id TEXT NOT NULL,
+                message TEXT NOT NULL,
+                message_type TEXT DEFAULT 'text',
+                is_read BOOLEAN DEFAULT 0,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (session_id) REFERENCES chat_sessions(id)
+            )
+        """)
         cursor.execute("""
-            INSERT INTO chat_messages 
-            (session_id, messages_json, message_count, last_message, last_sender, created_at, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (
-            session_id,
-            json.dumps(messages_data),
-            1,
-            message,
-            sender_type,
-            datetime.now().isoformat(),
-            datetime.now().isoformat()
-        ))
+            CREATE INDEX IF NOT EXISTS idx_chat_messages_session_id
+            ON chat_messages(session_id, id)
+        """)
+        
+        if legacy:
+            # Explode each session's blob into one row per message, keeping the original order
+            rows = []
+            cursor.execute("SELECT session_id, messages_json FROM chat_messages_legacy ORDER BY session_id")
+            for legacy_row in cursor.fetchall():
+                try:
+                    messages_data = json.loads(legacy_row["messages_json"] or "[]")
+                except ValueError as e:
+                    print(f"Skipping corrupt chat history for session {legacy_row['session_id']}: {e}")
+                    continue
+                for msg in messages_data:
+                    rows.append((
+                        legacy_row["session_id"],
+                        msg.get("sender_type", "user"),
+                        str(msg.get("sender_id", "")),
+                        msg.get("message", ""),
+                        msg.get("message_type", "text"),
+                        msg.get("created_at") or datetime.now().isoformat()
+                    ))
+            cursor.executemany("""
+                INSERT INTO chat_messages (session_id, sender_type, sender_id, message, message_type, created_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, rows)
+            print(f"Migrated {len(rows)} chat messages from chat_messages_legacy")
+        
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print(f"Error initializing chat messages table: {e}")
+    finally:
+        conn.close()
+
+def init_agent_skills_table():
+    """Create the table of categories each support agent handles"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS chat_agent_skills (
+            support_user_id INTEGER NOT NULL,
+            category_id INTEGER NOT NULL,
+            PRIMARY KEY (support_user_id, category_id),
+            FOREIGN KEY (category_id) REFERENCES chat_categories(id)
+        )
+    """)
     
     conn.commit()
     conn.close()
 
-async def timeout_chat_request(request_id: int, user_id: str):
-    """Timeout a chat request after 120 seconds (2 minutes) if not accepted"""
-    await asyncio.sleep(120)  # Wait 120 seconds (2 minutes)
+def load_agent_profile(agent_id: str) -> Tuple[List[int], int]:
+    """Get an agent's category skills and number of active sessions"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute("SELECT category_id FROM chat_agent_skills WHERE support_user_id = ?", (agent_id,))
+    skills = [row["category_id"] for row in cursor.fetchall()]
+    
+    cursor.execute(AGENT_ACTIVE_SESSION_COUNT_SQL, (agent_id,))
+    active_sessions = cursor.fetchone()[0]
     
+    conn.close()
+    return skills, active_sessions
+
+def save_chat_message(session_id: int, sender_type: str, sender_id: str, message: str, message_type: str = "text") -> int:
+    """Append a single message row and return its ID"""
     conn = get_db_connection()
     cursor = conn.cursor()
     
-    # Check if request is still pending
-    cursor.execute("SELECT status FROM chat_requests WHERE id = ?", (request_id,))
-    result = cursor.fetchone()
+    cursor.execute("""
+        INSERT INTO chat_messages (session_id, sender_type, sender_id, message, message_type, created_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (session_id, sender_type, str(sender_id), message, message_type, datetime.now().isoformat()))
+    
+    message_id = cursor.lastrowid
+    conn.commit()
+    conn.close()
+    return message_id
+
+def fetch_session_messages(cursor, session_id: int, before_id: Optional[int] = None,
+                           after_id: Optional[int] = None, limit: int = MESSAGE_PAGE_SIZE):
+    """Get one page of a session's messages in ID order, using (session_id, id) as the keyset"""
+    limit = max(1, min(limit, MAX_MESSAGE_PAGE_SIZE))
+    
+    if after_id is not None:
+        # Delta since the last message the client has seen, oldest first
+        cursor.execute(SESSION_MESSAGES_AFTER_SQL, (session_id, after_id, limit + 1))
+        rows = cursor.fetchall()
+        return rows[:limit], len(rows) > limit
+    
+    # Latest page, or the page just before before_id when scrolling back
+    cursor.execute(SESSION_MESSAGES_BEFORE_SQL, (session_id, before_id if before_id is not None else 2 ** 63 - 1, limit + 1))
+    rows = cursor.fetchall()
+    return rows[:limit][::-1], len(rows) > limit
+
+# request_id -> agent currently accepting it
+request_claims: Dict[int, str] = {}
+
+def accept_request_atomically(request_id: int, support_user_id) -> Optional[Tuple[sqlite3.Row, int]]:
+    """Claim a pending request and open its chat session in one transaction; None if it was no longer pending"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
     
-    if result and result['status'] == 'pending':
-        # Timeout the request
+    try:
+        # Take the write lock up front so concurrent accepts serialize on the conditional update
+        cursor.execute("BEGIN IMMEDIATE")
         cursor.execute("""
             UPDATE chat_requests 
-            SET status = 'timeout', 
-                rejected_at = CURRENT_TIMESTAMP,
-                rejection_reason = 'Request timed out - no support agent available'
-            WHERE id = ?
-        """, (request_id,))
-        conn.commit()
+            SET status = 'accepted', assigned_to = ?, accepted_at = ?
+            WHERE id = ? AND status = 'pending' AND expires_at > datetime('now')
+            RETURNING user_id, user_name
+        """, (support_user_id, datetime.now().isoformat(), request_id))
+        request = cursor.fetchone()
+        if not request:
+            conn.rollback()
+            return None
+        
+        # Create chat session with the accepting support agent's ID and local time
+        cursor.execute("""
+            INSERT INTO chat_sessions (request_id, user_id, support_user_id, started_at_local)
+            VALUES (?, ?, ?, datetime('now', 'localtime'))
+        """, (request_id, request["user_id"], support_user_id))
+        session_id = cursor.lastrowid
         
-        # Notify user about timeout
+        conn.commit()
+        return request, session_id
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+async def notify_request_timeouts(expired: List[Tuple[int, str]]):
+    """Tell users whose chat requests timed out (called by the expiry scheduler)"""
+    for request_id, user_id in expired:
         timeout_message = {
             "type": "request_timeout",
             "data": {
@@ -159,143 +332,345 @@ async def timeout_chat_request(request_id: int, user_id: str):
                 "request_id": request_id
             }
         }
-        await manager.send_to_user(user_id, json.dumps(timeout_message))
-    
+        await manager.send_to_user(user_id, envelope(timeout_message))
+        await publish_request_removed(request_id, "timeout")
+
+def queue_entry(row) -> dict:
+    """Shape a chat_requests row (joined with category names) for the agent queue"""
+    return {
+        "id": row["id"],
+        "user_name": row["user_name"] or "Anonymous",
+        "user_email": row["user_email"],
+        "category_id": row["category_id"],
+        "category_name": row["category_name"],
+        "subcategory_name": row["subcategory_name"],
+        "message": row["message"],
+        "created_at": row["created_at"],
+        "expires_at": expires_at_to_iso(row["expires_at"])
+    }
+
+def load_pending_requests() -> List[dict]:
+    """Read the pending queue from the database"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(PENDING_REQUESTS_SQL)
+    requests = [queue_entry(row) for row in cursor.fetchall()]
     conn.close()
+    return requests
+
+async def get_pending_requests() -> List[dict]:
+    """Get the pending queue, loading it from the database the first time"""
+    if not pending_requests.loaded:
+        async with pending_requests_load_lock:
+            if not pending_requests.loaded:
+                pending_requests.start_loading()
+                try:
+                    pending_requests.load(await run_db(load_pending_requests))
+                except BaseException:
+                    pending_requests.abandon_loading()
+                    raise
+    return pending_requests.snapshot()
+
+async def publish_request_added(request: dict):
+    """Add a request to the queue and push it to connected agents"""
+    pending_requests.add(request)
+    await manager.broadcast_to_support(envelope({"type": "queue_request_added", "data": request}))
+
+async def publish_request_removed(request_id: int, reason: str):
+    """Take a request off the queue and tell connected agents"""
+    if pending_requests.remove(request_id) is None and pending_requests.loaded:
+        return  # Never queued, e.g. assigned as soon as it was created
+    await manager.broadcast_to_support(envelope({
+        "type": "queue_request_removed",
+        "data": {"request_id": request_id, "reason": reason}
+    }))
+
+class SocketSender:
+    """Bounded outgoing queue for one WebSocket, drained by its own writer task"""
+
+    def __init__(self, websocket: WebSocket, on_dead: Callable[["SocketSender"], None]):
+        self.websocket = websocket
+        self.on_dead = on_dead
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SEND_QUEUE_SIZE)
+        self.dropped = 0
+        self.too_slow = False
+        self.closed = False
+        self.task = asyncio.create_task(self._run())
+
+    def send(self, message: Union[str, MessageEnvelope]) -> bool:
+        """Queue a message without waiting for the socket; False if the socket is gone"""
+        if self.closed:
+            return False
+        if isinstance(message, MessageEnvelope):
+            # Encoded once and cached, however many sockets it goes to
+            message = message.text
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            pass
+        
+        # Slow consumer: either lose its oldest message or disconnect it so it reconnects and catches up
+        if SLOW_CONSUMER_POLICY == "drop_oldest":
+            self.queue.get_nowait()
+            self.queue.put_nowait(message)
+            self.dropped += 1
+            return True
+        self.too_slow = True
+        self.close()
+        return False
+
+    def close(self):
+        """Stop the writer and unregister the socket"""
+        if self.closed:
+            return
+        self.closed = True
+        self.task.cancel()
+        self.on_dead(self)
+        if self.too_slow:
+            # Tell the client why, so it reconnects and fetches what it missed
+            asyncio.create_task(self._close_socket(1013))
+
+    async def _close_socket(self, code: int):
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+
+    async def _send_batch(self, messages: List[str]):
+        for message in messages:
+            await self.websocket.send_text(message)
+
+    async def _run(self):
+        try:
+            # Checked every turn: wait_for can swallow a cancel that lands as a send completes
+            while not self.closed:
+                # Send whatever has piled up in one go, under a single timeout
+                messages = [await self.queue.get()]
+                while not self.queue.empty():
+                    messages.append(self.queue.get_nowait())
+                await asyncio.wait_for(self._send_batch(messages), timeout=SEND_TIMEOUT_SECONDS)
+        except asyncio.CancelledError:
+            pass
+        except asyncio.TimeoutError:
+            self.too_slow = True
+            self.close()
+        except Exception as e:
+            print(f"Dropping dead WebSocket connection: {e}")
+            self.close()
+
+def load_session_participants(session_id: int) -> Optional[sqlite3.Row]:
+    """Read an active session's user_id and support_user_id from the database"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT user_id, support_user_id FROM chat_sessions 
+        WHERE id = ? AND status = 'active'
+    """, (session_id,))
+    session = cursor.fetchone()
+    conn.close()
+    return session
 
 # WebSocket connection manager
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
-        self.user_connections: dict = {}  # user_id -> WebSocket
-        self.support_connections: dict = {}  # support_user_id -> WebSocket
+        self.active_connections: Set[WebSocket] = set()
+        self.user_connections: Dict[str, SocketSender] = {}  # user_id -> sender
+        self.support_connections: Dict[str, SocketSender] = {}  # support_user_id -> sender
+        self.session_participants: Dict[int, Tuple[str, str]] = {}  # session_id -> (user_id, support_user_id)
+        self.held_messages: Dict[str, Tuple[float, List]] = {}  # user_id -> (held_at, messages) awaiting their socket
 
     async def connect(self, websocket: WebSocket, user_id: str, user_type: str = "user"):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        self.active_connections.add(websocket)
         
-        if user_type == "user":
-            self.user_connections[user_id] = websocket
-        else:
-            self.support_connections[user_id] = websocket
+        connections = self.user_connections if user_type == "user" else self.support_connections
+        previous = connections.get(user_id)
+        connections[user_id] = SocketSender(websocket, lambda sender: self._prune(sender, user_id, user_type))
+        if previous:
+            previous.close()
+        
+        # Deliver anything sent before the user's socket was open
+        held = self.held_messages.pop(user_id, None) if user_type == "user" else None
+        if held:
+            for message in held[1]:
+                connections[user_id].send(message)
 
     def disconnect(self, websocket: WebSocket, user_id: str, user_type: str = "user"):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+        self.active_connections.discard(websocket)
         
-        if user_type == "user" and user_id in self.user_connections:
-            del self.user_connections[user_id]
-        elif user_type == "support" and user_id in self.support_connections:
-            del self.support_connections[user_id]
+        # Only drop the mapping if it still points at this socket, not at a newer reconnect
+        connections = self.user_connections if user_type == "user" else self.support_connections
+        sender = connections.get(user_id)
+        if sender and sender.websocket is websocket:
+            del connections[user_id]
+            sender.close()
+
+    def _prune(self, sender: SocketSender, user_id: str, user_type: str):
+        """Forget a socket whose writer has stopped"""
+        self.active_connections.discard(sender.websocket)
+        connections = self.user_connections if user_type == "user" else self.support_connections
+        if connections.get(user_id) is sender:
+            del connections[user_id]
+
+    def open_session(self, session_id: int, user_id: str, support_user_id):
+        """Remember who is in a chat session so messages can be routed without a database lookup"""
+        self.session_participants[session_id] = (user_id, str(support_user_id))
+
+    def close_session(self, session_id: int):
+        self.session_participants.pop(session_id, None)
+
+    async def get_session_participants(self, session_id: int) -> Optional[Tuple[str, str]]:
+        """Get (user_id, support_user_id) for an active session"""
+        try:
+            session_id = int(session_id)
+        except (TypeError, ValueError):
+            return None
+        participants = self.session_participants.get(session_id)
+        if participants is None:
+            # Sessions accepted before a restart aren't in memory yet
+            session = await run_db(load_session_participants, session_id)
+            if session:
+                self.session_participants.setdefault(session_id, (session["user_id"], str(session["support_user_id"])))
+                participants = self.session_participants[session_id]
+        return participants
 
     async def send_personal_message(self, message: str, websocket: WebSocket):
         await websocket.send_text(message)
 
-    async def send_to_user(self, user_id: str, message: str):
-        if user_id in self.user_connections:
-            await self.user_connections[user_id].send_text(message)
+    async def send_to_user(self, user_id: str, message: Union[str, MessageEnvelope], hold: bool = False):
+        """Send to a user's socket; with hold, keep the message for a socket that hasn't connected yet"""
+        sender = self.user_connections.get(user_id)
+        if sender:
+            sender.send(message)
+        elif hold:
+            now = time.time()
+            for held_user_id, (held_at, _) in list(self.held_messages.items()):
+                if now - held_at > HELD_MESSAGE_TTL_SECONDS:
+                    del self.held_messages[held_user_id]
+            self.held_messages.setdefault(user_id, (now, []))[1].append(message)
 
-    async def send_to_support(self, support_user_id: str, message: str):
-        if support_user_id in self.support_connections:
-            await self.support_connections[support_user_id].send_text(message)
+    async def send_to_support(self, support_user_id: str, message: Union[str, MessageEnvelope]):
+        sender = self.support_connections.get(support_user_id)
+        if sender:
+            sender.send(message)
 
-    async def broadcast_to_support(self, message: str):
-        for connection in self.support_connections.values():
-            await connection.send_text(message)
+    async def broadcast_to_support(self, message: Union[str, MessageEnvelope]):
+        # Only enqueues, so one slow agent can't hold up the others
+        for sender in list(self.support_connections.values()):
+            sender.send(message)
 
-    async def broadcast_to_session(self, session_id: int, message: str):
-        """Broadcast message to all users in a specific session"""
-        # Send to all user connections (since we don't track session-specific connections)
-        for connection in self.user_connections.values():
-            await connection.send_text(message)
+    async def broadcast_to_session(self, session_id: int, message: Union[str, MessageEnvelope]):
+        """Send a message to both participants of a session"""
+        participants = await self.get_session_participants(session_id)
+        if participants:
+            user_id, support_user_id = participants
+            await self.send_to_user(user_id, message)
+            await self.send_to_support(support_user_id, message)
 
 manager = ConnectionManager()
+pending_requests_load_lock = asyncio.Lock()
 
 # API Endpoints
 
 @router.get("/categories")
 async def get_chat_categories():
     """Get available chat categories"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT id, name, description 
-        FROM chat_categories 
-        WHERE is_active = 1 
-        ORDER BY name
-    """)
     
-    categories = [dict(row) for row in cursor.fetchall()]
-    conn.close()
+    def query():
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT id, name, description 
+            FROM chat_categories 
+            WHERE is_active = 1 
+            ORDER BY name
+        """)
+        
+        categories = [dict(row) for row in cursor.fetchall()]
+        conn.close()
+        
+        return {"categories": categories}
     
-    return {"categories": categories}
+    return await run_db(query)
 
 @router.get("/subcategories/{category_id}")
 async def get_subcategories_by_category(category_id: int):
     """Get subcategories for a specific category (public endpoint)"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
     
-    cursor.execute("""
-        SELECT id, category_id, name, description, is_active
-        FROM chat_subcategories 
-        WHERE category_id = ? AND is_active = 1
-        ORDER BY name
-    """, (category_id,))
-    
-    subcategories = []
-    for row in cursor.fetchall():
-        subcategories.append({
-            "id": row["id"],
-            "category_id": row["category_id"],
-            "name": row["name"],
-            "description": row["description"],
-            "is_active": bool(row["is_active"])
-        })
+    def query():
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT id, category_id, name, description, is_active
+            FROM chat_subcategories 
+            WHERE category_id = ? AND is_active = 1
+            ORDER BY name
+        """, (category_id,))
+        
+        subcategories = []
+        for row in cursor.fetchall():
+            subcategories.append({
+                "id": row["id"],
+                "category_id": row["category_id"],
+                "name": row["name"],
+                "description": row["description"],
+                "is_active": bool(row["is_active"])
+            })
+        
+        conn.close()
+        return subcategories
     
-    conn.close()
-    return subcategories
+    return await run_db(query)
 
 @router.post("/request")
-async def create_chat_request(request: ChatRequestCreate, background_tasks: BackgroundTasks):
+async def create_chat_request(request: ChatRequestCreate):
     """Create a new chat request"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
     # Generate anonymous user ID
     user_id = f"user_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{hash(request.user_email or 'anonymous') % 10000}"
+    created_at = time.time()
+    expires_at = created_at + REQUEST_TIMEOUT_SECONDS
     
-    # Insert chat request
-    cursor.execute("""
-        INSERT INTO chat_requests (user_id, user_name, user_email, category_id, subcategory_id, message, expires_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    """, (
-        user_id,
-        request.user_name,
-        request.user_email,
-        request.category_id,
-        request.subcategory_id,
-        request.message,
-        (datetime.now() + timedelta(minutes=10)).isoformat()
-    ))
-    
-    request_id = cursor.lastrowid
-    
-    # Get category name
-    cursor.execute("SELECT name FROM chat_categories WHERE id = ?", (request.category_id,))
-    category_result = cursor.fetchone()
-    category_name = category_result["name"] if category_result else "Unknown Category"
-    
-    # Get subcategory name if provided
-    subcategory_name = None
-    if request.subcategory_id:
-        cursor.execute("SELECT name FROM chat_subcategories WHERE id = ?", (request.subcategory_id,))
-        subcategory_result = cursor.fetchone()
-        subcategory_name = subcategory_result["name"] if subcategory_result else None
+    def insert_request():
+        conn = get_db_connection()
+        cursor = conn.cursor()
     
-    conn.commit()
-    conn.close()
+        # Insert chat request
+        cursor.execute("""
+            INSERT INTO chat_requests (user_id, user_name, user_email, category_id, subcategory_id, message, created_at, expires_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            user_id,
+            request.user_name,
+            request.user_email,
+            request.category_id,
+            request.subcategory_id,
+            request.message,
+            format_db_time(created_at),
+            format_db_time(expires_at)
+        ))
+    
+        request_id = cursor.lastrowid
+    
+        # Get category name
+        cursor.execute("SELECT name FROM chat_categories WHERE id = ?", (request.category_id,))
+        category_result = cursor.fetchone()
+        category_name = category_result["name"] if category_result else "Unknown Category"
+    
+        # Get subcategory name if provided
+        subcategory_name = None
+        if request.subcategory_id:
+            cursor.execute("SELECT name FROM chat_subcategories WHERE id = ?", (request.subcategory_id,))
+            subcategory_result = cursor.fetchone()
+            subcategory_name = subcategory_result["name"] if subcategory_result else None
+    
+        conn.commit()
+        conn.close()
+        return request_id, category_name, subcategory_name
+
+    request_id, category_name, subcategory_name = await run_db(insert_request)
     
     # Broadcast to all support users
     notification = {
@@ -310,11 +685,28 @@ async def create_chat_request(request: ChatRequestCreate, background_tasks: Back
         }
     }
     
-    await manager.broadcast_to_support(json.dumps(notification))
+    # Time the request out if nobody accepts it
+    chat_request_expiry.schedule(request_id, user_id, expires_at)
+    
+    # Hand it straight to an agent with free capacity; otherwise it waits in the queue
+    assigned = await auto_assign_request(request_id, request.category_id)
+    if not assigned:
+        await manager.broadcast_to_support(envelope(notification))
+        await publish_request_added({
+            "id": request_id,
+            "user_name": request.user_name or "Anonymous",
+            "user_email": request.user_email,
+            "category_id": request.category_id,
+            "category_name": category_name,
+            "subcategory_name": subcategory_name,
+            "message": request.message,
+            "created_at": format_db_time(created_at),
+            "expires_at": expires_at_to_iso(format_db_time(expires_at))
+        })
     
     # Create notification for admin dashboard
     try:
-        from notification_stream import broadcast_new_notification
+        from notification_stream import notification_stream
         
         notification_data = {
             "title": "New Live Chat Request",
@@ -324,48 +716,53 @@ async def create_chat_request(request: ChatRequestCreate, background_tasks: Back
         }
         
         # Store notification in database
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO notifications (title, message, type, related_id, created_at)
-            VALUES (?, ?, ?, ?, ?)
-        """, (
-            notification_data["title"],
-            notification_data["message"],
-            notification_data["type"],
-            notification_data["related_id"],
-            datetime.now().isoformat()
-        ))
+        def insert_notification():
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO notifications (title, message, type, related_id, created_at)
+                VALUES (?, ?, ?, ?, ?)
+            """, (
+                notification_data["title"],
+                notification_data["message"],
+                notification_data["type"],
+                notification_data["related_id"],
+                datetime.now().isoformat()
+            ))
         
-        notification_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+            notification_id = cursor.lastrowid
+            conn.commit()
+            conn.close()
+            return notification_id
+
+        notification_id = await run_db(insert_notification)
         
         # Broadcast notification to all connected admins
-        import asyncio
-        asyncio.create_task(broadcast_new_notification({
-            "id": notification_id,
-            "title": notification_data["title"],
-            "message": notification_data["message"],
-            "type": notification_data["type"],
-            "related_id": notification_data["related_id"],
-            "is_read": 0,
-            "created_at": datetime.now().isoformat()
-        }))
+        asyncio.create_task(notification_stream.broadcast_notification(envelope({
+            "type": "new_notification",
+            "data": {
+                "id": notification_id,
+                "title": notification_data["title"],
+                "message": notification_data["message"],
+                "type": notification_data["type"],
+                "related_id": notification_data["related_id"],
+                "is_read": 0,
+                "created_at": datetime.now().isoformat()
+            }
+        })))
     except Exception as e:
         # Continue without notification if it fails
         pass
     
-    # Start timeout task
-    background_tasks.add_task(timeout_chat_request, request_id, user_id)
-    
     return {
         "success": True,
         "request_id": request_id,
         "user_id": user_id,
         "category_name": category_name,
         "subcategory_name": subcategory_name,
-        "message": "Chat request created successfully. Waiting for support agent..."
+        "assigned": assigned,
+        "message": "Chat request assigned to a support agent." if assigned
+                   else "Chat request created successfully. Waiting for support agent..."
     }
 
 @router.get("/requests")
@@ -375,32 +772,8 @@ async def get_chat_requests(credentials: HTTPAuthorizationCredentials = Depends(
     user_response = await verify_token(credentials)
     user = user_response["user"]
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT cr.*, cc.name as category_name, cs.name as subcategory_name
-        FROM chat_requests cr
-        JOIN chat_categories cc ON cr.category_id = cc.id
-        LEFT JOIN chat_subcategories cs ON cr.subcategory_id = cs.id
-        WHERE cr.status = 'pending' AND cr.expires_at > datetime('now')
-        ORDER BY cr.created_at ASC
-    """)
-    
-    requests = []
-    for row in cursor.fetchall():
-        requests.append({
-            "id": row["id"],
-            "user_name": row["user_name"] or "Anonymous",
-            "user_email": row["user_email"],
-            "category_name": row["category_name"],
-            "subcategory_name": row["subcategory_name"],
-            "message": row["message"],
-            "created_at": row["created_at"],
-            "expires_at": row["expires_at"]
-        })
-    
-    conn.close()
+    # Served from memory; the queue is kept current by request lifecycle events
+    requests = await get_pending_requests()
     return {"requests": requests}
 
 @router.post("/requests/{request_id}/accept")
@@ -415,53 +788,22 @@ async def accept_chat_request(request_id: int, credentials: HTTPAuthorizationCre
     if not user_id:
         raise HTTPException(status_code=400, detail="User ID not found in token")
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Check if request exists and is pending
-    cursor.execute("""
-        SELECT * FROM chat_requests 
-        WHERE id = ? AND status = 'pending' AND expires_at > datetime('now')
-    """, (request_id,))
+    # Agents in this process racing for the same request lose here, without touching the database
+    if request_claims.setdefault(request_id, user_id) != user_id:
+        raise HTTPException(status_code=409, detail="Chat request is already being accepted by another agent")
+    try:
+        accepted = await run_db(accept_request_atomically, request_id, user_id)
+    finally:
+        request_claims.pop(request_id, None)
     
-    request = cursor.fetchone()
-    if not request:
+    if not accepted:
         raise HTTPException(status_code=404, detail="Chat request not found or expired")
-    
-    # Update request status
-    cursor.execute("""
-        UPDATE chat_requests 
-        SET status = 'accepted', assigned_to = ?, accepted_at = ?
-        WHERE id = ?
-    """, (user_id, datetime.now().isoformat(), request_id))
-    
-    # Create chat session with proper support user ID and local time
-    # user_id is the actual logged-in support agent's ID
-    cursor.execute("""
-        INSERT INTO chat_sessions (request_id, user_id, support_user_id, started_at_local)
-        VALUES (?, ?, ?, datetime('now', 'localtime'))
-    """, (request_id, request["user_id"], user_id))
-    
-    session_id = cursor.lastrowid
-    
-    conn.commit()
-    conn.close()
+    request, session_id = accepted
     
     # Get support agent name dynamically
     support_name = user.get("full_name") or user.get("username") or "Support Agent"
-    
-    # Notify user
-    notification_data = {
-        "type": "chat_accepted",
-        "data": {
-            "session_id": session_id,
-            "support_user_id": user_id,
-            "support_name": support_name,
-            "user_name": request["user_name"] if request["user_name"] else "User",
-            "message": "Your chat request has been accepted. You can now start chatting!"
-        }
-    }
-    await manager.send_to_user(request["user_id"], json.dumps(notification_data))
+    assignment_engine.session_started(str(user_id))
+    await start_chat_session(request_id, request, session_id, user_id, support_name)
     
     return {
         "success": True,
@@ -471,6 +813,44 @@ async def accept_chat_request(request_id: int, credentials: HTTPAuthorizationCre
         "message": "Chat request accepted successfully"
     }
 
+@router.get("/agents/{agent_id}/skills")
+async def get_agent_skills(agent_id: int, credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Get the categories a support agent handles"""
+    await verify_token(credentials)
+    skills, active_sessions = await run_db(load_agent_profile, str(agent_id))
+    return {
+        "agent_id": agent_id,
+        "category_ids": skills,
+        "active_sessions": active_sessions,
+        "online": assignment_engine.is_online(str(agent_id))
+    }
+
+@router.put("/agents/{agent_id}/skills")
+async def update_agent_skills(agent_id: int, skills: AgentSkillsUpdate, credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Set the categories a support agent handles; an empty list means every category"""
+    await verify_token(credentials)
+    
+    def save_skills():
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM chat_agent_skills WHERE support_user_id = ?", (agent_id,))
+        cursor.executemany("""
+            INSERT OR IGNORE INTO chat_agent_skills (support_user_id, category_id)
+            VALUES (?, ?)
+        """, [(agent_id, category_id) for category_id in skills.category_ids])
+        conn.commit()
+        conn.close()
+    
+    await run_db(save_skills)
+    
+    # Re-route an online agent with their new skills straight away
+    agent_key = str(agent_id)
+    if assignment_engine.is_online(agent_key):
+        assignment_engine.agent_online(agent_key, skills.category_ids, assignment_engine.load[agent_key])
+        await assign_pending_requests(agent_key)
+    
+    return {"success": True, "agent_id": agent_id, "category_ids": skills.category_ids}
+
 @router.post("/request/cancel")
 async def cancel_chat_request(request_data: dict):
     """Cancel a chat request by user"""
@@ -480,35 +860,40 @@ async def cancel_chat_request(request_data: dict):
     if not user_id or not request_id:
         raise HTTPException(status_code=400, detail="user_id and request_id are required")
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    def cancel_request():
+        conn = get_db_connection()
+        cursor = conn.cursor()
     
-    # Check if request exists and belongs to user
-    cursor.execute("""
-        SELECT id, status FROM chat_requests 
-        WHERE id = ? AND user_id = ?
-    """, (request_id, user_id))
+        # Cancel only if still pending, so a concurrent accept can't be overwritten
+        cursor.execute("""
+            UPDATE chat_requests 
+            SET status = 'canceled', 
+                rejected_at = CURRENT_TIMESTAMP,
+                rejection_reason = 'Canceled by user'
+            WHERE id = ? AND user_id = ? AND status = 'pending'
+            RETURNING id
+        """, (request_id, user_id))
     
-    request = cursor.fetchone()
-    if not request:
-        conn.close()
-        raise HTTPException(status_code=404, detail="Request not found")
+        canceled = cursor.fetchone()
+        conn.commit()
+        if canceled:
+            conn.close()
+            return
     
-    if request['status'] != 'pending':
+        # Nothing changed; tell a missing request apart from one that is no longer pending
+        cursor.execute("""
+            SELECT 1 FROM chat_requests 
+            WHERE id = ? AND user_id = ?
+        """, (request_id, user_id))
+        exists = cursor.fetchone()
         conn.close()
-        raise HTTPException(status_code=400, detail="Request cannot be canceled")
-    
-    # Update request status to canceled
-    cursor.execute("""
-        UPDATE chat_requests 
-        SET status = 'canceled', 
-            rejected_at = CURRENT_TIMESTAMP,
-            rejection_reason = 'Canceled by user'
-        WHERE id = ?
-    """, (request_id,))
+        if not exists:
+            raise HTTPException(status_code=404, detail="Request not found")
+        raise HTTPException(status_code=409, detail="Request cannot be canceled")
     
-    conn.commit()
-    conn.close()
+    await run_db(cancel_request)
+    chat_request_expiry.cancel(request_id)
+    await publish_request_removed(request_id, "canceled")
     
     # Notify admin about cancellation
     cancellation_message = {
@@ -520,7 +905,7 @@ async def cancel_chat_request(request_data: dict):
         }
     }
     
-    await manager.broadcast_to_support(json.dumps(cancellation_message))
+    await manager.broadcast_to_support(envelope(cancellation_message))
     
     return {
         "success": True,
@@ -534,31 +919,32 @@ async def reject_chat_request(request_id: int, credentials: HTTPAuthorizationCre
     user_response = await verify_token(credentials)
     user = user_response["user"]
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    def reject_request():
+        conn = get_db_connection()
+        cursor = conn.cursor()
     
-    # Check if request exists and is pending
-    cursor.execute("""
-        SELECT * FROM chat_requests 
-        WHERE id = ? AND status = 'pending'
-    """, (request_id,))
+        # Reject only if still pending, so a concurrent accept can't be overwritten
+        cursor.execute("""
+            UPDATE chat_requests 
+            SET status = 'rejected', assigned_to = ?, rejected_at = ?
+            WHERE id = ? AND status = 'pending'
+            RETURNING user_id
+        """, (user.get("id") or user.get("user_id"), datetime.now().isoformat(), request_id))
     
-    request = cursor.fetchone()
-    if not request:
-        raise HTTPException(status_code=404, detail="Chat request not found")
+        request = cursor.fetchone()
+        conn.commit()
+        conn.close()
+        return request
     
-    # Update request status
-    cursor.execute("""
-        UPDATE chat_requests 
-        SET status = 'rejected', assigned_to = ?, rejected_at = ?
-        WHERE id = ?
-    """, (user.get("id") or user.get("user_id"), datetime.now().isoformat(), request_id))
+    request = await run_db(reject_request)
     
-    conn.commit()
-    conn.close()
+    if not request:
+        raise HTTPException(status_code=404, detail="Chat request not found")
+    chat_request_expiry.cancel(request_id)
+    await publish_request_removed(request_id, "rejected")
     
     # Notify user
-    await manager.send_to_user(request["user_id"], json.dumps({
+    await manager.send_to_user(request["user_id"], envelope({
         "type": "chat_rejected",
         "data": {
             "message": "We're currently experiencing high demand and all our support agents are busy. Don't worry! You can create a support ticket and we'll get back to you as soon as possible, or try again in a few minutes."
@@ -577,39 +963,45 @@ async def end_chat_session(session_id: int, credentials: HTTPAuthorizationCreden
     user_response = await verify_token(credentials)
     user = user_response["user"]
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    def end_session():
+        conn = get_db_connection()
+        cursor = conn.cursor()
     
-    # Check if session exists and is active
-    cursor.execute("""
-        SELECT * FROM chat_sessions 
-        WHERE id = ? AND status = 'active'
-    """, (session_id,))
+        # End the session only if it is still active, and get its participants from the same statement
+        cursor.execute("""
+            UPDATE chat_sessions 
+            SET status = 'ended', ended_at = datetime('now', 'localtime'), ended_at_local = datetime('now', 'localtime')
+            WHERE id = ? AND status = 'active'
+            RETURNING user_id, support_user_id
+        """, (session_id,))
     
-    session = cursor.fetchone()
-    if not session:
+        session = cursor.fetchone()
+        conn.commit()
         conn.close()
-        raise HTTPException(status_code=404, detail="Active chat session not found")
+        return session
     
-    # Update session status to ended
-    cursor.execute("""
-        UPDATE chat_sessions 
-        SET status = 'ended', ended_at = datetime('now', 'localtime'), ended_at_local = datetime('now', 'localtime')
-        WHERE id = ?
-    """, (session_id,))
+    session = await run_db(end_session)
+    if not session:
+        raise HTTPException(status_code=404, detail="Active chat session not found")
     
-    conn.commit()
-    conn.close()
+    # The row is no longer active, so seed the session map from it rather than rely on a database fallback
+    manager.open_session(session_id, session["user_id"], session["support_user_id"])
     
     # Notify all connected users about session end
     try:
-        await manager.broadcast_to_session(session_id, json.dumps({
+        await manager.broadcast_to_session(session_id, envelope({
             "type": "session_ended",
             "session_id": session_id,
             "message": "Chat session has been ended"
         }))
     except Exception as e:
         pass
+    manager.close_session(session_id)
+    
+    # The agent has room again; give them the next waiting request they can take
+    agent_id = str(session["support_user_id"])
+    assignment_engine.session_ended(agent_id)
+    await assign_pending_requests(agent_id)
     
     return {"message": "Chat session ended successfully"}
 
@@ -620,35 +1012,28 @@ async def get_chat_sessions(credentials: HTTPAuthorizationCredentials = Depends(
     user_response = await verify_token(credentials)
     user = user_response["user"]
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT cs.id, cs.request_id, cs.user_id, cs.support_user_id, cs.status,
-               COALESCE(cs.started_at_local, datetime(cs.started_at, 'localtime')) as started_at,
-               COALESCE(cs.ended_at_local, datetime(cs.ended_at, 'localtime')) as ended_at,
-               cr.user_name, cr.user_email, cc.name as category_name
-        FROM chat_sessions cs
-        JOIN chat_requests cr ON cs.request_id = cr.id
-        JOIN chat_categories cc ON cr.category_id = cc.id
-        WHERE cs.support_user_id = ? AND cs.status = 'active'
-        ORDER BY cs.started_at DESC
-    """, (user.get("id") or user.get("user_id"),))
-    
-    sessions = []
-    for row in cursor.fetchall():
-        sessions.append({
-            "id": row["id"],
-            "request_id": row["request_id"],
-            "user_id": row["user_id"],
-            "user_name": row["user_name"] or "Anonymous",
-            "user_email": row["user_email"],
-            "category_name": row["category_name"],
-            "started_at": row["started_at"]
-        })
+    def query():
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute(AGENT_ACTIVE_SESSIONS_SQL, (user.get("id") or user.get("user_id"),))
+        
+        sessions = []
+        for row in cursor.fetchall():
+            sessions.append({
+                "id": row["id"],
+                "request_id": row["request_id"],
+                "user_id": row["user_id"],
+                "user_name": row["user_name"] or "Anonymous",
+                "user_email": row["user_email"],
+                "category_name": row["category_name"],
+                "started_at": row["started_at"]
+            })
+        
+        conn.close()
+        return {"sessions": sessions}
     
-    conn.close()
-    return {"sessions": sessions}
+    return await run_db(query)
 
 @router.get("/sessions/total")
 async def get_total_sessions(credentials: HTTPAuthorizationCredentials = Depends(security)):
@@ -657,71 +1042,76 @@ async def get_total_sessions(credentials: HTTPAuthorizationCredentials = Depends
     user_response = await verify_token(credentials)
     user = user_response["user"]
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT COUNT(*) as total FROM chat_sessions")
-    total = cursor.fetchone()[0]
-    conn.close()
+    def query():
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT COUNT(*) as total FROM chat_sessions")
+        total = cursor.fetchone()[0]
+        conn.close()
+        
+        return {"total_sessions": total}
     
-    return {"total_sessions": total}
+    return await run_db(query)
 
 @router.get("/sessions/all")
-async def get_all_sessions(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """Get all chat sessions (active and ended)"""
+async def get_all_sessions(before: Optional[str] = None, before_id: Optional[int] = None,
+                           limit: int = SESSION_PAGE_SIZE,
+                           credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Get chat sessions (active and ended), newest first; pass next_cursor back as before/before_id for older ones"""
     # Verify token and get user
     user_response = await verify_token(credentials)
     user = user_response["user"]
+    limit = max(1, min(limit, MAX_SESSION_PAGE_SIZE))
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Get current user's name for dynamic support name
-    current_user_name = user.get("full_name") or user.get("username") or "Support Agent"
-    
-    cursor.execute("""
-        SELECT cs.id, cs.request_id, cs.user_id, cs.support_user_id, cs.status, 
-               COALESCE(cs.started_at_local, datetime(cs.started_at, 'localtime')) as started_at,
-               COALESCE(cs.ended_at_local, datetime(cs.ended_at, 'localtime')) as ended_at,
-               cr.user_name, cr.user_email, cc.name as category_name, cs_sub.name as subcategory_name
-        FROM chat_sessions cs
-        JOIN chat_requests cr ON cs.request_id = cr.id
-        JOIN chat_categories cc ON cr.category_id = cc.id
-        LEFT JOIN chat_subcategories cs_sub ON cr.subcategory_id = cs_sub.id
-        ORDER BY cs.started_at DESC
-    """)
-    
-    sessions = []
-    for row in cursor.fetchall():
-        # Get support name from user_management.db
-        support_name = current_user_name  # Default to current user
+    def query():
         
-        # Try to get support name from user_management.db
-        try:
-            from user_management_db import user_db
-            support_user = user_db.get_user_by_id(row[3])  # row[3] is support_user_id
-            if support_user:
-                support_name = support_user.get("full_name") or support_user.get("username") or current_user_name
-        except:
-            # If user_management.db fails, use current user name
-            support_name = current_user_name
+        conn = get_db_connection()
+        cursor = conn.cursor()
         
-        sessions.append({
-            "id": row[0],
-            "request_id": row[1],
-            "user_id": row[2],
-            "user_name": row[7] or "Anonymous",
-            "user_email": row[8],
-            "category_name": row[9],
-            "subcategory_name": row[10],
-            "support_name": support_name,
-            "status": row[4],
-            "started_at": row[5],
-            "ended_at": row[6]
-        })
+        # Get current user's name for dynamic support name
+        current_user_name = user.get("full_name") or user.get("username") or "Support Agent"
+        
+        # Keyset on (started_at, id) so deep pages cost the same as the first
+        if before is not None:
+            cursor.execute(ALL_SESSIONS_BEFORE_SQL,
+                           (before, before_id if before_id is not None else 2 ** 63 - 1, limit + 1))
+        else:
+            cursor.execute(ALL_SESSIONS_SQL, (limit + 1,))
+        
+        rows = cursor.fetchall()
+        conn.close()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        # Resolve every agent on the page with one cached, batched lookup
+        support_names = agent_directory.get_names(row[3] for row in rows)
+        
+        sessions = []
+        for row in rows:
+            try:
+                support_name = support_names.get(int(row[3])) or current_user_name
+            except (TypeError, ValueError):
+                support_name = current_user_name
+            
+            sessions.append({
+                "id": row[0],
+                "request_id": row[1],
+                "user_id": row[2],
+                "user_name": row[7] or "Anonymous",
+                "user_email": row[8],
+                "category_name": row[9],
+                "subcategory_name": row[10],
+                "support_name": support_name,
+                "status": row[4],
+                "started_at": row[5],
+                "ended_at": row[6]
+            })
+        
+        next_cursor = {"before": rows[-1][11], "before_id": rows[-1][0]} if has_more else None
+        return {"sessions": sessions, "has_more": has_more, "next_cursor": next_cursor}
     
-    conn.close()
-    return {"sessions": sessions}
+    return await run_db(query)
 
 @router.get("/requests/rejected")
 async def get_rejected_requests(credentials: HTTPAuthorizationCredentials = Depends(security)):
@@ -730,125 +1120,103 @@ async def get_rejected_requests(credentials: HTTPAuthorizationCredentials = Depe
     user_response = await verify_token(credentials)
     user = user_response["user"]
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT cr.*, cc.name as category_name, cs.name as subcategory_name, u.username as rejected_by
-        FROM chat_requests cr
-        JOIN chat_categories cc ON cr.category_id = cc.id
-        LEFT JOIN chat_subcategories cs ON cr.subcategory_id = cs.id
-        LEFT JOIN users u ON cr.rejected_by = u.id
-        WHERE cr.status = 'rejected'
-        ORDER BY cr.created_at DESC
-    """)
-    
-    rejected_requests = []
-    for row in cursor.fetchall():
-        rejected_requests.append({
-            "id": row["id"],
-            "user_name": row["user_name"] or "Anonymous",
-            "user_email": row["user_email"],
-            "category_name": row["category_name"],
-            "subcategory_name": row["subcategory_name"],
-            "message": row["message"],
-            "rejected_by": row["rejected_by"] or "System",
-            "rejection_reason": row["rejection_reason"],
-            "created_at": row["created_at"],
-            "rejected_at": row["rejected_at"]
-        })
+    def query():
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute(REJECTED_REQUESTS_SQL)
+        
+        rejected_requests = []
+        for row in cursor.fetchall():
+            rejected_requests.append({
+                "id": row["id"],
+                "user_name": row["user_name"] or "Anonymous",
+                "user_email": row["user_email"],
+                "category_name": row["category_name"],
+                "subcategory_name": row["subcategory_name"],
+                "message": row["message"],
+                "rejected_by": row["rejected_by"] or "System",
+                "rejection_reason": row["rejection_reason"],
+                "created_at": row["created_at"],
+                "rejected_at": row["rejected_at"]
+            })
+        
+        conn.close()
+        return {"rejected_requests": rejected_requests}
     
-    conn.close()
-    return {"rejected_requests": rejected_requests}
+    return await run_db(query)
 
 @router.get("/sessions/{session_id}/messages/public")
-async def get_chat_messages_public(session_id: int):
-    """Get messages for a chat session (public endpoint for users)"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Get messages for this session in JSON format
-    cursor.execute("""
-        SELECT messages_json, message_count, last_message, last_sender, created_at, updated_at
-        FROM chat_messages 
-        WHERE session_id = ?
-    """, (session_id,))
-    
-    result = cursor.fetchone()
-    conn.close()
-    
-    if not result:
-        return {"messages": []}
-    
-    # Parse JSON messages
-    messages_data = json.loads(result[0])
+async def get_chat_messages_public(session_id: int, before_id: Optional[int] = None,
+                                   after_id: Optional[int] = None, limit: int = MESSAGE_PAGE_SIZE):
+    """Get a page of messages for a chat session (public endpoint for users)"""
     
-    # Convert to expected format
-    messages = []
-    for i, msg in enumerate(messages_data):
-        messages.append({
-            "id": i + 1,
-            "session_id": session_id,
-            "sender_type": msg["sender_type"],
-            "sender_id": msg["sender_id"],
-            "message": msg["message"],
-            "message_type": msg.get("message_type", "text"),
-            "is_read": False,  # Default for JSON format
-            "created_at": msg["created_at"]
-        })
+    def query():
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        rows, has_more = fetch_session_messages(cursor, session_id, before_id, after_id, limit)
+        
+        messages = []
+        for row in rows:
+            messages.append({
+                "id": row["id"],
+                "session_id": row["session_id"],
+                "sender_type": row["sender_type"],
+                "sender_id": row["sender_id"],
+                "message": row["message"],
+                "message_type": row["message_type"] or "text",
+                "is_read": bool(row["is_read"]),
+                "created_at": row["created_at"]
+            })
+        
+        conn.close()
+        return {"messages": messages, "has_more": has_more}
     
-    return {"messages": messages}
+    return await run_db(query)
 
 @router.get("/sessions/{session_id}/messages")
-async def get_chat_messages(session_id: int, credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """Get messages for a chat session"""
+async def get_chat_messages(session_id: int, before_id: Optional[int] = None, after_id: Optional[int] = None,
+                            limit: int = MESSAGE_PAGE_SIZE,
+                            credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Get a page of messages for a chat session"""
     # Verify token and get user
     user_response = await verify_token(credentials)
     user = user_response["user"]
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Verify user has access to this session
-    cursor.execute("""
-        SELECT * FROM chat_sessions 
-        WHERE id = ? AND (support_user_id = ? OR user_id = ?)
-    """, (session_id, user.get("id") or user.get("user_id"), user.get("user_id", "")))
-    
-    session = cursor.fetchone()
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
-    
-    # Get messages in JSON format
-    cursor.execute("""
-        SELECT messages_json, message_count, last_message, last_sender, created_at, updated_at
-        FROM chat_messages 
-        WHERE session_id = ?
-    """, (session_id,))
-    
-    result = cursor.fetchone()
-    
-    if not result:
-        messages = []
-    else:
-        # Parse JSON messages
-        messages_data = json.loads(result[0])
+    def query():
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        # Verify user has access to this session
+        cursor.execute("""
+            SELECT * FROM chat_sessions 
+            WHERE id = ? AND (support_user_id = ? OR user_id = ?)
+        """, (session_id, user.get("id") or user.get("user_id"), user.get("user_id", "")))
+        
+        session = cursor.fetchone()
+        if not session:
+            conn.close()
+            raise HTTPException(status_code=404, detail="Session not found")
+        
+        rows, has_more = fetch_session_messages(cursor, session_id, before_id, after_id, limit)
         
-        # Convert to expected format
         messages = []
-        for i, msg in enumerate(messages_data):
+        for row in rows:
             messages.append({
-                "id": i + 1,
-                "sender_type": msg["sender_type"],
-                "sender_id": msg["sender_id"],
-                "message": msg["message"],
-                "message_type": msg.get("message_type", "text"),
-                "is_read": False,  # Default for JSON format
-                "created_at": msg["created_at"]
+                "id": row["id"],
+                "sender_type": row["sender_type"],
+                "sender_id": row["sender_id"],
+                "message": row["message"],
+                "message_type": row["message_type"] or "text",
+                "is_read": bool(row["is_read"]),
+                "created_at": row["created_at"]
             })
+        
+        conn.close()
+        return {"messages": messages, "has_more": has_more}
     
-    conn.close()
-    return {"messages": messages}
+    return await run_db(query)
 
 # Admin endpoints
 @router.get("/admin/notifications")
@@ -858,30 +1226,33 @@ async def get_admin_notifications(credentials: HTTPAuthorizationCredentials = De
     user_response = await verify_token(credentials)
     user = user_response["user"]
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT id, title, message, type, related_id, is_read, created_at
-        FROM notifications 
-        ORDER BY created_at DESC 
-        LIMIT 50
-    """)
-    
-    notifications = []
-    for row in cursor.fetchall():
-        notifications.append({
-            "id": row[0],
-            "title": row[1],
-            "message": row[2],
-            "type": row[3],
-            "related_id": row[4],
-            "is_read": bool(row[5]),
-            "created_at": row[6]
-        })
+    def query():
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT id, title, message, type, related_id, is_read, created_at
+            FROM notifications 
+            ORDER BY created_at DESC 
+            LIMIT 50
+        """)
+        
+        notifications = []
+        for row in cursor.fetchall():
+            notifications.append({
+                "id": row[0],
+                "title": row[1],
+                "message": row[2],
+                "type": row[3],
+                "related_id": row[4],
+                "is_read": bool(row[5]),
+                "created_at": row[6]
+            })
+        
+        conn.close()
+        return {"notifications": notifications}
     
-    conn.close()
-    return {"notifications": notifications}
+    return await run_db(query)
 
 @router.get("/admin/notifications/count")
 async def get_admin_notifications_count(credentials: HTTPAuthorizationCredentials = Depends(security)):
@@ -890,14 +1261,17 @@ async def get_admin_notifications_count(credentials: HTTPAuthorizationCredential
     user_response = await verify_token(credentials)
     user = user_response["user"]
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT COUNT(*) FROM notifications WHERE is_read = 0")
-    count = cursor.fetchone()[0]
+    def query():
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT COUNT(*) FROM notifications WHERE is_read = 0")
+        count = cursor.fetchone()[0]
+        
+        conn.close()
+        return {"unread_count": count}
     
-    conn.close()
-    return {"unread_count": count}
+    return await run_db(query)
 
 @router.get("/admin/tickets")
 async def get_admin_tickets(credentials: HTTPAuthorizationCredentials = Depends(security)):
@@ -906,30 +1280,45 @@ async def get_admin_tickets(credentials: HTTPAuthorizationCredentials = Depends(
     user_response = await verify_token(credentials)
     user = user_response["user"]
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT id, title, description, status, priority, created_at, updated_at
-        FROM tickets 
-        ORDER BY created_at DESC 
-        LIMIT 50
-    """)
-    
-    tickets = []
-    for row in cursor.fetchall():
-        tickets.append({
-            "id": row[0],
-            "title": row[1],
-            "description": row[2],
-            "status": row[3],
-            "priority": row[4],
-            "created_at": row[5],
-            "updated_at": row[6]
-        })
+    def query():
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT id, title, description, status, priority, created_at, updated_at
+            FROM tickets 
+            ORDER BY created_at DESC 
+            LIMIT 50
+        """)
+        
+        tickets = []
+        for row in cursor.fetchall():
+            tickets.append({
+                "id": row[0],
+                "title": row[1],
+                "description": row[2],
+                "status": row[3],
+                "priority": row[4],
+                "created_at": row[5],
+                "updated_at": row[6]
+            })
+        
+        conn.close()
+        return {"tickets": tickets}
     
-    conn.close()
-    return {"tickets": tickets}
+    return await run_db(query)
+
+def parse_frame(data: str) -> Optional[dict]:
+    """Decode a client frame; None for anything that isn't a well-formed message, so it can be skipped"""
+    try:
+        message_data = json.loads(data)
+    except ValueError:
+        return None
+    if not isinstance(message_data, dict) or "type" not in message_data:
+        return None
+    if message_data["type"] == "chat_message" and any(field not in message_data for field in CHAT_MESSAGE_FIELDS):
+        return None
+    return message_data
 
 # WebSocket endpoint for real-time chat
 @router.websocket("/ws/{user_id}")
@@ -938,11 +1327,14 @@ async def websocket_endpoint(websocket: WebSocket, user_id: str):
     try:
         while True:
             data = await websocket.receive_text()
-            message_data = json.loads(data)
+            message_data = parse_frame(data)
+            if message_data is None:
+                continue
             
             if message_data["type"] == "chat_message":
-                # Save message to database in JSON format
-                save_message_to_json(
+                # Append the message to the session's history
+                await run_db(
+                    save_chat_message,
                     message_data["session_id"],
                     message_data["sender_type"],
                     message_data["sender_id"],
@@ -950,21 +1342,13 @@ async def websocket_endpoint(websocket: WebSocket, user_id: str):
                     message_data.get("message_type", "text")
                 )
                 
-                # Get session details to forward message to correct participants
-                conn = get_db_connection()
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT user_id, support_user_id FROM chat_sessions 
-                    WHERE id = ?
-                """, (message_data["session_id"],))
-                session = cursor.fetchone()
-                conn.close()
+                # Forward message to the other participant of the session
+                session = await manager.get_session_participants(message_data["session_id"])
                 
                 if session:
-                    # Forward message to other participant
                     if message_data["sender_type"] == "user":
                         # User sent message, forward to support
-                        await manager.send_to_support(str(session[1]), data)
+                        await manager.send_to_support(session[1], data)
                     else:
                         # Support sent message, forward to user
                         await manager.send_to_user(session[0], data)
@@ -974,25 +1358,76 @@ async def websocket_endpoint(websocket: WebSocket, user_id: str):
                         "type": "error",
                         "message": "Chat session not found or expired"
                     }
-                    await websocket.send_text(json.dumps(error_message))
+                    await websocket.send_text(envelope(error_message).text)
     except WebSocketDisconnect:
+        pass
+    finally:
         manager.disconnect(websocket, user_id, "user")
 
+def can_take_chats(user: dict) -> bool:
+    """Whether a verified user may act as a support agent: the roles the admin UI opens live chat to, or livechat_accept"""
+    if not user.get("is_active"):
+        return False
+    if user.get("user_type") == "admin" or user.get("role_name") in SUPPORT_ROLES:
+        return True
+    return user_db.check_permission(user["id"], "livechat_accept")
+
+async def authenticate_support_socket(websocket: WebSocket, support_user_id: str) -> Optional[dict]:
+    """Verify the bearer token on a support WebSocket handshake; None unless it belongs to this active agent"""
+    # Browsers can't set headers on a WebSocket, so the token may also come as ?token=
+    token = websocket.query_params.get("token")
+    authorization = websocket.headers.get("authorization", "")
+    if not token and authorization.lower().startswith("bearer "):
+        token = authorization[7:].strip()
+    if not token:
+        return None
+    try:
+        user_response = await verify_token(HTTPAuthorizationCredentials(scheme="Bearer", credentials=token))
+    except HTTPException:
+        return None
+    user = user_response["user"]
+    if str(user.get("id")) != support_user_id:
+        return None
+    if not await run_db(can_take_chats, user):
+        return None
+    return user
+
 @router.websocket("/ws/support/{support_user_id}")
 async def support_websocket_endpoint(websocket: WebSocket, support_user_id: str):
+    # Never route visitors' requests to a socket that hasn't proven who it is
+    agent = await authenticate_support_socket(websocket, support_user_id)
+    if agent is None:
+        await websocket.close(code=1008)
+        return
     try:
         await manager.connect(websocket, support_user_id, "support")
     except Exception as e:
         await websocket.close()
         return
     try:
+        # Route requests to this agent while connected, starting with any that are already waiting
+        skills, active_sessions = await run_db(load_agent_profile, support_user_id)
+        # Name the agent from their verified principal: admin agents live in venturing.db, not user_management
+        agent_name = agent.get("full_name") or agent.get("username") or "Support Agent"
+        assignment_engine.agent_online(support_user_id, skills, active_sessions, agent_name)
+        await assign_pending_requests(support_user_id)
+        
+        # Start the agent's queue from a snapshot; deltas follow as requests come and go
+        await manager.send_to_support(support_user_id, envelope({
+            "type": "queue_snapshot",
+            "data": {"requests": await get_pending_requests()}
+        }))
+        
         while True:
             data = await websocket.receive_text()
-            message_data = json.loads(data)
+            message_data = parse_frame(data)
+            if message_data is None:
+                continue
             
             if message_data["type"] == "chat_message":
-                # Save message to database in JSON format
-                save_message_to_json(
+                # Append the message to the session's history
+                await run_db(
+                    save_chat_message,
                     message_data["session_id"],
                     message_data["sender_type"],
                     message_data["sender_id"],
@@ -1000,72 +1435,73 @@ async def support_websocket_endpoint(websocket: WebSocket, support_user_id: str)
                     message_data.get("message_type", "text")
                 )
                 
-                # Get session details to forward message to correct participants
-                conn = get_db_connection()
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT user_id, support_user_id FROM chat_sessions 
-                    WHERE id = ?
-                """, (message_data["session_id"],))
-                session = cursor.fetchone()
-                conn.close()
+                # Forward message to the user of the session
+                session = await manager.get_session_participants(message_data["session_id"])
                 
                 if session:
                     # Forward message to user
                     await manager.send_to_user(session[0], data)
                     
     except WebSocketDisconnect:
+        pass
+    finally:
+        # However the handler ends, stop routing requests to this socket
         manager.disconnect(websocket, support_user_id, "support")
+        if support_user_id not in manager.support_connections:
+            assignment_engine.agent_offline(support_user_id)
 
 # Feedback endpoints
 @router.post("/feedback")
 async def submit_feedback(feedback: FeedbackCreate):
     """Submit chat feedback"""
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        # Validate session exists and is ended
-        cursor.execute("""
-            SELECT id, status FROM chat_sessions 
-            WHERE id = ? AND user_id = ?
-        """, (feedback.session_id, feedback.user_id))
-        
-        session = cursor.fetchone()
-        if not session:
-            raise HTTPException(status_code=404, detail="Chat session not found")
-        
-        if session[1] != 'ended':
-            raise HTTPException(status_code=400, detail="Can only submit feedback for ended sessions")
-        
-        # Insert feedback
-        cursor.execute("""
-            INSERT INTO chat_feedback (
-                session_id, user_id, admin_user_id, overall_rating, 
-                support_quality, response_time, comments, would_recommend
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            feedback.session_id,
-            feedback.user_id,
-            feedback.admin_user_id,
-            feedback.overall_rating,
-            feedback.support_quality,
-            feedback.response_time,
-            feedback.comments,
-            feedback.would_recommend
-        ))
-        
-        conn.commit()
-        feedback_id = cursor.lastrowid
-        
-        return {"message": "Feedback submitted successfully", "feedback_id": feedback_id}
+    def query():
+        conn = get_db_connection()
+        cursor = conn.cursor()
         
-    except Exception as e:
-        conn.rollback()
-        raise HTTPException(status_code=500, detail="Failed to submit feedback")
-    finally:
-        conn.close()
+        try:
+            # Validate session exists and is ended
+            cursor.execute("""
+                SELECT id, status FROM chat_sessions 
+                WHERE id = ? AND user_id = ?
+            """, (feedback.session_id, feedback.user_id))
+            
+            session = cursor.fetchone()
+            if not session:
+                raise HTTPException(status_code=404, detail="Chat session not found")
+            
+            if session[1] != 'ended':
+                raise HTTPException(status_code=400, detail="Can only submit feedback for ended sessions")
+            
+            # Insert feedback
+            cursor.execute("""
+                INSERT INTO chat_feedback (
+                    session_id, user_id, admin_user_id, overall_rating, 
+                    support_quality, response_time, comments, would_recommend
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                feedback.session_id,
+                feedback.user_id,
+                feedback.admin_user_id,
+                feedback.overall_rating,
+                feedback.support_quality,
+                feedback.response_time,
+                feedback.comments,
+                feedback.would_recommend
+            ))
+            
+            conn.commit()
+            feedback_id = cursor.lastrowid
+            
+            return {"message": "Feedback submitted successfully", "feedback_id": feedback_id}
+            
+        except Exception as e:
+            conn.rollback()
+            raise HTTPException(status_code=500, detail="Failed to submit feedback")
+        finally:
+            conn.close()
+    
+    return await run_db(query)
 
 @router.get("/feedback/stats")
 async def get_feedback_stats(credentials: HTTPAuthorizationCredentials = Depends(security)):
@@ -1075,83 +1511,86 @@ async def get_feedback_stats(credentials: HTTPAuthorizationCredentials = Depends
     user_response = await verify_token(credentials)
     user = user_response["user"]
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        # Get overall stats
-        cursor.execute("""
-            SELECT 
-                COUNT(*) as total_feedback,
-                AVG(overall_rating) as avg_overall,
-                AVG(support_quality) as avg_support,
-                AVG(response_time) as avg_response,
-                SUM(CASE WHEN would_recommend = 1 THEN 1 ELSE 0 END) as recommend_count
-            FROM chat_feedback
-        """)
-        
-        stats = cursor.fetchone()
-        
-        # Get recent feedback
-        cursor.execute("""
-            SELECT 
-                cf.*,
-                cr.user_name,
-                cr.user_email,
-                u.username as admin_name
-            FROM chat_feedback cf
-            LEFT JOIN chat_sessions cs ON cf.session_id = cs.id
-            LEFT JOIN chat_requests cr ON cs.request_id = cr.id
-            LEFT JOIN users u ON cf.admin_user_id = u.id
-            ORDER BY cf.created_at DESC
-            LIMIT 10
-        """)
-        
-        recent_feedback = cursor.fetchall()
-        
-        # Get rating distribution
-        cursor.execute("""
-            SELECT 
-                overall_rating,
-                COUNT(*) as count
-            FROM chat_feedback
-            GROUP BY overall_rating
-            ORDER BY overall_rating
-        """)
-        
-        rating_distribution = cursor.fetchall()
-        
-        return {
-            "total_feedback": stats[0] or 0,
-            "average_ratings": {
-                "overall": round(stats[1] or 0, 2),
-                "support_quality": round(stats[2] or 0, 2),
-                "response_time": round(stats[3] or 0, 2)
-            },
-            "recommendation_rate": round((stats[4] or 0) / max(stats[0] or 1, 1) * 100, 2),
-            "recent_feedback": [
-                {
-                    "id": row[0],
-                    "session_id": row[1],
-                    "user_name": row[10] if row[10] else "Unknown",
-                    "user_email": row[11] if row[11] else "Unknown",
-                    "admin_name": row[12] if row[12] else "Unknown",
-                    "overall_rating": row[4],
-                    "support_quality": row[5],
-                    "response_time": row[6],
-                    "comments": row[7],
-                    "would_recommend": bool(row[8]),
-                    "created_at": row[9]
-                }
-                for row in recent_feedback
-            ],
-            "rating_distribution": [
-                {"rating": row[0], "count": row[1]}
-                for row in rating_distribution
-            ]
-        }
+    def query():
+        conn = get_db_connection()
+        cursor = conn.cursor()
         
-    except Exception as e:
-        raise HTTPException(status_code=500, detail="Failed to fetch feedback statistics")
-    finally:
-        conn.close()
+        try:
+            # Get overall stats
+            cursor.execute("""
+                SELECT 
+                    COUNT(*) as total_feedback,
+                    AVG(overall_rating) as avg_overall,
+                    AVG(support_quality) as avg_support,
+                    AVG(response_time) as avg_response,
+                    SUM(CASE WHEN would_recommend = 1 THEN 1 ELSE 0 END) as recommend_count
+                FROM chat_feedback
+            """)
+            
+            stats = cursor.fetchone()
+            
+            # Get recent feedback
+            cursor.execute("""
+                SELECT 
+                    cf.*,
+                    cr.user_name,
+                    cr.user_email,
+                    u.username as admin_name
+                FROM chat_feedback cf
+                LEFT JOIN chat_sessions cs ON cf.session_id = cs.id
+                LEFT JOIN chat_requests cr ON cs.request_id = cr.id
+                LEFT JOIN users u ON cf.admin_user_id = u.id
+                ORDER BY cf.created_at DESC
+                LIMIT 10
+            """)
+            
+            recent_feedback = cursor.fetchall()
+            
+            # Get rating distribution
+            cursor.execute("""
+                SELECT 
+                    overall_rating,
+                    COUNT(*) as count
+                FROM chat_feedback
+                GROUP BY overall_rating
+                ORDER BY overall_rating
+            """)
+            
+            rating_distribution = cursor.fetchall()
+            
+            return {
+                "total_feedback": stats[0] or 0,
+                "average_ratings": {
+                    "overall": round(stats[1] or 0, 2),
+                    "support_quality": round(stats[2] or 0, 2),
+                    "response_time": round(stats[3] or 0, 2)
+                },
+                "recommendation_rate": round((stats[4] or 0) / max(stats[0] or 1, 1) * 100, 2),
+                "recent_feedback": [
+                    {
+                        "id": row[0],
+                        "session_id": row[1],
+                        "user_name": row[10] if row[10] else "Unknown",
+                        "user_email": row[11] if row[11] else "Unknown",
+                        "admin_name": row[12] if row[12] else "Unknown",
+                        "overall_rating": row[4],
+                        "support_quality": row[5],
+                        "response_time": row[6],
+                        "comments": row[7],
+                        "would_recommend": bool(row[8]),
+                        "created_at": row[9]
+                    }
+                    for row in recent_feedback
+                ],
+                "rating_distribution": [
+                    {"rating": row[0], "count": row[1]}
+                    for row in rating_distribution
+                ]
+            }
+            
+        except Exception as e:
+            raise HTTPException(status_code=500, detail="Failed to fetch feedback statistics")
+        finally:
+            conn.close()
+    
+    return await run_db(query)
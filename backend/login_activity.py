@@ -0,0 +1,98 @@
+"""
+Login Activity
+Write-behind last_login updates for both user stores, flushed in batched transactions,
+plus an in-memory last-seen map the admin UI can read without touching the database
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlite_pool import connect_db
+from write_behind import WriteBehind
+
+# Which database holds each kind of user
+USER_DATABASES = {
+    "admin": "venturing.db",
+    "user": "user_management.db",
+}
+FLUSH_INTERVAL_SECONDS = 5.0
+MAX_PENDING_LOGINS = 200
+
+
+def utc_timestamp() -> str:
+    # Same format as SQLite's CURRENT_TIMESTAMP
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+class LoginActivity(WriteBehind):
+    """Coalesces last_login updates per user and writes them from a background thread"""
+
+    def __init__(self, flush_interval: float = FLUSH_INTERVAL_SECONDS, max_pending: int = MAX_PENDING_LOGINS):
+        super().__init__("login-activity", flush_interval)
+        self.max_pending = max_pending
+        self._pending: Dict[Tuple[str, int], str] = {}  # (user_type, user_id) -> last login
+        self.last_login: Dict[Tuple[str, int], str] = {}  # logins seen by this process
+        self.last_seen: Dict[Tuple[str, int], str] = {}  # last login or authenticated request
+
+    def record_login(self, user_type: str, user_id: int):
+        """Note a successful login; last_login is written on the next flush"""
+        now = utc_timestamp()
+        key = (user_type, user_id)
+        with self._lock:
+            self._pending[key] = now
+            self.last_login[key] = now
+            self.last_seen[key] = now
+            pending = len(self._pending)
+        self._schedule(flush_now=pending >= self.max_pending)
+
+    def touch(self, user_type: Optional[str], user_id) -> None:
+        """Note an authenticated request; only kept in memory"""
+        if user_type is None or user_id is None:
+            return
+        now = utc_timestamp()
+        with self._lock:
+            self.last_seen[(user_type, user_id)] = now
+
+    def get_last_login(self, user_type: str, user_id: int) -> Optional[str]:
+        """Last login seen by this process, including ones not flushed yet"""
+        return self.last_login.get((user_type, user_id))
+
+    def get_last_seen(self) -> Dict[str, str]:
+        """Last activity per user, keyed "<user_type>:<user_id>" """
+        with self._lock:
+            items = list(self.last_seen.items())
+        return {f"{user_type}:{user_id}": seen for (user_type, user_id), seen in items}
+
+    def _flush(self):
+        """Write every pending last_login, one transaction per database"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+
+        by_type: Dict[str, List[Tuple[str, int]]] = {}
+        for (user_type, user_id), logged_in_at in pending.items():
+            if user_type in USER_DATABASES:
+                by_type.setdefault(user_type, []).append((logged_in_at, user_id))
+
+        for user_type, rows in by_type.items():
+            db_path = USER_DATABASES[user_type]
+            try:
+                conn = connect_db(db_path)
+                try:
+                    conn.executemany("UPDATE users SET last_login = ? WHERE id = ?", rows)
+                    conn.commit()
+                finally:
+                    conn.close()
+            except Exception as e:
+                print(f"Error flushing login activity to {db_path}: {e}")
+                # Put the work back so the next flush retries it, unless a newer login replaced it
+                with self._lock:
+                    for logged_in_at, user_id in rows:
+                        self._pending.setdefault((user_type, user_id), logged_in_at)
+
+
+# Global login activity tracker
+login_activity = LoginActivity()
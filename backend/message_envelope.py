@@ -0,0 +1,48 @@
+"""
+Message envelopes for WebSocket and SSE broadcasts
+A payload is serialized once with orjson and the framed output is shared by every recipient
+"""
+
+from __future__ import annotations
+
+from typing import Any, Optional
+
+import orjson
+
+
+class MessageEnvelope:
+    """A payload plus its lazily built, cached wire encodings"""
+
+    __slots__ = ("payload", "_data", "_text", "_sse")
+
+    def __init__(self, payload: Any):
+        self.payload = payload
+        self._data: Optional[bytes] = None
+        self._text: Optional[str] = None
+        self._sse: Optional[str] = None
+
+    @property
+    def data(self) -> bytes:
+        """UTF-8 JSON bytes"""
+        if self._data is None:
+            self._data = orjson.dumps(self.payload, default=str)
+        return self._data
+
+    @property
+    def text(self) -> str:
+        """JSON text for WebSocket text frames"""
+        if self._text is None:
+            self._text = self.data.decode("utf-8")
+        return self._text
+
+    @property
+    def sse(self) -> str:
+        """Server-Sent Events frame"""
+        if self._sse is None:
+            self._sse = f"data: {self.text}\n\n"
+        return self._sse
+
+
+def envelope(payload: Any) -> MessageEnvelope:
+    """Wrap a payload for broadcasting"""
+    return MessageEnvelope(payload)
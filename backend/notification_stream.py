@@ -3,7 +3,6 @@
 Real-time notification streaming using Server-Sent Events (SSE)
 """
 import asyncio
-import json
 import sqlite3
 from datetime import datetime
 from fastapi import FastAPI, Depends, HTTPException
@@ -11,6 +10,10 @@ from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlite_auth import SQLiteAuth
 from ticket_database import TicketDatabase
+from message_envelope import MessageEnvelope, envelope
+from db_executor import run_db
+from sqlite_pool import connect_db
+from user_repository import user_repository
 
 # Initialize database connections
 db_auth = SQLiteAuth()
@@ -29,12 +32,13 @@ class NotificationStream:
         self.connections.discard(connection)
         
     async def broadcast_notification(self, notification):
-        """Broadcast notification to all connected clients"""
+        """Broadcast notification (a payload or MessageEnvelope) to all connected clients"""
         if self.connections:
-            message = f"data: {json.dumps(notification)}\n\n"
+            # Framed once and shared by every connection
+            message = (notification if isinstance(notification, MessageEnvelope) else envelope(notification)).sse
             disconnected = set()
             
-            for connection in self.connections:
+            for connection in list(self.connections):
                 try:
                     await connection.put(message)
                 except:
@@ -47,7 +51,8 @@ class NotificationStream:
     def get_latest_notifications(self, limit=10):
         """Get latest notifications from database"""
         try:
-            conn = sqlite3.connect(ticket_db.db_path, check_same_thread=False)
+            conn = connect_db(ticket_db.db_path, readonly=True)
+            conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
             cursor.execute("""
                 SELECT * FROM notifications 
@@ -64,10 +69,11 @@ class NotificationStream:
 # Global notification stream instance
 notification_stream = NotificationStream()
 
+CONNECTED_FRAME = envelope({'type': 'connected', 'message': 'Connected to notifications'}).sse
+
 async def get_current_user_from_token(token: str):
     """Get current authenticated user from token"""
     try:
-        # Try main database first
         payload = db_auth.verify_token(token)
         if payload is None:
             return None
@@ -76,19 +82,8 @@ async def get_current_user_from_token(token: str):
         if not username:
             return None
         
-        # Check main database first
-        user = db_auth.get_user_by_username(username)
-        if user:
-            return user
-        
-        # If not found in main database, check user management database
-        from user_management_db import UserManagementDB
-        user_db = UserManagementDB()
-        user = user_db.get_user_by_username(username)
-        if user:
-            return user
-        
-        return None
+        # One query across both user databases, usually answered from the identity cache
+        return await run_db(user_repository.get_identity, username)
     except Exception as e:
         return None
 
@@ -100,12 +95,12 @@ async def notification_generator():
     
     try:
         # Send initial connection confirmation
-        yield f"data: {json.dumps({'type': 'connected', 'message': 'Connected to notifications'})}\n\n"
+        yield CONNECTED_FRAME
         
         # Send latest notifications on connection
-        latest_notifications = notification_stream.get_latest_notifications()
+        latest_notifications = await run_db(notification_stream.get_latest_notifications)
         for notification in latest_notifications:
-            yield f"data: {json.dumps({'type': 'notification', 'data': notification})}\n\n"
+            yield envelope({'type': 'notification', 'data': notification}).sse
         
         # Keep connection alive and send new notifications
         while True:
@@ -115,7 +110,7 @@ async def notification_generator():
                 yield message
             except asyncio.TimeoutError:
                 # Send keep-alive ping
-                yield f"data: {json.dumps({'type': 'ping', 'timestamp': datetime.now().isoformat()})}\n\n"
+                yield envelope({'type': 'ping', 'timestamp': datetime.now().isoformat()}).sse
                 
     except Exception as e:
         print(f"Error in notification generator: {e}")
@@ -157,11 +152,7 @@ def create_notification_routes(app: FastAPI):
             if not user:
                 raise HTTPException(status_code=401, detail="Invalid token")
                 
-            conn = sqlite3.connect(ticket_db.db_path, check_same_thread=False)
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM notifications")
-            conn.commit()
-            conn.close()
+            await run_db(ticket_db.clear_notifications)
             
             # Broadcast clear event
             await notification_stream.broadcast_notification({
@@ -181,13 +172,9 @@ def create_notification_routes(app: FastAPI):
             if not user:
                 raise HTTPException(status_code=401, detail="Invalid token")
                 
-            conn = sqlite3.connect(ticket_db.db_path, check_same_thread=False)
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM notifications WHERE id = ?", (notification_id,))
-            conn.commit()
-            conn.close()
+            deleted = await run_db(ticket_db.delete_notification, notification_id)
             
-            if cursor.rowcount > 0:
+            if deleted:
                 # Broadcast deletion event
                 await notification_stream.broadcast_notification({
                     'type': 'notification_deleted',
@@ -208,7 +195,7 @@ def create_notification_routes(app: FastAPI):
             if not user:
                 raise HTTPException(status_code=401, detail="Invalid token")
                 
-            success = ticket_db.mark_notification_read(notification_id)
+            success = await run_db(ticket_db.mark_notification_read, notification_id)
             if success:
                 # Broadcast read event
                 await notification_stream.broadcast_notification({
@@ -252,7 +239,7 @@ def create_notification_routes(app: FastAPI):
             if not user:
                 raise HTTPException(status_code=401, detail="Invalid token")
                 
-            notifications = ticket_db.get_notifications(is_read=False)
+            notifications = await run_db(ticket_db.get_notifications, is_read=False)
             return {"notifications": notifications}
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
@@ -265,7 +252,7 @@ def create_notification_routes(app: FastAPI):
             if not user:
                 raise HTTPException(status_code=401, detail="Invalid token")
                 
-            count = ticket_db.get_unread_notification_count()
+            count = await run_db(ticket_db.get_unread_notification_count)
             return {"unread_count": count}
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
@@ -278,11 +265,7 @@ def create_notification_routes(app: FastAPI):
             if not user:
                 raise HTTPException(status_code=401, detail="Invalid token")
                 
-            conn = sqlite3.connect(ticket_db.db_path, check_same_thread=False)
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM notifications")
-            conn.commit()
-            conn.close()
+            await run_db(ticket_db.clear_notifications)
             
             # Broadcast clear event
             await notification_stream.broadcast_notification({
@@ -302,13 +285,9 @@ def create_notification_routes(app: FastAPI):
             if not user:
                 raise HTTPException(status_code=401, detail="Invalid token")
                 
-            conn = sqlite3.connect(ticket_db.db_path, check_same_thread=False)
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM notifications WHERE id = ?", (notification_id,))
-            conn.commit()
-            conn.close()
+            deleted = await run_db(ticket_db.delete_notification, notification_id)
             
-            if cursor.rowcount > 0:
+            if deleted:
                 # Broadcast deletion event
                 await notification_stream.broadcast_notification({
                     'type': 'notification_deleted',
@@ -329,7 +308,7 @@ def create_notification_routes(app: FastAPI):
             if not user:
                 raise HTTPException(status_code=401, detail="Invalid token")
                 
-            success = ticket_db.mark_notification_read(notification_id)
+            success = await run_db(ticket_db.mark_notification_read, notification_id)
             if success:
                 # Broadcast read event
                 await notification_stream.broadcast_notification({
@@ -348,7 +327,7 @@ async def broadcast_new_notification(notification_type: str, title: str, message
     """Broadcast a new notification to all connected clients"""
     try:
         # Create notification in database
-        notification = ticket_db.create_notification(notification_type, title, message, ticket_token)
+        notification = await run_db(ticket_db.create_notification, notification_type, title, message, ticket_token)
         
         # Broadcast to all connected clients
         await notification_stream.broadcast_notification({
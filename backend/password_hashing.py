@@ -0,0 +1,65 @@
+"""
+Password Hashing
+bcrypt hashes through passlib for both user stores, with legacy SHA-256 hashes upgraded on the next successful login,
+and a bounded thread pool so the deliberately slow hashing never runs on the event loop
+"""
+
+from __future__ import annotations
+
+import hashlib
+import hmac
+import os
+from typing import Any, Callable, Optional, Tuple, TypeVar
+
+from passlib.context import CryptContext
+
+from db_executor import BoundedExecutor
+
+T = TypeVar("T")
+
+# About 250 ms per hash at 12 rounds on one core; raise it as hardware gets faster
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# bcrypt releases the GIL, so threads hash in parallel; more workers than cores only adds queueing
+HASH_WORKERS = min(4, os.cpu_count() or 1)
+HASH_MAX_PENDING = 32
+
+# Hashes below the configured cost count as deprecated and are rehashed on login
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def verify_password(password: str, stored_hash: str) -> Tuple[bool, Optional[str]]:
+    """Check a password; returns (matches, new hash to store when the old one is legacy or below the current cost)"""
+    if not stored_hash:
+        return False, None
+    if stored_hash.startswith("$2"):
+        try:
+            return pwd_context.verify_and_update(password, stored_hash)
+        except ValueError:
+            return False, None
+    if _verify_legacy(password, stored_hash):
+        return True, hash_password(password)
+    return False, None
+
+
+def _verify_legacy(password: str, stored_hash: str) -> bool:
+    # user_management.db stored "salt:sha256(password + salt)", venturing.db a bare sha256(password)
+    if ":" in stored_hash:
+        salt, hash_value = stored_hash.split(":", 1)
+        candidate = hashlib.sha256((password + salt).encode()).hexdigest()
+    else:
+        hash_value = stored_hash
+        candidate = hashlib.sha256(password.encode()).hexdigest()
+    return hmac.compare_digest(candidate, hash_value)
+
+
+# Global password hashing executor
+hash_executor = BoundedExecutor(HASH_WORKERS, HASH_MAX_PENDING, "hash")
+
+
+async def run_hashing(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run work that hashes or verifies passwords off the event loop"""
+    return await hash_executor.run(fn, *args, **kwargs)
@@ -3,23 +3,24 @@
 Reports API for downloading chat conversations and analytics data
 """
 
-import sqlite3
-import json
 import csv
 import io
 from datetime import datetime, timedelta
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import StreamingResponse
+from db_executor import run_db
+from sqlite_pool import connect_db
+from chat_queries import MESSAGES_TODAY_SQL, SESSIONS_TODAY_SQL
 
 router = APIRouter()
 
 def get_chat_conversations():
     """Get all chat conversations from database"""
     try:
-        conn = sqlite3.connect('venturing.db')
+        conn = connect_db('venturing.db', readonly=True)
         cursor = conn.cursor()
         
-        # Get chat sessions with messages
+        # Get chat sessions
         cursor.execute("""
             SELECT 
                 cs.id as session_id,
@@ -28,21 +29,35 @@ def get_chat_conversations():
                 cs.status,
                 cs.started_at,
                 cs.ended_at,
-                cm.messages_json,
-                cm.message_count,
-                cm.last_message,
-                cm.last_sender,
                 u.full_name as support_name
             FROM chat_sessions cs
-            LEFT JOIN chat_messages cm ON cs.id = cm.session_id
             LEFT JOIN users u ON cs.support_user_id = u.id
             ORDER BY cs.started_at DESC
         """)
-        
         sessions = cursor.fetchall()
+        
+        # Get every message in one ordered pass and group it by session
+        cursor.execute("""
+            SELECT session_id, sender_type, message
+            FROM chat_messages
+            ORDER BY session_id, id
+        """)
+        messages_by_session = {}
+        for session_id, sender_type, message in cursor.fetchall():
+            messages_by_session.setdefault(session_id, []).append((sender_type, message))
+        
         conn.close()
         
-        return sessions
+        conversations = []
+        for session_id, user_id, support_user_id, status, started_at, ended_at, support_name in sessions:
+            messages = messages_by_session.get(session_id, [])
+            last_sender, last_message = messages[-1] if messages else (None, None)
+            conversations.append((
+                session_id, user_id, support_user_id, status, started_at, ended_at,
+                messages, len(messages), last_message, last_sender, support_name
+            ))
+        
+        return conversations
     except Exception as e:
         print(f"Error getting chat conversations: {e}")
         return []
@@ -50,7 +65,7 @@ def get_chat_conversations():
 def get_conversations_count():
     """Get total conversations count"""
     try:
-        conn = sqlite3.connect('venturing.db')
+        conn = connect_db('venturing.db', readonly=True)
         cursor = conn.cursor()
         
         # Get total conversations
@@ -58,10 +73,7 @@ def get_conversations_count():
         total_conversations = cursor.fetchone()[0] or 0
         
         # Get today's conversations
-        cursor.execute("""
-            SELECT COUNT(*) FROM chat_sessions 
-            WHERE date(started_at) = date('now')
-        """)
+        cursor.execute(SESSIONS_TODAY_SQL)
         today_conversations = cursor.fetchone()[0] or 0
         
         conn.close()
@@ -77,55 +89,54 @@ def get_conversations_count():
 @router.get("/reports/conversations/count")
 async def get_conversations_count_api():
     """Get conversations count for reports"""
-    return get_conversations_count()
+    return await run_db(get_conversations_count)
+
+def build_conversations_csv() -> str:
+    """Build the conversations export as CSV text"""
+    conversations = get_chat_conversations()
+
+    # Create CSV content
+    output = io.StringIO()
+    writer = csv.writer(output)
+
+    # Write header
+    writer.writerow([
+        'Session ID', 'User ID', 'Support User', 'Status', 
+        'Started At', 'Ended At', 'Message Count', 
+        'Last Message', 'Last Sender', 'All Messages'
+    ])
+
+    # Write data
+    for session in conversations:
+        session_id, user_id, support_user_id, status, started_at, ended_at, messages, message_count, last_message, last_sender, support_name = session
+
+        all_messages = " | ".join([f"{sender_type or 'Unknown'}: {message or ''}" for sender_type, message in messages])
+
+        writer.writerow([
+            session_id,
+            user_id or 'N/A',
+            support_name or 'N/A',
+            status or 'N/A',
+            started_at or 'N/A',
+            ended_at or 'N/A',
+            message_count or 0,
+            last_message or 'N/A',
+            last_sender or 'N/A',
+            all_messages
+        ])
+
+    # Prepare response
+    output.seek(0)
+    content = output.getvalue()
+    output.close()
+    return content
 
 @router.get("/reports/conversations/download")
 async def download_conversations():
     """Download chat conversations as Excel CSV"""
     try:
-        conversations = get_chat_conversations()
-        
-        # Create CSV content
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Write header
-        writer.writerow([
-            'Session ID', 'User ID', 'Support User', 'Status', 
-            'Started At', 'Ended At', 'Message Count', 
-            'Last Message', 'Last Sender', 'All Messages'
-        ])
-        
-        # Write data
-        for session in conversations:
-            session_id, user_id, support_user_id, status, started_at, ended_at, messages_json, message_count, last_message, last_sender, support_name = session
-            
-            # Parse messages JSON
-            all_messages = ""
-            if messages_json:
-                try:
-                    messages = json.loads(messages_json)
-                    all_messages = " | ".join([f"{msg.get('sender', 'Unknown')}: {msg.get('message', '')}" for msg in messages])
-                except:
-                    all_messages = messages_json
-            
-            writer.writerow([
-                session_id,
-                user_id or 'N/A',
-                support_name or 'N/A',
-                status or 'N/A',
-                started_at or 'N/A',
-                ended_at or 'N/A',
-                message_count or 0,
-                last_message or 'N/A',
-                last_sender or 'N/A',
-                all_messages
-            ])
-        
-        # Prepare response
-        output.seek(0)
-        content = output.getvalue()
-        output.close()
+        # Querying and formatting every session is slow, so do it off the event loop
+        content = await run_db(build_conversations_csv)
         
         # Create filename with timestamp
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -141,36 +152,35 @@ async def download_conversations():
         print(f"Error downloading conversations: {e}")
         raise HTTPException(status_code=500, detail="Error downloading conversations")
 
+def get_analytics_totals():
+    """Get (total_sessions, today_sessions, total_messages, today_messages, total_faqs)"""
+    conn = connect_db('venturing.db', readonly=True)
+    cursor = conn.cursor()
+
+    # Get analytics data
+    cursor.execute("SELECT COUNT(*) FROM chat_sessions")
+    total_sessions = cursor.fetchone()[0] or 0
+
+    cursor.execute(SESSIONS_TODAY_SQL)
+    today_sessions = cursor.fetchone()[0] or 0
+
+    cursor.execute("SELECT COUNT(*) FROM chat_messages")
+    total_messages = cursor.fetchone()[0] or 0
+
+    cursor.execute(MESSAGES_TODAY_SQL)
+    today_messages = cursor.fetchone()[0] or 0
+
+    cursor.execute("SELECT COUNT(*) FROM faqs")
+    total_faqs = cursor.fetchone()[0] or 0
+
+    conn.close()
+    return total_sessions, today_sessions, total_messages, today_messages, total_faqs
+
 @router.get("/reports/analytics/download")
 async def download_analytics():
     """Download analytics data as Excel CSV"""
     try:
-        conn = sqlite3.connect('venturing.db')
-        cursor = conn.cursor()
-        
-        # Get analytics data
-        cursor.execute("SELECT COUNT(*) FROM chat_sessions")
-        total_sessions = cursor.fetchone()[0] or 0
-        
-        cursor.execute("""
-            SELECT COUNT(*) FROM chat_sessions 
-            WHERE date(started_at) = date('now')
-        """)
-        today_sessions = cursor.fetchone()[0] or 0
-        
-        cursor.execute("SELECT COUNT(*) FROM chat_messages")
-        total_messages = cursor.fetchone()[0] or 0
-        
-        cursor.execute("""
-            SELECT COUNT(*) FROM chat_messages 
-            WHERE date(created_at) = date('now')
-        """)
-        today_messages = cursor.fetchone()[0] or 0
-        
-        cursor.execute("SELECT COUNT(*) FROM faqs")
-        total_faqs = cursor.fetchone()[0] or 0
-        
-        conn.close()
+        total_sessions, today_sessions, total_messages, today_messages, total_faqs = await run_db(get_analytics_totals)
         
         # Create CSV content
         output = io.StringIO()
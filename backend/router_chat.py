@@ -1,12 +1,19 @@
 from __future__ import annotations
 
+import re
+import uuid
 from typing import List
-from fastapi import APIRouter
+from fastapi import APIRouter, Request, Response
 from schemas import ChatRequest, ChatResponse
 from faq_database import faq_db
+from db_executor import run_db
 
 router = APIRouter()
 
+SESSION_COOKIE = "vd_chat_session"
+SESSION_COOKIE_MAX_AGE = 30 * 24 * 60 * 60
+SESSION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+
 # Configuration constants
 OPENAI_API_KEY = "sk-proj-your-key-here"
 CHAT_MODEL = "gpt-3.5-turbo"
@@ -24,11 +31,18 @@ def _generate_unknown_question_response(query: str, analysis: dict) -> str:
 
 Would you like me to help you with any of these options?"""
 
+def _resolve_session_id(req: ChatRequest, request: Request) -> str:
+    """Get the visitor's chat session ID from the request body or cookie, or mint a new one"""
+    for candidate in (req.session_id, request.cookies.get(SESSION_COOKIE)):
+        if candidate and SESSION_ID_PATTERN.match(candidate):
+            return candidate
+    return uuid.uuid4().hex
+
 @router.get("/faq-suggestions")
 async def get_faq_suggestions(limit: int = 6):
     """Get FAQ suggestions for the chat widget"""
     try:
-        faqs = faq_db.get_all_faqs()
+        faqs = await run_db(faq_db.get_all_faqs)
         
         # Get random FAQs up to the limit
         import random
@@ -48,16 +62,26 @@ async def get_faq_suggestions(limit: int = 6):
         print(f"Error getting FAQ suggestions: {e}")
         return {"suggestions": []}
 
+@router.get("/faq-autocomplete")
+async def get_faq_autocomplete(prefix: str = "", limit: int = 5):
+    """Get type-ahead FAQ questions for the chat widget"""
+    try:
+        # The first request after startup may have to build the index; searching it is in memory
+        if not faq_db.autocomplete.loaded:
+            await run_db(faq_db.load_autocomplete)
+        return {"suggestions": faq_db.autocomplete_questions(prefix, limit=max(1, min(limit, 10)))}
+    except Exception as e:
+        print(f"Error getting FAQ autocomplete: {e}")
+        return {"suggestions": []}
+
 @router.post("/chat", response_model=ChatResponse)
-async def chat(req: ChatRequest):
+async def chat(req: ChatRequest, request: Request, response: Response):
     """Main chat endpoint"""
     print(f"Chat request: '{req.query}'")
     
-    # Generate user ID for conversation tracking
-    user_id = "anonymous_user"
-    
-    # Load FAQs from database
-    faqs = faq_db.get_all_faqs()
+    # Each visitor gets their own conversation session
+    user_id = _resolve_session_id(req, request)
+    response.set_cookie(SESSION_COOKIE, user_id, max_age=SESSION_COOKIE_MAX_AGE, httponly=True, samesite="lax")
     
     # Step 0: Check for greetings first (before FAQ check)
     greeting_words = ["hi", "hello", "hey", "good morning", "good afternoon", "good evening", "namaste", "namaskar"]
@@ -101,37 +125,56 @@ async def chat(req: ChatRequest):
         return ChatResponse(
             answer=answer,
             sources=["Venturing Digitally"],
-            suggestions=suggestions
+            suggestions=suggestions,
+            session_id=user_id
         )
 
     # Step 1: Check FAQs for non-greeting queries
     faq_response = None
     try:
         print(f"Checking FAQs for: '{req.query}'")
-        matching_faq = faq_db.find_matching_faq(req.query)
+        matching_faq = await run_db(faq_db.find_matching_faq, req.query)
         
         if matching_faq:
             print(f"Found matching FAQ: {matching_faq['question']}")
             # Update views count in database
-            faq_db.increment_views(matching_faq['id'])
+            await run_db(faq_db.increment_views, matching_faq['id'])
             
             # Return the FAQ answer
             category_name = matching_faq.get("customCategory") if matching_faq.get("category") == "Custom" else matching_faq.get("category", "General")
             
-            # Get database-based suggestions
+            # Record the FAQ -> FAQ transition and remember this turn
+            from conversation_memory import conversation_memory
+            from faq_transition_model import faq_transition_model
+            previous_turns = conversation_memory.get_conversation_context(user_id).get('conversation', [])
+            if previous_turns:
+                faq_transition_model.record_transition(previous_turns[-1].get('faq_id'), matching_faq['id'])
+            conversation_memory.add_to_conversation(
+                user_id, req.query, matching_faq['answer'], 'faq', faq_id=matching_faq['id']
+            )
+
+            # Suggest what users usually ask next, topped up with database FAQs
             from suggestion_engine import suggestion_engine
-            db_suggestions = suggestion_engine.get_database_faq_suggestions(limit=4)
-            
+            suggestions = suggestion_engine.get_next_question_suggestions(matching_faq['id'], limit=4)
+            seen = {s['text'] for s in suggestions} | {matching_faq['question']}
+            for suggestion in await run_db(suggestion_engine.get_database_faq_suggestions, limit=8):
+                if len(suggestions) >= 4:
+                    break
+                if suggestion['text'] not in seen:
+                    suggestions.append(suggestion)
+                    seen.add(suggestion['text'])
+
             return ChatResponse(
                 answer=matching_faq['answer'],
                 sources=[f"FAQ - {category_name}"],
-                suggestions=db_suggestions
+                suggestions=suggestions,
+                session_id=user_id
             )
         else:
             print(f"No FAQ match found for: '{req.query}'")
             # Get database-based suggestions for no match case
             from suggestion_engine import suggestion_engine
-            db_suggestions = suggestion_engine.get_database_faq_suggestions(limit=3)
+            db_suggestions = await run_db(suggestion_engine.get_database_faq_suggestions, limit=3)
             
             # Add action suggestions
             action_suggestions = [
@@ -169,7 +212,8 @@ I can help you in two ways:
 
 Which option would you prefer?""",
                 sources=["Support System"],
-                suggestions=all_suggestions
+                suggestions=all_suggestions,
+                session_id=user_id
             )
     except Exception as e:
         print(f"FAQ check error: {e}")
@@ -200,5 +244,6 @@ Would you like me to help you create a support ticket?""",
                     "category": "services",
                     "action": "services"
                 }
-            ]
+            ],
+            session_id=user_id
         )
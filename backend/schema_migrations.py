@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Schema Migrations for venturing.db
+Versioned index migrations applied at startup, plus an EXPLAIN QUERY PLAN check for the hot chat queries
+
+Run `python schema_migrations.py --check [db_path]` to verify no hot query falls back to a full table scan.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import sys
+from typing import List, Tuple
+
+import chat_queries
+
+# (version, name, statements); each statement is (table it needs, SQL)
+MIGRATIONS: List[Tuple[int, str, List[Tuple[str, str]]]] = [
+    (1, "chat query indexes", [
+        # Keyset pages of /chat/sessions/all, today's session counts and the conversations export
+        ("chat_sessions", "CREATE INDEX IF NOT EXISTS idx_chat_sessions_started_at ON chat_sessions(started_at)"),
+        # Covers the live-users and session-duration analytics without touching the table
+        ("chat_sessions", "CREATE INDEX IF NOT EXISTS idx_chat_sessions_recent ON chat_sessions(started_at, user_id, ended_at)"),
+        # An agent's active sessions, newest first, and their load count
+        ("chat_sessions", "CREATE INDEX IF NOT EXISTS idx_chat_sessions_support_status ON chat_sessions(support_user_id, status, started_at)"),
+        # Pending queue, rejected list and expiry restore
+        ("chat_requests", "CREATE INDEX IF NOT EXISTS idx_chat_requests_status_created ON chat_requests(status, created_at)"),
+        ("chat_messages", "CREATE INDEX IF NOT EXISTS idx_chat_messages_created_at ON chat_messages(created_at)"),
+    ]),
+]
+
+# Indexes on tables this codebase doesn't create; applied on every startup once the table exists,
+# so they never hold a versioned migration pending
+GUARDED_INDEXES: List[Tuple[str, str]] = [
+    # Today's feedback counts and recent feedback
+    ("chat_feedback", "CREATE INDEX IF NOT EXISTS idx_chat_feedback_created_at ON chat_feedback(created_at, overall_rating)"),
+    ("chat_feedback", "CREATE INDEX IF NOT EXISTS idx_chat_feedback_session_id ON chat_feedback(session_id)"),
+]
+
+# Hot queries that must be index-backed, as (source, SQL the source runs, sample parameters)
+HOT_QUERIES: List[Tuple[str, str, tuple]] = [
+    ("live_chat_api.load_pending_requests", chat_queries.PENDING_REQUESTS_SQL, ()),
+    ("live_chat_api.get_rejected_requests", chat_queries.REJECTED_REQUESTS_SQL, ()),
+    ("live_chat_api.load_agent_profile", chat_queries.AGENT_ACTIVE_SESSION_COUNT_SQL, (1,)),
+    ("live_chat_api.get_chat_sessions", chat_queries.AGENT_ACTIVE_SESSIONS_SQL, (1,)),
+    ("live_chat_api.get_all_sessions", chat_queries.ALL_SESSIONS_SQL, (101,)),
+    ("live_chat_api.get_all_sessions (before)", chat_queries.ALL_SESSIONS_BEFORE_SQL, ("2100-01-01 00:00:00", 0, 101)),
+    ("live_chat_api.fetch_session_messages (after)", chat_queries.SESSION_MESSAGES_AFTER_SQL, (1, 1, 51)),
+    ("live_chat_api.fetch_session_messages (before)", chat_queries.SESSION_MESSAGES_BEFORE_SQL, (1, 1, 51)),
+    ("chat_request_expiry.restore", chat_queries.PENDING_EXPIRIES_SQL, ()),
+    ("analytics_stream.live_users", chat_queries.LIVE_USERS_SQL, ()),
+    ("analytics_stream.messages_today", chat_queries.MESSAGES_TODAY_SQL, ()),
+    ("analytics_stream.avg_response_time", chat_queries.AVG_SESSION_DURATION_SQL, ()),
+    ("analytics_stream.positive_feedback_today", chat_queries.POSITIVE_FEEDBACK_TODAY_SQL, ()),
+    ("analytics_stream.feedback_today", chat_queries.FEEDBACK_TODAY_SQL, ()),
+    ("reports_api.sessions_today", chat_queries.SESSIONS_TODAY_SQL, ()),
+]
+
+
+def _table_exists(conn: sqlite3.Connection, table: str) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    ).fetchone() is not None
+
+
+def apply_migrations(db_path: str = "venturing.db") -> List[int]:
+    """Apply pending migrations; returns the versions applied
+
+    A migration whose tables don't exist yet is left pending and retried on the next startup.
+    """
+    applied = []
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        done = {row[0] for row in conn.execute("SELECT version FROM schema_migrations")}
+
+        for version, name, statements in MIGRATIONS:
+            if version in done:
+                continue
+            complete = True
+            for table, sql in statements:
+                if _table_exists(conn, table):
+                    conn.execute(sql)
+                else:
+                    complete = False
+            if complete:
+                conn.execute("INSERT INTO schema_migrations (version, name) VALUES (?, ?)", (version, name))
+                applied.append(version)
+            conn.commit()
+
+        for table, sql in GUARDED_INDEXES:
+            if _table_exists(conn, table):
+                conn.execute(sql)
+        conn.commit()
+
+        # Refresh planner statistics for the new indexes
+        conn.execute("PRAGMA optimize")
+    except Exception as e:
+        conn.rollback()
+        print(f"Error applying schema migrations: {e}")
+    finally:
+        conn.close()
+    return applied
+
+
+def check_query_plans(conn: sqlite3.Connection) -> List[Tuple[str, str]]:
+    """Get (source, plan step) for each hot query step that scans a whole table"""
+    problems = []
+    optional_tables = {table for table, _ in GUARDED_INDEXES}
+    for source, sql, params in HOT_QUERIES:
+        try:
+            plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+        except sqlite3.OperationalError as e:
+            # Queries on tables this codebase doesn't create can't be checked until the table exists
+            if not any(str(e) == f"no such table: {table}" for table in optional_tables):
+                problems.append((source, f"not checked: {e}"))
+            continue
+        for step in plan:
+            detail = step[3]
+            # "SCAN t USING ... INDEX" walks an index in order; a bare "SCAN t" reads every row
+            if detail.startswith("SCAN ") and " INDEX " not in f"{detail} ":
+                problems.append((source, detail))
+    return problems
+
+
+def main(argv: List[str]) -> int:
+    if len(argv) < 2 or argv[1] != "--check":
+        print("Usage: python schema_migrations.py --check [db_path]")
+        return 2
+    db_path = argv[2] if len(argv) > 2 else "venturing.db"
+
+    # Check a migrated in-memory copy so the real database is left untouched
+    source = sqlite3.connect(db_path)
+    conn = sqlite3.connect(":memory:")
+    source.backup(conn)
+    source.close()
+    for table, sql in [statement for _, _, statements in MIGRATIONS for statement in statements] + GUARDED_INDEXES:
+        if _table_exists(conn, table):
+            conn.execute(sql)
+
+    problems = check_query_plans(conn)
+    conn.close()
+    for source_name, detail in problems:
+        print(f"FAIL {source_name}: {detail}")
+    if not problems:
+        print(f"OK: {len(HOT_QUERIES)} hot queries are index-backed")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
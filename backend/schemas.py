@@ -10,11 +10,13 @@ from datetime import datetime
 
 class ChatRequest(BaseModel):
     query: str = Field(..., min_length=1, max_length=4000)
+    session_id: Optional[str] = Field(None, max_length=64)
 
 class ChatResponse(BaseModel):
     answer: str
     sources: list[str]
     suggestions: List[Dict[str, Any]] = []
+    session_id: Optional[str] = None
 
 # Authentication Schemas
 class LoginRequest(BaseModel):
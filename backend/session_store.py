@@ -0,0 +1,135 @@
+"""
+Key-value session store
+In-process backend for single-worker runs, Redis-compatible backend shared by every worker
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+try:
+    import redis
+except ImportError:  # Optional dependency, only needed when SESSION_STORE_URL points at Redis
+    redis = None
+
+
+class KeyValueStore:
+    """Interface for session key-value backends"""
+
+    # True when other processes see the same data, so callers must read through instead of caching
+    shared = False
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        """Get the values for keys, None where a key is missing"""
+        raise NotImplementedError
+
+    def set_many(self, items: Dict[str, bytes], ttl: Optional[int] = None):
+        """Set several keys at once, optionally expiring after ttl seconds"""
+        raise NotImplementedError
+
+    def delete_many(self, keys: Iterable[str]):
+        """Delete several keys at once"""
+        raise NotImplementedError
+
+    def scan(self, prefix: str) -> Dict[str, bytes]:
+        """Get every key starting with prefix"""
+        raise NotImplementedError
+
+    def purge_expired(self):
+        """Drop expired keys if the backend doesn't do it by itself"""
+
+
+class InProcessKeyValueStore(KeyValueStore):
+    """Dictionary-backed store local to this process"""
+
+    def __init__(self):
+        self._data: Dict[str, bytes] = {}
+        self._expires: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        now = time.time()
+        with self._lock:
+            return [
+                self._data.get(key) if self._expires.get(key, now + 1) > now else None
+                for key in keys
+            ]
+
+    def set_many(self, items: Dict[str, bytes], ttl: Optional[int] = None):
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            for key, value in items.items():
+                self._data[key] = value
+                if expires_at:
+                    self._expires[key] = expires_at
+                else:
+                    self._expires.pop(key, None)
+
+    def delete_many(self, keys: Iterable[str]):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+                self._expires.pop(key, None)
+
+    def scan(self, prefix: str) -> Dict[str, bytes]:
+        now = time.time()
+        with self._lock:
+            return {
+                key: value for key, value in self._data.items()
+                if key.startswith(prefix) and self._expires.get(key, now + 1) > now
+            }
+
+    def purge_expired(self):
+        now = time.time()
+        with self._lock:
+            expired = [key for key, expires_at in self._expires.items() if expires_at <= now]
+            for key in expired:
+                self._data.pop(key, None)
+                self._expires.pop(key, None)
+
+
+class RedisKeyValueStore(KeyValueStore):
+    """Networked store speaking the Redis protocol; every worker sees the same keys"""
+
+    shared = True
+
+    def __init__(self, url: Optional[str] = None, client=None):
+        if client is None:
+            if redis is None:
+                raise RuntimeError("SESSION_STORE_URL is set but the 'redis' package is not installed")
+            client = redis.Redis.from_url(url)
+        self.client = client
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        if not keys:
+            return []
+        return self.client.mget(keys)
+
+    def set_many(self, items: Dict[str, bytes], ttl: Optional[int] = None):
+        if not items:
+            return
+        pipe = self.client.pipeline(transaction=False)
+        for key, value in items.items():
+            pipe.set(key, value, ex=ttl)
+        pipe.execute()
+
+    def delete_many(self, keys: Iterable[str]):
+        keys = list(keys)
+        if keys:
+            self.client.delete(*keys)
+
+    def scan(self, prefix: str) -> Dict[str, bytes]:
+        keys = [key.decode('utf-8') if isinstance(key, bytes) else key
+                for key in self.client.scan_iter(match=f"{prefix}*", count=500)]
+        return {key: value for key, value in zip(keys, self.get_many(keys)) if value is not None}
+
+
+def create_session_store() -> KeyValueStore:
+    """Create the store selected by SESSION_STORE_URL (redis://...), or an in-process one"""
+    url = os.getenv("SESSION_STORE_URL")
+    if url:
+        return RedisKeyValueStore(url)
+    return InProcessKeyValueStore()
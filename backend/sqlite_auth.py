@@ -7,11 +7,13 @@ Immediate working solution
 import sqlite3
 import os
 import secrets
-import hashlib
 from datetime import datetime, timedelta, timezone
 from typing import Optional, Dict, Any, List
 from jose import JWTError, jwt
 from dotenv import load_dotenv
+from sqlite_pool import connect_db, shared_connection
+import password_hashing
+from login_activity import login_activity
 
 load_dotenv()
 
@@ -27,15 +29,18 @@ class SQLiteAuth:
     """SQLite database authentication system"""
     
     def __init__(self):
-        self.connection = None
         self._connect()
         self._init_tables()
     
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """This thread's long-lived connection, so one connection is never used from two threads"""
+        return shared_connection(DB_FILE)
+    
     def _connect(self):
         """Connect to SQLite database"""
         try:
-            self.connection = sqlite3.connect(DB_FILE)
-            self.connection.row_factory = sqlite3.Row
+            self.connection
             print("Connected to SQLite database")
         except Exception as e:
             print(f"Error connecting to SQLite: {e}")
@@ -110,12 +115,12 @@ class SQLiteAuth:
             raise
     
     def hash_password(self, password: str) -> str:
-        """Hash password using SHA256"""
-        return hashlib.sha256(password.encode()).hexdigest()
+        """Hash password using bcrypt"""
+        return password_hashing.hash_password(password)
     
     def verify_password(self, plain_password: str, hashed_password: str) -> bool:
-        """Verify password against hash"""
-        return self.hash_password(plain_password) == hashed_password
+        """Verify password against a bcrypt or legacy SHA256 hash"""
+        return password_hashing.verify_password(plain_password, hashed_password)[0]
     
     def create_access_token(self, data: dict, expires_delta: Optional[timedelta] = None):
         """Create JWT access token"""
@@ -180,17 +185,23 @@ class SQLiteAuth:
     def authenticate_user(self, username: str, password: str) -> Optional[Dict[str, Any]]:
         """Authenticate user with username and password"""
         user = self.get_user_by_username(username)
-        if not user or not self.verify_password(password, user["password_hash"]):
+        if not user:
+            return None
+        matches, new_hash = password_hashing.verify_password(password, user["password_hash"])
+        if not matches:
             return None
         
-        # Update last login
-        try:
-            cursor = self.connection.cursor()
-            cursor.execute("UPDATE users SET last_login = ? WHERE id = ?", (datetime.utcnow(), user["id"]))
-            self.connection.commit()
-            cursor.close()
-        except Exception as e:
-            print(f"Error updating last login: {e}")
+        # last_login is written in batches by the login activity tracker
+        login_activity.record_login("admin", user["id"])
+        if new_hash:
+            # Legacy or weaker hash: replace it now that we know the password
+            try:
+                cursor = self.connection.cursor()
+                cursor.execute("UPDATE users SET password_hash = ? WHERE id = ?", (new_hash, user["id"]))
+                self.connection.commit()
+                cursor.close()
+            except Exception as e:
+                print(f"Error upgrading password hash: {e}")
         
         return user
     
@@ -276,7 +287,7 @@ class SQLiteAuth:
 
     def update_user_profile(self, user_id: int, full_name: str = None, email: str = None, username: str = None) -> Optional[Dict]:
         """Update user profile information"""
-        conn = sqlite3.connect(DB_FILE, check_same_thread=False)
+        conn = connect_db(DB_FILE)
         cursor = conn.cursor()
         
         try:
@@ -340,7 +351,7 @@ class SQLiteAuth:
 
     def update_user_password(self, user_id: int, new_password: str) -> bool:
         """Update user password"""
-        conn = sqlite3.connect(DB_FILE, check_same_thread=False)
+        conn = connect_db(DB_FILE)
         cursor = conn.cursor()
         
         try:
@@ -362,7 +373,7 @@ class SQLiteAuth:
 
     def update_user_profile_image(self, user_id: int, profile_image: str) -> bool:
         """Update user profile image"""
-        conn = sqlite3.connect(DB_FILE, check_same_thread=False)
+        conn = connect_db(DB_FILE)
         cursor = conn.cursor()
         
         try:
@@ -382,7 +393,7 @@ class SQLiteAuth:
     def get_all_faqs(self):
         """Get all FAQs from database"""
         try:
-            conn = sqlite3.connect(DB_FILE, check_same_thread=False)
+            conn = connect_db(DB_FILE)
             conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
             cursor.execute("""
@@ -401,7 +412,7 @@ class SQLiteAuth:
     def update_faq_views(self, faq_id: int):
         """Update FAQ views count"""
         try:
-            conn = sqlite3.connect(DB_FILE, check_same_thread=False)
+            conn = connect_db(DB_FILE)
             cursor = conn.cursor()
             cursor.execute("""
                 UPDATE faqs 
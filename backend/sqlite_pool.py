@@ -0,0 +1,140 @@
+"""
+SQLite Connection Pool
+One access layer for the app's SQLite databases: per-thread pooled connections in WAL mode with tuned pragmas
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+BUSY_TIMEOUT_MS = 5000
+CACHE_SIZE_KIB = 16000
+STATEMENT_CACHE_SIZE = 256  # prepared statements kept per connection
+MAX_IDLE_PER_THREAD = 4
+
+
+class PooledConnection(sqlite3.Connection):
+    """A connection whose close() hands it back to its thread's pool"""
+
+    pool: Optional["ConnectionPool"] = None
+    key: Tuple[str, bool] = ("", False)
+    owner: int = 0
+    checked_out = False
+
+    def close(self):
+        if self.pool is None:
+            super().close()
+        elif self.checked_out:
+            self.checked_out = False
+            self.pool.release(self)
+
+    def discard(self):
+        """Really close the connection"""
+        self.pool = None
+        super().close()
+
+
+class ConnectionPool:
+    """Idle connections kept per thread, keyed by database path and read/write mode
+
+    Readers and writers get separate connections; WAL lets readers run while a write is in progress.
+    """
+
+    def __init__(self, max_idle_per_thread: int = MAX_IDLE_PER_THREAD):
+        self.max_idle = max_idle_per_thread
+        self.local = threading.local()
+        self.wal_paths: Set[str] = set()
+        self.lock = threading.Lock()
+
+    def connect(self, db_path: str = "venturing.db", readonly: bool = False) -> PooledConnection:
+        """Check out a connection; close() returns it, rolling back anything left uncommitted"""
+        idle = self._idle().get((db_path, readonly))
+        conn = idle.pop() if idle else self._open(db_path, readonly)
+        conn.pool = self
+        conn.checked_out = True
+        return conn
+
+    def shared_connection(self, db_path: str = "venturing.db") -> PooledConnection:
+        """The calling thread's long-lived connection, for classes that hold one open; rows are sqlite3.Row"""
+        shared: Dict[str, PooledConnection] = getattr(self.local, "shared", None)
+        if shared is None:
+            shared = self.local.shared = {}
+        conn = shared.get(db_path)
+        if conn is None:
+            conn = shared[db_path] = self._open(db_path, False)
+            conn.row_factory = sqlite3.Row
+        return conn
+
+    def open(self, db_path: str = "venturing.db", readonly: bool = False) -> PooledConnection:
+        """A tuned connection outside the pool, for callers that keep it (e.g. with other databases attached)"""
+        return self._open(db_path, readonly)
+
+    def release(self, conn: PooledConnection):
+        # A connection closed from another thread can't join that thread's pool
+        if conn.owner != threading.get_ident():
+            conn.discard()
+            return
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = None
+        except sqlite3.Error:
+            conn.discard()
+            return
+        idle = self._idle().setdefault(conn.key, [])
+        if len(idle) < self.max_idle:
+            idle.append(conn)
+        else:
+            conn.discard()
+
+    def _idle(self) -> Dict[Tuple[str, bool], List[PooledConnection]]:
+        idle = getattr(self.local, "idle", None)
+        if idle is None:
+            idle = self.local.idle = {}
+        return idle
+
+    def _open(self, db_path: str, readonly: bool) -> PooledConnection:
+        conn = sqlite3.connect(
+            db_path,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            factory=PooledConnection,
+            cached_statements=STATEMENT_CACHE_SIZE,
+            check_same_thread=False,
+        )
+        conn.key = (db_path, readonly)
+        conn.owner = threading.get_ident()
+
+        # journal_mode is stored in the database file, so switching once per path is enough
+        with self.lock:
+            needs_wal = db_path not in self.wal_paths
+            self.wal_paths.add(db_path)
+        if needs_wal:
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+            except sqlite3.OperationalError as e:
+                print(f"Error enabling WAL for {db_path}: {e}")
+                with self.lock:
+                    self.wal_paths.discard(db_path)
+
+        conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        conn.execute("PRAGMA synchronous = NORMAL")  # Durable across app crashes in WAL mode
+        conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KIB}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        if readonly:
+            conn.execute("PRAGMA query_only = ON")
+        return conn
+
+
+# Global connection pool
+connection_pool = ConnectionPool()
+
+
+def connect_db(db_path: str = "venturing.db", readonly: bool = False) -> PooledConnection:
+    """Get a pooled connection; use readonly=True for queries that never write"""
+    return connection_pool.connect(db_path, readonly)
+
+
+def shared_connection(db_path: str = "venturing.db") -> PooledConnection:
+    return connection_pool.shared_connection(db_path)
@@ -256,6 +256,10 @@ class SuggestionEngine:
         
         suggestions = []
         last_intent = conversation_context[-1].get('intent', '') if conversation_context else ''
+        last_faq_id = conversation_context[-1].get('faq_id') if conversation_context else None
+        
+        if last_faq_id:
+            suggestions.extend(self.get_next_question_suggestions(last_faq_id, limit=3))
         
         if last_intent == 'services':
             for suggestion in self.context_suggestions['after_services'][:3]:
@@ -295,6 +299,22 @@ class SuggestionEngine:
         
         return suggestions
     
+    def get_next_question_suggestions(self, faq_id: str, limit: int = 3) -> List[Dict]:
+        """Get suggestions for the FAQs users most often ask after the given FAQ"""
+        from faq_transition_model import faq_transition_model
+        
+        suggestions = []
+        for next_faq_id, question in faq_transition_model.get_next_questions(faq_id, limit):
+            suggestions.append({
+                'text': question,
+                'type': 'faq',
+                'category': 'next_question',
+                'action': 'query',
+                'faq_id': next_faq_id
+            })
+        
+        return suggestions
+    
     def _get_industry_suggestions(self, industries: List[str]) -> List[Dict]:
         """Get industry-specific suggestions"""
         suggestions = []
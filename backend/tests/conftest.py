@@ -0,0 +1,91 @@
+"""
+Test Fixtures
+Runs the backend against throwaway databases: the modules open their SQLite files relative to the
+working directory as they are imported, so tests switch to a temp directory before importing them
+"""
+
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+WORK_DIR = tempfile.mkdtemp(prefix="venturing-tests-")
+os.chdir(WORK_DIR)
+
+# Columns and tables the deployed venturing.db has on top of chat_schema.sql
+CHAT_SCHEMA_EXTRAS = """
+    ALTER TABLE chat_requests ADD COLUMN subcategory_id INTEGER;
+    ALTER TABLE chat_requests ADD COLUMN rejection_reason TEXT;
+    ALTER TABLE chat_requests ADD COLUMN rejected_by INTEGER;
+    ALTER TABLE chat_sessions ADD COLUMN started_at_local TEXT;
+    ALTER TABLE chat_sessions ADD COLUMN ended_at_local TEXT;
+    CREATE TABLE chat_subcategories (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        category_id INTEGER,
+        name TEXT,
+        description TEXT,
+        is_active BOOLEAN DEFAULT 1
+    );
+    CREATE TABLE chat_feedback (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id INTEGER,
+        user_id TEXT,
+        admin_user_id INTEGER,
+        overall_rating INTEGER,
+        support_quality INTEGER,
+        response_time INTEGER,
+        comments TEXT,
+        would_recommend BOOLEAN,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    );
+"""
+
+
+def create_chat_schema(db_path: str = "venturing.db"):
+    with open(os.path.join(BACKEND_DIR, "chat_schema.sql"), encoding="utf-8") as f:
+        schema = f.read()
+    conn = sqlite3.connect(db_path)
+    conn.executescript(schema + CHAT_SCHEMA_EXTRAS)
+    conn.close()
+
+
+create_chat_schema()
+
+# app.py imports the FAQ database first, so faqs gets its schema rather than sqlite_auth's older one
+import faq_database  # noqa: E402,F401
+from live_chat_api import init_agent_skills_table, init_chat_messages_table  # noqa: E402
+from schema_migrations import apply_migrations  # noqa: E402
+from sqlite_auth import db_auth  # noqa: E402
+from ticket_database import ticket_db  # noqa: E402
+
+db_auth.init_database()
+ticket_db.init_database()
+init_chat_messages_table()
+init_agent_skills_table()
+apply_migrations()
+
+
+def pytest_sessionfinish(session, exitstatus):
+    os.chdir(BACKEND_DIR)
+    shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def chat_db():
+    """The chat tables, emptied before each test"""
+    conn = sqlite3.connect("venturing.db")
+    conn.executescript("""
+        DELETE FROM chat_messages;
+        DELETE FROM chat_sessions;
+        DELETE FROM chat_requests;
+        DELETE FROM chat_agent_skills;
+    """)
+    conn.commit()
+    yield conn
+    conn.close()
@@ -0,0 +1,128 @@
+import asyncio
+import sqlite3
+import time
+
+import pytest
+from fastapi.security import HTTPAuthorizationCredentials
+
+from auth_principals import (PrincipalCache, invalidate_user, principal_cache, principal_from_claims, token_claims,
+                             token_key)
+from auth_router import verify_token
+from sqlite_auth import db_auth
+from user_repository import user_repository
+
+REQUESTS = 200
+
+USER = {
+    "id": 7,
+    "username": "claims_user",
+    "email": "claims_user@example.com",
+    "full_name": "Claims User",
+    "is_admin": False,
+    "is_active": True,
+    "user_type": "user",
+    "role_id": 2,
+    "role_name": "Support",
+}
+
+
+def issued(seconds_ago: float) -> dict:
+    claims = token_claims(USER)
+    claims["iat"] = int(time.time() - seconds_ago)
+    return claims
+
+
+def test_claims_round_trip():
+    assert principal_from_claims(token_claims(USER)) == USER
+
+
+def test_claims_are_trusted_only_while_fresh():
+    cache = PrincipalCache(claims_max_age=30)
+    cache.started_at = time.time() - 3600
+
+    assert cache.trusts_claims(issued(5))
+    assert not cache.trusts_claims(issued(31))
+
+
+def test_claims_are_not_trusted_after_a_change_in_this_process():
+    cache = PrincipalCache()
+    cache.started_at = time.time() - 3600
+    payload = issued(5)
+
+    cache.invalidate(USER["username"])
+
+    assert not cache.trusts_claims(payload)
+
+
+def test_principal_from_claims_expires_with_the_claims():
+    cache = PrincipalCache(ttl=30, claims_max_age=30)
+    payload = issued(29)
+
+    cache.put("claims-token", principal_from_claims(payload), payload, from_claims=True)
+    cache.put("database-token", USER, payload)
+
+    assert cache.principals[token_key("claims-token")][0] <= payload["iat"] + 30
+    assert cache.principals[token_key("database-token")][0] > time.time() + 29
+
+
+class CountingLookups:
+    """Stands in for user_repository.get_identity and counts database lookups"""
+
+    def __init__(self, get_identity):
+        self.get_identity = get_identity
+        self.calls = 0
+
+    def __call__(self, username):
+        self.calls += 1
+        return self.get_identity(username)
+
+
+@pytest.fixture
+def lookups(monkeypatch):
+    counting = CountingLookups(user_repository.get_identity)
+    monkeypatch.setattr(user_repository, "get_identity", counting)
+    monkeypatch.setattr(principal_cache, "started_at", time.time() - 3600)
+    return counting
+
+
+def verify(token: str) -> dict:
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    return asyncio.run(verify_token(credentials))["user"]
+
+
+def admin_token(username: str, seconds_ago: float = 0) -> str:
+    db_auth.create_user(username, "password123", f"{username}@example.com", "Token Admin", is_admin=True)
+    claims = token_claims(user_repository.get_identity.get_identity(username))
+    claims["iat"] = int(time.time() - seconds_ago)
+    return db_auth.create_access_token(claims)
+
+
+def test_fresh_tokens_are_verified_without_the_database(lookups):
+    token = admin_token("verify_fresh_admin")
+
+    for _ in range(REQUESTS):
+        assert verify(token)["full_name"] == "Token Admin"
+
+    assert lookups.calls == 0
+
+
+def test_older_tokens_are_looked_up_once_then_cached(lookups):
+    token = admin_token("verify_old_admin", seconds_ago=120)
+
+    for _ in range(REQUESTS):
+        assert verify(token)["username"] == "verify_old_admin"
+
+    assert lookups.calls == 1
+
+
+def test_profile_changes_reach_cached_tokens(lookups):
+    token = admin_token("verify_renamed_admin")
+    verify(token)
+    conn = sqlite3.connect("venturing.db")
+    conn.execute("UPDATE users SET full_name = 'Renamed Admin' WHERE username = 'verify_renamed_admin'")
+    conn.commit()
+    conn.close()
+    invalidate_user("verify_renamed_admin")
+
+    assert verify(token)["full_name"] == "Renamed Admin"
+    assert lookups.calls == 1
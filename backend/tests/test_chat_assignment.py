@@ -0,0 +1,100 @@
+import asyncio
+
+from chat_assignment import AgentAssignmentEngine, assignment_engine
+import live_chat_api
+from live_chat_api import ChatRequestCreate, create_chat_request
+
+
+def test_pick_reserves_the_chosen_agent():
+    engine = AgentAssignmentEngine(max_sessions_per_agent=2)
+    engine.agent_online("1", [])
+    engine.agent_online("2", [])
+
+    picked = [engine.pick(None) for _ in range(5)]
+
+    assert sorted(picked[:4]) == ["1", "1", "2", "2"]
+    assert picked[4] is None
+    assert engine.load == {"1": 2, "2": 2}
+
+
+def test_release_returns_a_reserved_slot():
+    engine = AgentAssignmentEngine(max_sessions_per_agent=1)
+    engine.agent_online("1", [3])
+
+    assert engine.pick(3) == "1"
+    assert engine.pick(3) is None
+    engine.release("1")
+    assert engine.reserve("1", 3)
+    assert not engine.reserve("1", 4)
+
+
+def test_specialists_are_preferred_and_skills_respected():
+    engine = AgentAssignmentEngine(max_sessions_per_agent=2)
+    engine.agent_online("specialist", [3])
+    engine.agent_online("generalist", [])
+
+    assert engine.pick(3) == "specialist"
+    assert engine.pick(5) == "generalist"
+    assert engine.pick(5) == "generalist"
+    assert engine.pick(5) is None  # the specialist can't take category 5 and the generalist is full
+    assert engine.pick(3) == "specialist"
+    assert engine.pick(3) is None
+
+
+def test_least_loaded_agent_is_picked():
+    engine = AgentAssignmentEngine(max_sessions_per_agent=3)
+    engine.agent_online("busy", [], active_sessions=2)
+    engine.agent_online("idle", [])
+
+    assert engine.pick(None) == "idle"
+    assert engine.pick(None) == "idle"
+    engine.session_ended("busy")
+    assert engine.pick(None) == "busy"
+
+
+def test_offline_agents_are_not_picked():
+    engine = AgentAssignmentEngine()
+    engine.agent_online("1", [])
+    engine.agent_offline("1")
+
+    assert engine.pick(None) is None
+    engine.session_started("1")  # late events for an offline agent are ignored
+    assert not engine.is_online("1")
+
+
+def test_load_stays_balanced_until_every_agent_is_full():
+    engine = AgentAssignmentEngine(max_sessions_per_agent=3)
+    agents = [str(i) for i in range(50)]
+    for agent_id in agents:
+        engine.agent_online(agent_id, [])
+
+    for _ in range(len(agents) * engine.max_sessions):
+        assert engine.pick(None) is not None
+        assert max(engine.load.values()) - min(engine.load.values()) <= 1
+    assert engine.pick(None) is None
+
+
+def test_concurrent_requests_spread_across_agents(chat_db, monkeypatch):
+    monkeypatch.setattr(live_chat_api, "AUTO_ASSIGN_CHATS", True)
+    for agent_id in ("1", "2"):
+        assignment_engine.agent_online(agent_id, [], 0, f"Agent {agent_id}")
+
+    async def burst():
+        return await asyncio.gather(*(
+            create_chat_request(ChatRequestCreate(user_email=f"visitor{i}@example.com", category_id=1))
+            for i in range(8)
+        ))
+
+    try:
+        results = asyncio.run(burst())
+    finally:
+        for agent_id in ("1", "2"):
+            assignment_engine.agent_offline(agent_id)
+
+    max_sessions = assignment_engine.max_sessions
+    assert sum(result["assigned"] for result in results) == 2 * max_sessions
+    active = dict(chat_db.execute("""
+        SELECT support_user_id, COUNT(*) FROM chat_sessions
+        WHERE status = 'active' GROUP BY support_user_id
+    """).fetchall())
+    assert active == {1: max_sessions, 2: max_sessions}
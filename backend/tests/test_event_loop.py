@@ -0,0 +1,98 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+import sqlite_pool
+from auth_principals import token_claims
+from db_executor import loop_lag_monitor
+from faq_database import faq_db
+from notification_stream import create_notification_routes, notification_generator, ticket_db
+from router_chat import router as chat_router
+from sqlite_auth import db_auth
+from user_repository import user_repository
+
+# Longer than the lag threshold, so one query run on the event loop fails the test
+SLOW_CHECKOUT_SECONDS = 0.25
+
+app = FastAPI()
+app.include_router(chat_router)
+create_notification_routes(app)
+
+
+@pytest.fixture
+def slow_database(monkeypatch):
+    """Every SQLite connection checkout sleeps first, like a database on a slow disk"""
+    pool = sqlite_pool.connection_pool
+    for name in ("connect", "shared_connection"):
+        original = getattr(pool, name)
+
+        def slow(*args, _original=original, **kwargs):
+            time.sleep(SLOW_CHECKOUT_SECONDS)
+            return _original(*args, **kwargs)
+
+        monkeypatch.setattr(pool, name, slow)
+
+
+@pytest.fixture
+def admin_token():
+    db_auth.create_user("loop_admin", "password123", "loop_admin@example.com", "Loop Admin", is_admin=True)
+    return db_auth.create_access_token(token_claims(user_repository.get_identity("loop_admin")))
+
+
+async def measure_loop_lag(calls) -> float:
+    """Run the calls in order with the lag monitor ticking, and return the worst lag seen"""
+    loop_lag_monitor.reset()
+    loop_lag_monitor.start()
+    await asyncio.sleep(loop_lag_monitor.interval)
+    try:
+        for call in calls:
+            await call()
+        await asyncio.sleep(loop_lag_monitor.interval * 2)
+    finally:
+        await loop_lag_monitor.stop()
+    return loop_lag_monitor.max_lag
+
+
+def test_routes_keep_the_event_loop_responsive(slow_database, admin_token, monkeypatch):
+    assert SLOW_CHECKOUT_SECONDS > loop_lag_monitor.threshold
+    # The first autocomplete request builds the index
+    monkeypatch.setattr(faq_db.autocomplete, "loaded", False)
+    faq_db.create_faq("How long does a website take to build?", "Usually four to six weeks.")
+    notification = ticket_db.create_notification("ticket", "New ticket", "A ticket was created")
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    statuses = []
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            def request(method, url, **kwargs):
+                async def call():
+                    response = await client.request(method, url, **kwargs)
+                    statuses.append((url, response.status_code))
+                return call
+
+            async def stream_backlog():
+                frames = notification_generator()
+                for _ in range(2):
+                    await frames.__anext__()
+                await frames.aclose()
+
+            return await measure_loop_lag([
+                request("GET", "/faq-suggestions"),
+                request("GET", "/faq-autocomplete", params={"prefix": "how long"}),
+                request("POST", "/chat", json={"query": "how long does a website take to build"}),
+                request("POST", "/chat", json={"query": "something nobody has asked about"}),
+                stream_backlog,
+                request("GET", "/user/notifications", headers=headers),
+                request("GET", "/user/notifications/count", headers=headers),
+                request("PUT", f"/admin/notifications/{notification['id']}/read", headers=headers),
+                request("DELETE", f"/admin/notifications/{notification['id']}", headers=headers),
+                request("POST", "/admin/notifications/clear", headers=headers),
+            ])
+
+    max_lag = asyncio.run(run())
+
+    assert all(status == 200 for _, status in statuses), statuses
+    assert max_lag < loop_lag_monitor.threshold, f"event loop blocked for {max_lag * 1000:.0f} ms"
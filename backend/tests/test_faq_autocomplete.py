@@ -0,0 +1,34 @@
+import sqlite3
+
+from faq_database import faq_db
+
+
+def suggested_ids(prefix: str):
+    return [suggestion["id"] for suggestion in faq_db.autocomplete_questions(prefix)]
+
+
+def test_updated_faq_is_reindexed():
+    faq = faq_db.create_faq("Do you build mobile apps?", "Yes, for iOS and Android.")
+    faq_id = f"faq_{faq['id']}"
+    faq_db.load_autocomplete()
+
+    faq_db.update_faq(faq_id, question="Do you build progressive web apps?")
+
+    assert faq_id in suggested_ids("progressive web")
+    assert faq_id not in suggested_ids("mobile apps")
+
+
+def test_updating_an_inactive_faq_drops_it_from_autocomplete():
+    faq = faq_db.create_faq("Can I pause my retainer?", "Yes, with a month's notice.")
+    faq_id = f"faq_{faq['id']}"
+    faq_db.load_autocomplete()
+    assert faq_id in suggested_ids("pause my retainer")
+
+    # Deactivated by another worker, so this process's index still has it
+    conn = sqlite3.connect("venturing.db")
+    conn.execute("UPDATE faqs SET is_active = 0 WHERE id = ?", (faq["id"],))
+    conn.commit()
+    conn.close()
+    faq_db.update_faq(faq_id, answer="Retainers can no longer be paused.")
+
+    assert faq_id not in suggested_ids("pause my retainer")
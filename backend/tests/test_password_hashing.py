@@ -0,0 +1,98 @@
+import asyncio
+import hashlib
+import sqlite3
+
+import httpx
+from fastapi import FastAPI
+from passlib.context import CryptContext
+
+from auth_router import router as auth_router
+from db_executor import loop_lag_monitor
+from password_hashing import BCRYPT_ROUNDS, hash_password, verify_password
+from sqlite_auth import db_auth
+from user_management_db import UserManagementDB
+
+LOGINS = 8
+
+app = FastAPI()
+app.include_router(auth_router)
+
+
+def stored_hash(db_path: str, username: str) -> str:
+    conn = sqlite3.connect(db_path)
+    row = conn.execute("SELECT password_hash FROM users WHERE username = ?", (username,)).fetchone()
+    conn.close()
+    return row[0]
+
+
+def set_stored_hash(db_path: str, username: str, password_hash: str):
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE users SET password_hash = ? WHERE username = ?", (password_hash, username))
+    conn.commit()
+    conn.close()
+
+
+def test_hashes_are_salted_bcrypt_at_the_configured_cost():
+    first, second = hash_password("secret"), hash_password("secret")
+
+    assert first != second
+    assert first.startswith("$2b$") and f"${BCRYPT_ROUNDS:02d}$" in first
+    assert verify_password("secret", first) == (True, None)
+    assert verify_password("wrong", first) == (False, None)
+
+
+def test_weaker_bcrypt_hashes_are_rehashed():
+    weak = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("secret")
+
+    matches, new_hash = verify_password("secret", weak)
+
+    assert matches
+    assert new_hash.startswith("$2b$") and f"${BCRYPT_ROUNDS:02d}$" in new_hash
+
+
+def test_legacy_admin_hash_is_upgraded_on_login():
+    db_auth.create_user("legacy_admin", "password123", "legacy_admin@example.com", "Legacy Admin", is_admin=True)
+    set_stored_hash("venturing.db", "legacy_admin", hashlib.sha256(b"password123").hexdigest())
+
+    assert db_auth.authenticate_user("legacy_admin", "wrong") is None
+    assert db_auth.authenticate_user("legacy_admin", "password123")
+
+    upgraded = stored_hash("venturing.db", "legacy_admin")
+    assert upgraded.startswith("$2b$")
+    assert db_auth.authenticate_user("legacy_admin", "password123")
+
+
+def test_legacy_salted_user_hash_is_upgraded_on_login(tmp_path):
+    db = UserManagementDB(str(tmp_path / "user_management.db"))
+    role = db.create_role("Legacy Role", "Role under test", [])
+    db.create_user("legacy_user", "legacy_user@example.com", "password123", "Legacy User", role["id"])
+    salted = hashlib.sha256(b"password123" + b"pepper").hexdigest()
+    set_stored_hash(db.db_path, "legacy_user", f"pepper:{salted}")
+
+    assert db.authenticate_user("legacy_user", "password123")
+    assert stored_hash(db.db_path, "legacy_user").startswith("$2b$")
+
+
+def test_login_storm_keeps_the_event_loop_responsive():
+    for i in range(LOGINS):
+        db_auth.create_user(f"storm_admin_{i}", "password123", f"storm_admin_{i}@example.com", "Storm Admin", is_admin=True)
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            loop_lag_monitor.reset()
+            loop_lag_monitor.start()
+            try:
+                responses = await asyncio.gather(*(
+                    client.post("/auth/login", json={"username": f"storm_admin_{i}", "password": "password123"})
+                    for i in range(LOGINS)
+                ))
+                await asyncio.sleep(loop_lag_monitor.interval * 2)
+            finally:
+                await loop_lag_monitor.stop()
+            return responses
+
+    responses = asyncio.run(run())
+
+    assert [response.status_code for response in responses] == [200] * LOGINS
+    assert loop_lag_monitor.max_lag < loop_lag_monitor.threshold, \
+        f"event loop blocked for {loop_lag_monitor.max_lag * 1000:.0f} ms"
@@ -0,0 +1,72 @@
+import sqlite3
+import time
+
+import pytest
+
+import user_management_db
+from user_management_db import UserManagementDB
+
+
+@pytest.fixture
+def permissions_db(tmp_path):
+    """A user management database with one user whose role grants one permission"""
+    db = UserManagementDB(str(tmp_path / "user_management.db"))
+    permission = db.create_permission("test_reports", "Tests", "See test reports")
+    role = db.create_role("Test Role", "Role under test", [permission["id"]])
+    user = db.create_user("permission_user", "permission_user@example.com", "password123", "Permission User", role["id"])
+    return db, role["id"], user["id"]
+
+
+def revoke_outside_the_cache(db: UserManagementDB, role_id: int):
+    """Take the role's permissions away the way another worker would: straight in the database"""
+    conn = sqlite3.connect(db.db_path)
+    conn.execute("DELETE FROM role_permissions WHERE role_id = ?", (role_id,))
+    conn.commit()
+    conn.close()
+
+
+def test_invalidation_during_a_read_is_not_overwritten(permissions_db, monkeypatch):
+    db, role_id, user_id = permissions_db
+    db.invalidate_permissions()
+
+    class FetchedRows(list):
+        def fetchall(self):
+            return list(self)
+
+    class RevokingConnection:
+        """Revokes the permission once a role's row has been read, before the mask is cached"""
+
+        def __init__(self, conn):
+            self.conn = conn
+
+        def execute(self, sql, params=()):
+            cursor = self.conn.execute(sql, params)
+            if "role_permissions" in sql:
+                rows = cursor.fetchall()
+                revoke_outside_the_cache(db, role_id)
+                db.invalidate_permissions(role_id=role_id)
+                return FetchedRows(rows)
+            return cursor
+
+        def close(self):
+            self.conn.close()
+
+    connect_db = user_management_db.connect_db
+    monkeypatch.setattr(user_management_db, "connect_db",
+                        lambda *args, **kwargs: RevokingConnection(connect_db(*args, **kwargs)))
+    assert db.check_permission(user_id, "test_reports")  # read before the revoke landed
+    monkeypatch.setattr(user_management_db, "connect_db", connect_db)
+
+    assert not db.check_permission(user_id, "test_reports")
+
+
+def test_changes_from_other_workers_show_up_after_the_ttl(permissions_db):
+    db, role_id, user_id = permissions_db
+    db.permissions_ttl = 0.05
+    assert db.check_permission(user_id, "test_reports")
+
+    revoke_outside_the_cache(db, role_id)
+    assert db.check_permission(user_id, "test_reports")  # still cached
+
+    time.sleep(db.permissions_ttl)
+    assert not db.check_permission(user_id, "test_reports")
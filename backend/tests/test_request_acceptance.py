@@ -0,0 +1,62 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from live_chat_api import accept_request_atomically
+
+AGENTS = 16
+ROUNDS = 5
+
+
+def create_pending_request(chat_db, user_id: str) -> int:
+    cursor = chat_db.execute("""
+        INSERT INTO chat_requests (user_id, user_name, user_email, category_id, expires_at)
+        VALUES (?, 'Visitor', 'visitor@example.com', 1, datetime('now', '+10 minutes'))
+    """, (user_id,))
+    chat_db.commit()
+    return cursor.lastrowid
+
+
+def race(calls):
+    """Run the calls on their own threads, released together"""
+    start = threading.Barrier(len(calls))
+
+    def run(call):
+        start.wait()
+        return call()
+
+    with ThreadPoolExecutor(max_workers=len(calls)) as pool:
+        return list(pool.map(run, calls))
+
+
+def test_exactly_one_concurrent_accept_wins(chat_db):
+    for round_number in range(ROUNDS):
+        request_id = create_pending_request(chat_db, f"visitor-{round_number}")
+
+        results = race([
+            lambda agent_id=agent_id: accept_request_atomically(request_id, agent_id)
+            for agent_id in range(1, AGENTS + 1)
+        ])
+
+        winners = [(agent_id, result) for agent_id, result in enumerate(results, 1) if result]
+        assert len(winners) == 1
+        agent_id, (request, session_id) = winners[0]
+        assert request["user_id"] == f"visitor-{round_number}"
+        assert chat_db.execute(
+            "SELECT status, assigned_to FROM chat_requests WHERE id = ?", (request_id,)
+        ).fetchone() == ("accepted", agent_id)
+        assert chat_db.execute(
+            "SELECT id, support_user_id FROM chat_sessions WHERE request_id = ?", (request_id,)
+        ).fetchall() == [(session_id, agent_id)]
+
+
+def test_expired_or_accepted_requests_are_not_accepted_again(chat_db):
+    request_id = create_pending_request(chat_db, "visitor-late")
+
+    assert accept_request_atomically(request_id, 1)
+    assert accept_request_atomically(request_id, 2) is None
+
+    expired_id = create_pending_request(chat_db, "visitor-expired")
+    chat_db.execute("UPDATE chat_requests SET expires_at = datetime('now', '-1 minute') WHERE id = ?", (expired_id,))
+    chat_db.commit()
+    assert accept_request_atomically(expired_id, 1) is None
+    assert chat_db.execute("SELECT COUNT(*) FROM chat_sessions").fetchone() == (1,)
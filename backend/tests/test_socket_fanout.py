@@ -0,0 +1,126 @@
+import asyncio
+import time
+
+import live_chat_api
+from live_chat_api import ConnectionManager
+
+AGENTS = 500
+BROADCASTS = 100
+
+
+class FakeSocket:
+    def __init__(self):
+        self.received = []
+        self.close_code = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message: str):
+        self.received.append(message)
+
+    async def close(self, code: int = 1000):
+        self.close_code = code
+
+
+class StalledSocket(FakeSocket):
+    """A client that has stopped reading: sends never complete"""
+
+    async def send_text(self, message: str):
+        await asyncio.Event().wait()
+
+
+class FailingSocket(FakeSocket):
+    async def send_text(self, message: str):
+        raise ConnectionResetError("client went away")
+
+
+async def settle():
+    """Let the writer tasks drain their queues"""
+    for _ in range(5):
+        await asyncio.sleep(0)
+    await asyncio.sleep(0.01)
+
+
+def test_broadcast_reaches_healthy_agents_past_stalled_and_dead_ones():
+    async def run():
+        manager = ConnectionManager()
+        healthy = [FakeSocket() for _ in range(AGENTS)]
+        for agent_id, socket in enumerate(healthy):
+            await manager.connect(socket, str(agent_id), "support")
+        await manager.connect(StalledSocket(), "stalled", "support")
+        await manager.connect(FailingSocket(), "failing", "support")
+
+        started = time.perf_counter()
+        for i in range(BROADCASTS):
+            await manager.broadcast_to_support(f"message {i}")
+        enqueue_seconds = time.perf_counter() - started
+        await settle()
+        return manager, healthy, enqueue_seconds
+
+    manager, healthy, enqueue_seconds = asyncio.run(run())
+
+    expected = [f"message {i}" for i in range(BROADCASTS)]
+    assert all(socket.received == expected for socket in healthy)
+    assert "failing" not in manager.support_connections
+    # Enqueueing never waits on a socket, so a broadcast to every agent stays well under a millisecond each
+    assert enqueue_seconds / BROADCASTS < 0.01
+
+
+def test_slow_consumer_is_closed_when_its_queue_overflows(monkeypatch):
+    monkeypatch.setattr(live_chat_api, "SEND_QUEUE_SIZE", 3)
+    monkeypatch.setattr(live_chat_api, "SLOW_CONSUMER_POLICY", "close")
+
+    async def run():
+        manager = ConnectionManager()
+        stalled = StalledSocket()
+        await manager.connect(stalled, "stalled", "support")
+        for i in range(10):
+            await manager.broadcast_to_support(f"message {i}")
+        await settle()
+        return manager, stalled
+
+    manager, stalled = asyncio.run(run())
+
+    assert stalled.close_code == 1013
+    assert "stalled" not in manager.support_connections
+
+
+def test_slow_consumer_times_out(monkeypatch):
+    monkeypatch.setattr(live_chat_api, "SEND_TIMEOUT_SECONDS", 0.01)
+
+    async def run():
+        manager = ConnectionManager()
+        stalled = StalledSocket()
+        await manager.connect(stalled, "stalled", "support")
+        await manager.broadcast_to_support("message")
+        await asyncio.sleep(0.05)
+        await settle()
+        return manager, stalled
+
+    manager, stalled = asyncio.run(run())
+
+    assert stalled.close_code == 1013
+    assert "stalled" not in manager.support_connections
+
+
+def test_drop_oldest_policy_keeps_the_newest_messages(monkeypatch):
+    monkeypatch.setattr(live_chat_api, "SEND_QUEUE_SIZE", 3)
+    monkeypatch.setattr(live_chat_api, "SLOW_CONSUMER_POLICY", "drop_oldest")
+
+    async def run():
+        manager = ConnectionManager()
+        socket = FakeSocket()
+        await manager.connect(socket, "agent", "support")
+        # Queued before the writer gets a turn, so the queue overflows
+        for i in range(5):
+            await manager.broadcast_to_support(f"message {i}")
+        sender = manager.support_connections["agent"]
+        await settle()
+        return socket, sender
+
+    socket, sender = asyncio.run(run())
+
+    assert socket.received == ["message 2", "message 3", "message 4"]
+    assert sender.dropped == 2
+    assert not sender.closed
@@ -0,0 +1,115 @@
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from sqlite_pool import BUSY_TIMEOUT_MS, ConnectionPool
+
+QUERIES = 2000
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "pool.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+    conn.execute("INSERT INTO items (name) VALUES ('first')")
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_connections_are_tuned_and_in_wal_mode(db_path):
+    conn = ConnectionPool().connect(db_path)
+
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == BUSY_TIMEOUT_MS
+    assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+    conn.close()
+
+
+def test_closed_connections_are_reused_per_thread_and_mode(db_path):
+    pool = ConnectionPool()
+    writer = pool.connect(db_path)
+    writer.close()
+    reader = pool.connect(db_path, readonly=True)
+    reader.close()
+
+    assert pool.connect(db_path) is writer
+    assert pool.connect(db_path, readonly=True) is reader
+    with ThreadPoolExecutor(max_workers=1) as other_thread:
+        assert other_thread.submit(pool.connect, db_path).result() is not writer
+
+
+def test_close_rolls_back_uncommitted_work(db_path):
+    pool = ConnectionPool()
+    conn = pool.connect(db_path)
+    conn.execute("INSERT INTO items (name) VALUES ('uncommitted')")
+    conn.close()
+
+    conn = pool.connect(db_path)
+    assert conn.execute("SELECT name FROM items").fetchall() == [("first",)]
+    conn.close()
+
+
+def test_readers_are_read_only(db_path):
+    conn = ConnectionPool().connect(db_path, readonly=True)
+
+    with pytest.raises(sqlite3.OperationalError):
+        conn.execute("DELETE FROM items")
+    conn.close()
+
+
+def test_readers_are_not_blocked_by_a_writer(db_path):
+    pool = ConnectionPool()
+    writer = pool.connect(db_path)
+    writer.execute("BEGIN IMMEDIATE")
+    writer.execute("INSERT INTO items (name) VALUES ('in progress')")
+
+    def read():
+        conn = pool.connect(db_path, readonly=True)
+        started = time.perf_counter()
+        rows = conn.execute("SELECT name FROM items").fetchall()
+        conn.close()
+        return rows, time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=1) as other_thread:
+        rows, seconds = other_thread.submit(read).result()
+    writer.close()
+
+    assert rows == [("first",)]
+    assert seconds < 1
+
+
+def test_connection_closed_on_another_thread_is_discarded(db_path):
+    pool = ConnectionPool()
+    conn = pool.connect(db_path)
+    thread = threading.Thread(target=conn.close)
+    thread.start()
+    thread.join()
+
+    assert pool.connect(db_path) is not conn
+
+
+def test_pooled_connections_beat_connect_per_call(db_path):
+    pool = ConnectionPool()
+
+    def pooled():
+        conn = pool.connect(db_path, readonly=True)
+        conn.execute("SELECT name FROM items WHERE id = 1").fetchone()
+        conn.close()
+
+    def connect_per_call():
+        conn = sqlite3.connect(db_path)
+        conn.execute("SELECT name FROM items WHERE id = 1").fetchone()
+        conn.close()
+
+    def throughput(query) -> float:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=4) as workers:
+            list(workers.map(lambda _: query(), range(QUERIES)))
+        return QUERIES / (time.perf_counter() - started)
+
+    assert throughput(pooled) > throughput(connect_per_call)
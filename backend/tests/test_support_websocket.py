@@ -0,0 +1,47 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from auth_principals import token_claims
+from chat_assignment import assignment_engine
+from live_chat_api import router
+from sqlite_auth import db_auth
+from user_repository import user_repository
+
+app = FastAPI()
+app.include_router(router)
+
+
+def create_admin(username: str, full_name: str) -> dict:
+    db_auth.create_user(username, "password123", f"{username}@example.com", full_name, is_admin=True)
+    identity = user_repository.get_identity(username)
+    return {"id": identity["id"], "token": db_auth.create_access_token(token_claims(identity))}
+
+
+def test_support_socket_rejects_unauthenticated_handshakes(chat_db):
+    agent = create_admin("ws_admin_reject", "Reject Admin")
+    other = create_admin("ws_admin_other", "Other Admin")
+
+    with TestClient(app) as client:
+        for url in (
+            f"/chat/ws/support/{agent['id']}",
+            f"/chat/ws/support/{agent['id']}?token=not-a-token",
+            f"/chat/ws/support/{agent['id']}?token={other['token']}",
+        ):
+            with pytest.raises(WebSocketDisconnect) as closed:
+                with client.websocket_connect(url) as ws:
+                    ws.receive_text()
+            assert closed.value.code == 1008
+
+
+def test_admin_agent_is_named_from_their_principal(chat_db):
+    agent = create_admin("ws_admin_named", "Named Admin")
+    agent_id = str(agent["id"])
+
+    with TestClient(app) as client:
+        with client.websocket_connect(f"/chat/ws/support/{agent_id}?token={agent['token']}") as ws:
+            assert ws.receive_json()["type"] == "queue_snapshot"
+            assert assignment_engine.is_online(agent_id)
+            assert assignment_engine.names[agent_id] == "Named Admin"
+    assert not assignment_engine.is_online(agent_id)
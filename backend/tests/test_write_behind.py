@@ -0,0 +1,102 @@
+import sqlite3
+import time
+
+from conversation_store import ConversationStore, WriteBehindPersister
+from login_activity import LoginActivity
+from sqlite_auth import db_auth
+from user_repository import user_repository
+from write_behind import WriteBehind
+
+
+class Collector(WriteBehind):
+    def __init__(self, flush_interval: float = 60):
+        super().__init__("test-collector", flush_interval)
+        self.pending = []
+        self.written = []
+
+    def add(self, item, flush_now: bool = False):
+        with self._lock:
+            self.pending.append(item)
+        self._schedule(flush_now)
+
+    def _flush(self):
+        with self._lock:
+            items, self.pending = self.pending, []
+        self.written.extend(items)
+
+
+class FlakyStore(ConversationStore):
+    def __init__(self):
+        self.saved = {}
+        self.failures = 1
+
+    def save_sessions(self, sessions):
+        if self.failures:
+            self.failures -= 1
+            raise OSError("disk full")
+        self.saved.update(sessions)
+
+    def delete_sessions(self, session_ids):
+        for session_id in session_ids:
+            self.saved.pop(session_id, None)
+
+
+def wait_for(condition, timeout: float = 2.0) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_writes_wait_for_the_interval_unless_flushed_now():
+    collector = Collector()
+    collector.add("buffered")
+    time.sleep(0.05)
+    assert collector.written == []
+
+    collector.add("urgent", flush_now=True)
+    assert wait_for(lambda: collector.written == ["buffered", "urgent"])
+    collector.stop()
+
+
+def test_stop_flushes_the_rest_and_ends_the_thread():
+    collector = Collector()
+    collector.add("last")
+    thread = collector._thread
+
+    collector.stop()
+
+    assert collector.written == ["last"]
+    assert not thread.is_alive()
+    collector.add("after stop")
+    assert collector._thread is None
+
+
+def test_failed_flush_is_retried():
+    store = FlakyStore()
+    persister = WriteBehindPersister(store, lambda session_id: {"id": session_id}, flush_interval=60)
+    persister.mark_dirty("a")
+
+    persister.flush()
+    assert store.saved == {}
+    persister.stop()
+
+    assert store.saved == {"a": {"id": "a"}}
+
+
+def test_login_activity_writes_last_login_in_one_batch():
+    db_auth.create_user("batched_admin", "password123", "batched_admin@example.com", "Batched Admin", is_admin=True)
+    user_id = user_repository.get_identity("batched_admin")["id"]
+    activity = LoginActivity(flush_interval=60, max_pending=1)
+
+    activity.record_login("admin", user_id)
+    conn = sqlite3.connect("venturing.db")
+    try:
+        assert wait_for(lambda: conn.execute(
+            "SELECT last_login FROM users WHERE id = ?", (user_id,)
+        ).fetchone()[0] == activity.get_last_login("admin", user_id))
+    finally:
+        conn.close()
+        activity.stop()
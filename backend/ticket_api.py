@@ -3,6 +3,7 @@ from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 from ticket_database import ticket_db
 from notification_stream import broadcast_new_notification
+from db_executor import run_db
 
 router = APIRouter()
 
@@ -26,7 +27,8 @@ class TicketResponse(BaseModel):
 async def create_ticket(ticket_data: TicketCreate):
     """Create a new support ticket"""
     try:
-        new_ticket = ticket_db.create_ticket(
+        new_ticket = await run_db(
+            ticket_db.create_ticket,
             first_name=ticket_data.first_name,
             last_name=ticket_data.last_name,
             email=ticket_data.email,
@@ -62,12 +64,12 @@ async def create_ticket(ticket_data: TicketCreate):
 async def get_ticket(token: str):
     """Get ticket details by token"""
     try:
-        ticket = ticket_db.get_ticket_by_token(token)
+        ticket = await run_db(ticket_db.get_ticket_by_token, token)
         if not ticket:
             raise HTTPException(status_code=404, detail="Ticket not found")
         
         # Get responses for this ticket
-        responses = ticket_db.get_ticket_responses(token)
+        responses = await run_db(ticket_db.get_ticket_responses, token)
         
         return {
             "success": True,
@@ -83,7 +85,7 @@ async def get_ticket(token: str):
 async def get_all_tickets():
     """Get all tickets (for admin)"""
     try:
-        tickets = ticket_db.get_all_tickets()
+        tickets = await run_db(ticket_db.get_all_tickets)
         return tickets
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to retrieve tickets: {str(e)}")
@@ -96,7 +98,7 @@ class TicketStatusUpdate(BaseModel):
 async def update_ticket_status(token: str, update_data: TicketStatusUpdate):
     """Update ticket status (for admin)"""
     try:
-        success = ticket_db.update_ticket_status(token, update_data.status, update_data.admin_notes)
+        success = await run_db(ticket_db.update_ticket_status, token, update_data.status, update_data.admin_notes)
         if not success:
             raise HTTPException(status_code=404, detail="Ticket not found")
         
@@ -114,11 +116,11 @@ async def respond_to_ticket(token: str, response_text: str, response_by: str = "
     """Add response to ticket"""
     try:
         # Check if ticket exists
-        ticket = ticket_db.get_ticket_by_token(token)
+        ticket = await run_db(ticket_db.get_ticket_by_token, token)
         if not ticket:
             raise HTTPException(status_code=404, detail="Ticket not found")
         
-        success = ticket_db.add_ticket_response(token, response_text, response_by)
+        success = await run_db(ticket_db.add_ticket_response, token, response_text, response_by)
         if not success:
             raise HTTPException(status_code=500, detail="Failed to add response")
         
@@ -135,7 +137,7 @@ async def respond_to_ticket(token: str, response_text: str, response_by: str = "
 async def delete_ticket(token: str):
     """Delete a ticket (for admin)"""
     try:
-        success = ticket_db.delete_ticket(token)
+        success = await run_db(ticket_db.delete_ticket, token)
         if not success:
             raise HTTPException(status_code=404, detail="Ticket not found")
         
@@ -1,20 +1,17 @@
-import sqlite3
 import uuid
 from datetime import datetime
 from typing import Optional, Dict, Any, List
 import asyncio
+from sqlite_pool import shared_connection
 
 class TicketDatabase:
     def __init__(self, db_path: str = "venturing.db"):
         self.db_path = db_path
-        self.conn = None
         self.cursor = None
 
     def _get_db_connection(self):
-        if self.conn is None:
-            self.conn = sqlite3.connect(self.db_path)
-            self.conn.row_factory = sqlite3.Row
-        return self.conn
+        # One long-lived connection per thread rather than one shared across threads
+        return shared_connection(self.db_path)
 
     def init_database(self):
         """Initialize ticket database tables"""
@@ -208,6 +205,21 @@ class TicketDatabase:
             conn.commit()
             return cursor.rowcount > 0
 
+    def delete_notification(self, notification_id: int) -> bool:
+        """Delete a notification"""
+        with self._get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM notifications WHERE id = ?", (notification_id,))
+            conn.commit()
+            return cursor.rowcount > 0
+
+    def clear_notifications(self):
+        """Delete every notification"""
+        with self._get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM notifications")
+            conn.commit()
+
     def delete_ticket(self, token: str) -> bool:
         """Delete a ticket and its related data"""
         with self._get_db_connection() as conn:
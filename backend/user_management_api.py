@@ -1,12 +1,20 @@
 from fastapi import APIRouter, HTTPException, Depends, status, Header
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, EmailStr
 from typing import List, Optional
 import jwt
 from datetime import datetime, timedelta
 from user_management_db import user_db
 from sqlite_auth import db_auth
+from agent_directory import agent_directory
+from auth_principals import invalidate_user
+from password_hashing import run_hashing
+from login_activity import login_activity
+from auth_router import verify_token
+from db_executor import run_db
 
 router = APIRouter()
+security = HTTPBearer()
 
 # JWT Configuration
 import os
@@ -131,7 +139,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 @router.post("/login", response_model=TokenResponse)
 async def login(login_data: LoginRequest):
     """Authenticate user and return access token"""
-    user = user_db.authenticate_user(login_data.username, login_data.password)
+    user = await run_hashing(user_db.authenticate_user, login_data.username, login_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -183,7 +191,8 @@ async def create_user(user_data: UserCreate, current_user: dict = Depends(get_cu
     """Create new user (requires users_create permission)"""
     
     try:
-        user = user_db.create_user(
+        user = await run_hashing(
+            user_db.create_user,
             username=user_data.username,
             email=user_data.email,
             password=user_data.password,
@@ -220,6 +229,8 @@ async def update_user(user_id: int, user_data: UserUpdate, current_user: dict =
     
     success = user_db.update_user(user_id, **update_data)
     if success:
+        agent_directory.invalidate(user_id)
+        invalidate_user(existing_user["username"])
         updated_user = user_db.get_user_by_id(user_id)
         return {"message": "User updated successfully", "user": updated_user}
     else:
@@ -241,14 +252,15 @@ async def update_user_password(user_id: int, password_data: UserPasswordUpdate,
         )
     
     # Verify current password
-    if not user_db.verify_password(password_data.current_password, existing_user.get("password_hash", "")):
+    if not await run_hashing(user_db.verify_password, password_data.current_password, existing_user.get("password_hash", "")):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Current password is incorrect"
         )
     
-    success = user_db.update_user(user_id, password=password_data.new_password)
+    success = await run_hashing(user_db.update_user, user_id, password=password_data.new_password)
     if success:
+        invalidate_user(existing_user["username"])
         return {"message": "Password updated successfully"}
     else:
         raise HTTPException(
@@ -281,6 +293,8 @@ async def delete_user(user_id: int, current_user: dict = Depends(get_current_use
     
     success = user_db.delete_user(user_id)
     if success:
+        agent_directory.invalidate(user_id)
+        invalidate_user(user_to_delete["username"])
         return {"message": "User deleted successfully"}
     else:
         raise HTTPException(
@@ -368,3 +382,18 @@ async def get_my_permissions(current_user: dict = Depends(get_current_user)):
     """Get current user's permissions"""
     permissions = user_db.get_user_permissions(current_user["id"])
     return {"permissions": permissions}
+
+@router.get("/last-seen")
+async def get_last_seen(current_user: dict = Depends(get_current_user)):
+    """Last login or authenticated request per user, keyed "<user_type>:<user_id>", straight from memory"""
+    return {"last_seen": login_activity.get_last_seen()}
+
+@router.post("/me/permissions/check")
+async def check_my_permissions(permission_names: List[str], credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Check several permissions for the current user at once, e.g. to decide what the admin UI shows"""
+    # Resolve the caller across both user stores; the bitsets only cover user management users
+    principal = (await verify_token(credentials))["user"]
+    if principal.get("user_type") != "user":
+        # Admins from venturing.db have full access
+        return {"permissions": {name: True for name in permission_names}}
+    return {"permissions": await run_db(user_db.check_permissions, principal["id"], permission_names)}
@@ -1,17 +1,32 @@
 import sqlite3
-import hashlib
-import secrets
+import threading
+import time
 from datetime import datetime, timezone
-from typing import List, Dict, Optional, Tuple
+from typing import Iterable, List, Dict, Optional, Tuple
+from sqlite_pool import connect_db
+import password_hashing
+from login_activity import login_activity
+
+# Compiled permissions are re-read after this long, so changes made by other workers show up without a restart
+PERMISSIONS_TTL_SECONDS = 30
 
 class UserManagementDB:
-    def __init__(self, db_path: str = "user_management.db"):
+    def __init__(self, db_path: str = "user_management.db", permissions_ttl: float = PERMISSIONS_TTL_SECONDS):
         self.db_path = db_path
+        self.permissions_ttl = permissions_ttl
+        # Compiled permissions: each permission is a bit, each role a bitset of the permissions it grants.
+        # Entries are (loaded_at, value) and expire after permissions_ttl.
+        self.permission_bits: Optional[Tuple[float, Dict[str, int]]] = None  # permission name -> bit index
+        self.role_masks: Dict[int, Tuple[float, int]] = {}  # role_id -> bitset
+        self.user_roles: Dict[int, Tuple[float, Optional[int]]] = {}  # user_id -> role_id, None for inactive users
+        # Bumped by invalidate_permissions; values read from the database before a bump are not cached
+        self.permissions_generation = 0
+        self.permissions_lock = threading.Lock()
         self.init_database()
 
     def init_database(self):
         """Initialize the user management database with tables for users, roles, and permissions"""
-        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn = connect_db(self.db_path)
         cursor = conn.cursor()
 
         # Create users table
@@ -88,7 +103,7 @@ class UserManagementDB:
 
     def _initialize_default_data(self):
         """Initialize default roles and permissions"""
-        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn = connect_db(self.db_path)
         cursor = conn.cursor()
 
         # Check if data already exists
@@ -230,24 +245,19 @@ class UserManagementDB:
 
         conn.commit()
         conn.close()
+        self.invalidate_permissions()
 
     def hash_password(self, password: str) -> str:
-        """Hash password using SHA-256 with salt"""
-        salt = secrets.token_hex(16)
-        password_hash = hashlib.sha256((password + salt).encode()).hexdigest()
-        return f"{salt}:{password_hash}"
+        """Hash password using bcrypt"""
+        return password_hashing.hash_password(password)
 
     def verify_password(self, password: str, stored_hash: str) -> bool:
-        """Verify password against stored hash"""
-        try:
-            salt, hash_value = stored_hash.split(':')
-            return hashlib.sha256((password + salt).encode()).hexdigest() == hash_value
-        except:
-            return False
+        """Verify password against a bcrypt or legacy salted SHA-256 hash"""
+        return password_hashing.verify_password(password, stored_hash)[0]
 
     def create_user(self, username: str, email: str, password: str, full_name: str, role_id: int) -> Dict:
         """Create a new user"""
-        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn = connect_db(self.db_path)
         cursor = conn.cursor()
 
         try:
@@ -281,7 +291,7 @@ class UserManagementDB:
 
     def authenticate_user(self, username: str, password: str) -> Optional[Dict]:
         """Authenticate user and return user data"""
-        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn = connect_db(self.db_path)
         cursor = conn.cursor()
 
         cursor.execute('''
@@ -292,9 +302,18 @@ class UserManagementDB:
         user = cursor.fetchone()
         conn.close()
 
-        if user and self.verify_password(password, user[3]):
+        if not user:
+            return None
+        matches, new_hash = password_hashing.verify_password(password, user[3])
+        if matches:
             # Update last login
             self.update_last_login(user[0])
+            if new_hash:
+                # Legacy or weaker hash: replace it now that we know the password
+                conn = connect_db(self.db_path)
+                conn.execute('UPDATE users SET password_hash = ? WHERE id = ?', (new_hash, user[0]))
+                conn.commit()
+                conn.close()
             return {
                 "id": user[0],
                 "username": user[1],
@@ -307,18 +326,12 @@ class UserManagementDB:
         return None
 
     def update_last_login(self, user_id: int):
-        """Update user's last login timestamp"""
-        conn = sqlite3.connect(self.db_path, check_same_thread=False)
-        cursor = conn.cursor()
-        cursor.execute('''
-            UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = ?
-        ''', (user_id,))
-        conn.commit()
-        conn.close()
+        """Update user's last login timestamp; written in batches by the login activity tracker"""
+        login_activity.record_login("user", user_id)
 
     def get_all_users(self) -> List[Dict]:
         """Get all users with their role information"""
-        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn = connect_db(self.db_path)
         cursor = conn.cursor()
 
         cursor.execute('''
@@ -339,7 +352,8 @@ class UserManagementDB:
                 "role_id": row[4],
                 "is_active": bool(row[5]),
                 "created_at": row[6],
-                "last_login": row[7],
+                # Logins since the last flush are only in memory so far
+                "last_login": login_activity.get_last_login("user", row[0]) or row[7],
                 "role_name": row[8]
             })
 
@@ -348,7 +362,7 @@ class UserManagementDB:
 
     def get_user_by_id(self, user_id: int) -> Optional[Dict]:
         """Get user by ID"""
-        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn = connect_db(self.db_path)
         cursor = conn.cursor()
 
         cursor.execute('''
@@ -371,14 +385,14 @@ class UserManagementDB:
                 "role_id": row[4],
                 "is_active": bool(row[5]),
                 "created_at": row[6],
-                "last_login": row[7],
+                "last_login": login_activity.get_last_login("user", row[0]) or row[7],
                 "role_name": row[8]
             }
         return None
 
     def update_user(self, user_id: int, **kwargs) -> bool:
         """Update user information"""
-        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn = connect_db(self.db_path)
         cursor = conn.cursor()
 
         try:
@@ -396,13 +410,15 @@ class UserManagementDB:
             ''', values)
 
             conn.commit()
+            if 'role_id' in kwargs or 'is_active' in kwargs:
+                self.invalidate_permissions(user_id=user_id)
             return cursor.rowcount > 0
         finally:
             conn.close()
 
     def delete_user(self, user_id: int) -> bool:
         """Delete user (soft delete by setting is_active = 0)"""
-        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn = connect_db(self.db_path)
         cursor = conn.cursor()
 
         cursor.execute('''
@@ -411,11 +427,12 @@ class UserManagementDB:
 
         conn.commit()
         conn.close()
+        self.invalidate_permissions(user_id=user_id)
         return cursor.rowcount > 0
 
     def get_all_roles(self) -> List[Dict]:
         """Get all roles"""
-        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn = connect_db(self.db_path)
         cursor = conn.cursor()
 
         cursor.execute('''
@@ -438,7 +455,7 @@ class UserManagementDB:
 
     def get_role_permissions(self, role_id: int) -> List[Dict]:
         """Get permissions for a specific role"""
-        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn = connect_db(self.db_path)
         cursor = conn.cursor()
 
         cursor.execute('''
@@ -463,7 +480,7 @@ class UserManagementDB:
 
     def get_user_permissions(self, user_id: int) -> List[Dict]:
         """Get permissions for a specific user based on their role"""
-        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn = connect_db(self.db_path)
         cursor = conn.cursor()
 
         cursor.execute('''
@@ -489,12 +506,90 @@ class UserManagementDB:
 
     def check_permission(self, user_id: int, permission_name: str) -> bool:
         """Check if user has specific permission"""
-        permissions = self.get_user_permissions(user_id)
-        return any(perm['name'] == permission_name for perm in permissions)
+        bit = self._permission_index().get(permission_name)
+        return bit is not None and bool(self.get_permission_mask(user_id) >> bit & 1)
+
+    def check_permissions(self, user_id: int, permission_names: Iterable[str]) -> Dict[str, bool]:
+        """Check many permissions for a user at once, e.g. to decide what the admin UI shows"""
+        index = self._permission_index()
+        mask = self.get_permission_mask(user_id)
+        return {
+            name: name in index and bool(mask >> index[name] & 1)
+            for name in permission_names
+        }
+
+    def get_permission_mask(self, user_id: int) -> int:
+        """Bitset of the permissions granted to a user through their role; 0 for inactive users"""
+        with self.permissions_lock:
+            entry = self._fresh(self.user_roles.get(user_id))
+            generation = self.permissions_generation
+        if entry:
+            role_id = entry[1]
+        else:
+            conn = connect_db(self.db_path, readonly=True)
+            row = conn.execute('SELECT role_id FROM users WHERE id = ? AND is_active = 1', (user_id,)).fetchone()
+            conn.close()
+            role_id = row[0] if row else None
+            with self.permissions_lock:
+                if generation == self.permissions_generation:
+                    self.user_roles[user_id] = (time.monotonic(), role_id)
+        return self._role_mask(role_id) if role_id is not None else 0
+
+    def invalidate_permissions(self, role_id: Optional[int] = None, user_id: Optional[int] = None):
+        """Forget a role's compiled permissions, a user's role, or everything when called without arguments"""
+        with self.permissions_lock:
+            self.permissions_generation += 1
+            if role_id is None and user_id is None:
+                self.permission_bits = None
+                self.role_masks.clear()
+                self.user_roles.clear()
+            if role_id is not None:
+                self.role_masks.pop(role_id, None)
+            if user_id is not None:
+                self.user_roles.pop(user_id, None)
+
+    def _fresh(self, entry: Optional[Tuple[float, object]]) -> Optional[Tuple[float, object]]:
+        """A cached (loaded_at, value) entry if it hasn't expired"""
+        if entry and time.monotonic() - entry[0] < self.permissions_ttl:
+            return entry
+        return None
+
+    def _permission_index(self) -> Dict[str, int]:
+        with self.permissions_lock:
+            entry = self._fresh(self.permission_bits)
+            generation = self.permissions_generation
+        if entry:
+            return entry[1]
+        conn = connect_db(self.db_path, readonly=True)
+        rows = conn.execute('SELECT id, name FROM permissions').fetchall()
+        conn.close()
+        # Permission IDs are small and stable, so they double as bit indexes
+        index = {name: permission_id for permission_id, name in rows}
+        with self.permissions_lock:
+            if generation == self.permissions_generation:
+                self.permission_bits = (time.monotonic(), index)
+        return index
+
+    def _role_mask(self, role_id: int) -> int:
+        with self.permissions_lock:
+            entry = self._fresh(self.role_masks.get(role_id))
+            generation = self.permissions_generation
+        if entry:
+            return entry[1]
+        conn = connect_db(self.db_path, readonly=True)
+        rows = conn.execute('SELECT permission_id FROM role_permissions WHERE role_id = ?', (role_id,)).fetchall()
+        conn.close()
+        mask = 0
+        for (permission_id,) in rows:
+            mask |= 1 << permission_id
+        with self.permissions_lock:
+            if generation == self.permissions_generation:
+                self.role_masks[role_id] = (time.monotonic(), mask)
+        return mask
 
     def create_role(self, name: str, description: str, permission_ids: List[int]) -> Dict:
         """Create a new role with permissions"""
-        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn = connect_db(self.db_path)
         cursor = conn.cursor()
 
         try:
@@ -510,6 +605,7 @@ class UserManagementDB:
                 ''', (role_id, perm_id))
 
             conn.commit()
+            self.invalidate_permissions(role_id=role_id)
             return {
                 "id": role_id,
                 "name": name,
@@ -523,7 +619,7 @@ class UserManagementDB:
 
     def update_role_permissions(self, role_id: int, permission_ids: List[int]) -> bool:
         """Update permissions for a role"""
-        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn = connect_db(self.db_path)
         cursor = conn.cursor()
 
         try:
@@ -537,13 +633,53 @@ class UserManagementDB:
                 ''', (role_id, perm_id))
 
             conn.commit()
+            self.invalidate_permissions(role_id=role_id)
             return True
         finally:
             conn.close()
 
+    def create_permission(self, name: str, module: str, description: str) -> Dict:
+        """Create a new permission"""
+        conn = connect_db(self.db_path)
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute('''
+                INSERT INTO permissions (name, module, description) VALUES (?, ?, ?)
+            ''', (name, module, description))
+            permission_id = cursor.lastrowid
+            conn.commit()
+            # The name -> bit index is cached, so a new permission needs everything recompiled
+            self.invalidate_permissions()
+            return {
+                "id": permission_id,
+                "name": name,
+                "module": module,
+                "description": description
+            }
+        except sqlite3.IntegrityError:
+            raise ValueError("Permission name already exists")
+        finally:
+            conn.close()
+
+    def delete_permission(self, permission_id: int) -> bool:
+        """Delete a permission and take it away from every role"""
+        conn = connect_db(self.db_path)
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute('DELETE FROM role_permissions WHERE permission_id = ?', (permission_id,))
+            cursor.execute('DELETE FROM permissions WHERE id = ?', (permission_id,))
+            deleted = cursor.rowcount > 0
+            conn.commit()
+            self.invalidate_permissions()
+            return deleted
+        finally:
+            conn.close()
+
     def get_all_permissions(self) -> List[Dict]:
         """Get all available permissions grouped by module"""
-        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn = connect_db(self.db_path)
         cursor = conn.cursor()
 
         cursor.execute('''
@@ -566,7 +702,7 @@ class UserManagementDB:
 
     def get_role_by_id(self, role_id: int) -> Optional[Dict]:
         """Get role by ID"""
-        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn = connect_db(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -589,7 +725,7 @@ class UserManagementDB:
 
     def get_user_by_username(self, username: str) -> Optional[Dict]:
         """Get user by username"""
-        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn = connect_db(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -617,7 +753,7 @@ class UserManagementDB:
 
     def update_user_profile(self, user_id: int, full_name: str = None, email: str = None, username: str = None) -> Optional[Dict]:
         """Update user profile information"""
-        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn = connect_db(self.db_path)
         cursor = conn.cursor()
         
         try:
@@ -681,7 +817,7 @@ class UserManagementDB:
 
     def update_user_password(self, user_id: int, new_password: str) -> bool:
         """Update user password"""
-        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn = connect_db(self.db_path)
         cursor = conn.cursor()
         
         try:
@@ -703,7 +839,7 @@ class UserManagementDB:
 
     def update_user_profile_image(self, user_id: int, profile_image: str) -> bool:
         """Update user profile image"""
-        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn = connect_db(self.db_path)
         cursor = conn.cursor()
         
         try:
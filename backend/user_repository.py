@@ -0,0 +1,169 @@
+"""
+User Repository
+One lookup path for users in both stores: admins in venturing.db and managed users in user_management.db,
+resolved together through ATTACH DATABASE and kept in a short-lived identity cache
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from sqlite_pool import connection_pool
+
+MAIN_DB = "venturing.db"
+USER_MANAGEMENT_DB = "user_management.db"
+IDENTITY_TTL_SECONDS = 60
+MAX_IDENTITIES = 5000
+
+
+class UserRepository:
+    """Resolves usernames and user IDs across venturing.db and user_management.db
+
+    Each thread keeps one connection to venturing.db with user_management.db attached as "um",
+    so a lookup is a single query instead of a file open and a miss per store.
+    """
+
+    def __init__(self, main_db: str = MAIN_DB, user_management_db: str = USER_MANAGEMENT_DB,
+                 ttl: float = IDENTITY_TTL_SECONDS, max_entries: int = MAX_IDENTITIES):
+        self.main_db = main_db
+        self.user_management_db = user_management_db
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.identities: Dict[str, Tuple[float, Dict[str, Any]]] = {}  # username -> (fetched_at, identity)
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def get_identity(self, username: str) -> Optional[Dict[str, Any]]:
+        """Get the user behind a username as returned by /auth/verify; admins win over managed users"""
+        now = time.time()
+        with self.lock:
+            entry = self.identities.get(username)
+            if entry and now - entry[0] < self.ttl:
+                return dict(entry[1])
+
+        identity = self._fetch_identity(username)
+        # Unknown usernames aren't cached, so new accounts are found straight away
+        if identity is not None:
+            with self.lock:
+                if len(self.identities) >= self.max_entries:
+                    self.identities.clear()
+                self.identities[username] = (now, identity)
+            return dict(identity)
+        return None
+
+    def get_users_by_ids(self, user_ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+        """Get user management users by ID; missing IDs are left out"""
+        user_ids = list(user_ids)
+        users: Dict[int, Dict[str, Any]] = {}
+        if not user_ids:
+            return users
+        conn, has_managed_users = self._connection()
+        if not has_managed_users:
+            return users
+
+        # Stay under SQLite's bound parameter limit
+        for start in range(0, len(user_ids), 500):
+            batch = user_ids[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = conn.execute(f"""
+                SELECT u.id, u.username, u.email, u.full_name, u.role_id, u.is_active, r.name AS role_name
+                FROM um.users u
+                LEFT JOIN um.roles r ON u.role_id = r.id
+                WHERE u.id IN ({placeholders})
+            """, batch).fetchall()
+            for row in rows:
+                user = dict(row)
+                user["is_active"] = bool(user["is_active"])
+                users[row["id"]] = user
+        return users
+
+    def invalidate(self, username: Optional[str] = None):
+        """Forget one username after the user changes, or everyone"""
+        with self.lock:
+            if username is None:
+                self.identities.clear()
+            else:
+                self.identities.pop(username, None)
+
+    def _fetch_identity(self, username: str) -> Optional[Dict[str, Any]]:
+        conn, has_managed_users = self._connection()
+        sql, params = self.local.identity_sql, (username,)
+        if has_managed_users:
+            params = (username, username)
+        row = conn.execute(sql, params).fetchone()
+        if row is None:
+            return None
+
+        if row["source"] == "admin":
+            return {
+                "id": row["id"],
+                "username": row["username"],
+                "email": row["email"],
+                "full_name": row["full_name"],
+                "is_admin": row["is_admin"],
+                "is_active": row["is_active"],
+                "user_type": "admin",
+                "role_name": "Super Admin",
+                "profile_image": row["profile_image"]
+            }
+        return {
+            "id": row["id"],
+            "username": row["username"],
+            "email": row["email"],
+            "full_name": row["full_name"],
+            "is_admin": False,
+            "is_active": bool(row["is_active"]),
+            "user_type": "user",
+            "role_id": row["role_id"],
+            "role_name": row["role_name"] if row["role_id"] and row["role_name"] else "User",
+            "profile_image": row["profile_image"]
+        }
+
+    def _connection(self) -> Tuple[sqlite3.Connection, bool]:
+        """This thread's connection, and whether user_management.db's users table is reachable"""
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = self.local.conn = connection_pool.open(self.main_db)
+            conn.row_factory = sqlite3.Row
+            conn.execute("ATTACH DATABASE ? AS um", (self.user_management_db,))
+            self.local.has_managed_users = False
+
+        # The user management schema may be created after the first lookup; check until it exists
+        if not self.local.has_managed_users:
+            self.local.has_managed_users = self._has_table(conn, "um", "users") and self._has_table(conn, "um", "roles")
+            self.local.identity_sql = self._identity_sql(conn, self.local.has_managed_users)
+        return conn, self.local.has_managed_users
+
+    @staticmethod
+    def _has_table(conn: sqlite3.Connection, schema: str, table: str) -> bool:
+        return conn.execute(
+            f"SELECT 1 FROM {schema}.sqlite_master WHERE type = 'table' AND name = ?", (table,)
+        ).fetchone() is not None
+
+    @staticmethod
+    def _identity_sql(conn: sqlite3.Connection, has_managed_users: bool) -> str:
+        # Older venturing.db files predate the admin profile_image column
+        admin_columns = {row[1] for row in conn.execute("PRAGMA main.table_info(users)")}
+        admin_image = "profile_image" if "profile_image" in admin_columns else "NULL"
+        sql = f"""
+            SELECT 'admin' AS source, id, username, email, full_name, is_admin, is_active,
+                   {admin_image} AS profile_image, NULL AS role_id, NULL AS role_name
+            FROM main.users WHERE username = ?
+        """
+        if has_managed_users:
+            sql += """
+                UNION ALL
+                SELECT 'user' AS source, u.id, u.username, u.email, u.full_name, 0, u.is_active,
+                       u.profile_image, u.role_id, r.name
+                FROM um.users u
+                LEFT JOIN um.roles r ON u.role_id = r.id
+                WHERE u.username = ?
+            """
+        return sql + " ORDER BY source LIMIT 1"
+
+
+# Global user repository
+user_repository = UserRepository()
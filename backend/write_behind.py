@@ -0,0 +1,64 @@
+"""
+Write-Behind Flushing
+Background thread that periodically flushes work buffered in memory, for stores that coalesce writes
+"""
+
+from __future__ import annotations
+
+import atexit
+import threading
+from typing import Optional
+
+
+class WriteBehind:
+    """Flushes buffered writes from a daemon thread every flush_interval seconds, or sooner when asked
+
+    Subclasses buffer their pending work under self._lock, call _schedule() after adding to it,
+    and implement _flush() to take the pending work and write it, putting it back if the write fails.
+    """
+
+    def __init__(self, name: str, flush_interval: float):
+        self.name = name
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+
+    def flush(self):
+        """Write everything pending now"""
+        with self._flush_lock:
+            self._flush()
+
+    def _flush(self):
+        raise NotImplementedError
+
+    def stop(self):
+        """Stop the background thread and flush whatever is still pending"""
+        self._stopping = True
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+
+    def _schedule(self, flush_now: bool = False):
+        """Make sure the thread is running; flush_now wakes it instead of waiting for the interval"""
+        self._ensure_started()
+        if flush_now:
+            self._wakeup.set()
+
+    def _ensure_started(self):
+        if self._thread is None and not self._stopping:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                    self._thread.start()
+                    atexit.register(self.flush)
+
+    def _run(self):
+        while not self._stopping:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
@@ -356,7 +356,8 @@ const ChatWidget: React.FC = () => {
           'Content-Type': 'application/json',
         },
         body: JSON.stringify({
-          query: userInput
+          query: userInput,
+          session_id: localStorage.getItem('vd_chat_session') || undefined
         })
       })
 
@@ -365,6 +366,9 @@ const ChatWidget: React.FC = () => {
       }
 
       const data = await response.json()
+      if (data.session_id) {
+        localStorage.setItem('vd_chat_session', data.session_id)
+      }
       
       const assistantMessage: Message = {
         id: (Date.now() + 1).toString(),
@@ -37,9 +37,21 @@ const LiveChatQueue: React.FC = () => {
   const [showFeedbackStats, setShowFeedbackStats] = useState(false);
   const [totalSessions, setTotalSessions] = useState(0);
   const [allSessions, setAllSessions] = useState<any[]>([]);
+  const [sessionsCursor, setSessionsCursor] = useState<{ before: string; before_id: number } | null>(null);
   const [rejectedRequests, setRejectedRequests] = useState<any[]>([]);
   const [showRejectedRequests, setShowRejectedRequests] = useState(false);
   const messagesEndRef = useRef<HTMLDivElement>(null);
+  // True once the support WebSocket has sent a queue snapshot; pending requests then arrive as pushes
+  const queueLiveRef = useRef(false);
+  // True once "Load more sessions" has fetched older pages; polling then only refreshes the newest page
+  const sessionsPagedRef = useRef(false);
+  const [hasEarlierMessages, setHasEarlierMessages] = useState(false);
+  // Highest server message ID loaded for the open session; a reconnect fetches everything after it
+  const newestIdRef = useRef(0);
+  // True while older messages are being prepended, so the view doesn't jump to the bottom
+  const prependingRef = useRef(false);
+  // True once the support WebSocket has connected; any later connection is a reconnect
+  const hadSocketRef = useRef(false);
 
   // Helper: get admin token from localStorage (completely dynamic)
   const getAdminToken = () => {
@@ -81,7 +93,7 @@ const LiveChatQueue: React.FC = () => {
         const extractedAdminId = data.user.id || data.user.user_id;
         setAdminId(extractedAdminId);
 
-        const ws = new WebSocket(`ws://localhost:8000/chat/ws/support/${extractedAdminId}`);
+        const ws = new WebSocket(`ws://localhost:8000/chat/ws/support/${extractedAdminId}?token=${encodeURIComponent(token)}`);
         
         ws.onopen = () => {
           setWsConnection(ws);
@@ -96,14 +108,26 @@ const LiveChatQueue: React.FC = () => {
               message: data.message,
               message_type: data.message_type || 'text',
               is_read: false,
-              created_at: new Date().toISOString()
+              created_at: new Date().toISOString(),
+              pending: true
             }]);
           } else if (data.type === 'request_canceled') {
             // Remove canceled request from pending requests
             setRequests(prev => prev.filter(req => req.id !== data.data.request_id));
+          } else if (data.type === 'queue_snapshot') {
+            queueLiveRef.current = true;
+            setRequests(data.data.requests || []);
+          } else if (data.type === 'queue_request_added') {
+            setRequests(prev => prev.some(req => req.id === data.data.id) ? prev : [...prev, data.data]);
+          } else if (data.type === 'queue_request_removed') {
+            setRequests(prev => prev.filter(req => req.id !== data.data.request_id));
+          } else if (data.type === 'chat_assigned') {
+            // A request was routed to this agent; pick up the new active session
+            fetchData();
           }
         };
         ws.onclose = () => {
+          queueLiveRef.current = false;
           setWsConnection(null);
         };
         ws.onerror = (error) => {
@@ -154,8 +178,21 @@ const LiveChatQueue: React.FC = () => {
     }
   }, [activeChatSession]);
 
+  // Catch up on messages missed while the WebSocket was down
+  useEffect(() => {
+    if (!wsConnection) return;
+    if (hadSocketRef.current && activeChatSession) {
+      loadMissedMessages();
+    }
+    hadSocketRef.current = true;
+  }, [wsConnection]);
+
   // Scroll to bottom when messages change
   useEffect(() => {
+    if (prependingRef.current) {
+      prependingRef.current = false;
+      return;
+    }
     scrollToBottom();
   }, [messages]);
 
@@ -188,7 +225,8 @@ const LiveChatQueue: React.FC = () => {
       message: messageText,
       message_type: 'text',
       is_read: false,
-      created_at: new Date().toISOString()
+      created_at: new Date().toISOString(),
+      pending: true
     };
     
     setMessages(prev => [...prev, newMessageObj]);
@@ -241,26 +279,89 @@ const LiveChatQueue: React.FC = () => {
     }
   };
 
+  const fetchMessagesPage = (sessionId: number, params?: Record<string, string>) => {
+    const token = getAdminToken();
+    const query = params ? `?${new URLSearchParams(params)}` : '';
+    return fetch(`http://localhost:8000/chat/sessions/${sessionId}/messages${query}`, {
+      headers: {
+        'Authorization': `Bearer ${token}`
+      }
+    });
+  };
+
   const loadMessages = async () => {
     if (!activeChatSession) return;
     
     try {
-      const token = getAdminToken();
-      const response = await fetch(`http://localhost:8000/chat/sessions/${activeChatSession.id}/messages`, {
-        headers: {
-          'Authorization': `Bearer ${token}`
-        }
-      });
+      // Only the latest page; older messages load on demand
+      const response = await fetchMessagesPage(activeChatSession.id);
       
       if (response.ok) {
         const data = await response.json();
-        setMessages(data.messages || []);
+        const page = data.messages || [];
+        newestIdRef.current = page.length ? page[page.length - 1].id : 0;
+        setHasEarlierMessages(!!data.has_more);
+        setMessages(page);
       }
     } catch (error) {
       console.error('Error loading messages:', error);
     }
   };
 
+  const loadEarlierMessages = async () => {
+    const oldest = messages.find(message => !message.pending);
+    if (!activeChatSession || !oldest) return;
+    
+    try {
+      const response = await fetchMessagesPage(activeChatSession.id, { before_id: String(oldest.id) });
+      
+      if (response.ok) {
+        const data = await response.json();
+        prependingRef.current = true;
+        setMessages(prev => [...(data.messages || []), ...prev]);
+        setHasEarlierMessages(!!data.has_more);
+      }
+    } catch (error) {
+      console.error('Error loading earlier messages:', error);
+    }
+  };
+
+  // After a reconnect, fetch only what was written since the newest message we have
+  const loadMissedMessages = async () => {
+    if (!activeChatSession) return;
+    
+    try {
+      const missed: any[] = [];
+      let hasMore = true;
+      while (hasMore) {
+        const afterId = missed.length ? missed[missed.length - 1].id : newestIdRef.current;
+        const response = await fetchMessagesPage(activeChatSession.id, { after_id: String(afterId) });
+        if (!response.ok) return;
+        const data = await response.json();
+        missed.push(...(data.messages || []));
+        hasMore = !!data.has_more && (data.messages || []).length > 0;
+      }
+      if (!missed.length) return;
+      newestIdRef.current = missed[missed.length - 1].id;
+      setMessages(prev => {
+        // Stored copies replace the pending ones they confirm
+        const unconfirmed = [...missed];
+        const kept = prev.filter(message => {
+          if (!message.pending) return true;
+          const match = unconfirmed.findIndex(stored =>
+            stored.sender_type === message.sender_type && stored.message === message.message
+          );
+          if (match === -1) return true;
+          unconfirmed.splice(match, 1);
+          return false;
+        });
+        return [...kept.filter(message => !message.pending), ...missed, ...kept.filter(message => message.pending)];
+      });
+    } catch (error) {
+      console.error('Error loading missed messages:', error);
+    }
+  };
+
   const fetchFeedbackStats = async () => {
     try {
       const token = getAdminToken();
@@ -283,16 +384,18 @@ const LiveChatQueue: React.FC = () => {
     try {
       const token = getAdminToken();
       
-      // Fetch pending requests
-      const requestsResponse = await fetch('http://localhost:8000/chat/requests', {
-        headers: {
-          'Authorization': `Bearer ${token}`
+      // Fetch pending requests, unless the WebSocket is already pushing queue updates
+      if (!queueLiveRef.current) {
+        const requestsResponse = await fetch('http://localhost:8000/chat/requests', {
+          headers: {
+            'Authorization': `Bearer ${token}`
+          }
+        });
+        
+        if (requestsResponse.ok) {
+          const requestsData = await requestsResponse.json();
+          setRequests(requestsData.requests);
         }
-      });
-      
-      if (requestsResponse.ok) {
-        const requestsData = await requestsResponse.json();
-        setRequests(requestsData.requests);
       }
   
       // Fetch active sessions
@@ -331,7 +434,17 @@ const LiveChatQueue: React.FC = () => {
       
       if (allSessionsResponse.ok) {
         const allSessionsData = await allSessionsResponse.json();
-        setAllSessions(allSessionsData.sessions || []);
+        const headSessions: any[] = allSessionsData.sessions || [];
+        if (sessionsPagedRef.current) {
+          // Older pages are loaded: refresh the newest page in place and keep them, and the cursor, as they are
+          setAllSessions(prev => {
+            const headIds = new Set(headSessions.map(session => session.id));
+            return [...headSessions, ...prev.filter(session => !headIds.has(session.id))];
+          });
+        } else {
+          setAllSessions(headSessions);
+          setSessionsCursor(allSessionsData.next_cursor || null);
+        }
       }
 
       // Fetch rejected requests
@@ -355,6 +468,31 @@ const LiveChatQueue: React.FC = () => {
     }
   };
 
+  const loadMoreSessions = async () => {
+    if (!sessionsCursor) return;
+    try {
+      const token = getAdminToken();
+      const params = new URLSearchParams({
+        before: sessionsCursor.before,
+        before_id: String(sessionsCursor.before_id)
+      });
+      const response = await fetch(`http://localhost:8000/chat/sessions/all?${params}`, {
+        headers: {
+          'Authorization': `Bearer ${token}`
+        }
+      });
+      
+      if (response.ok) {
+        const data = await response.json();
+        sessionsPagedRef.current = true;
+        setAllSessions(prev => [...prev, ...(data.sessions || [])]);
+        setSessionsCursor(data.next_cursor || null);
+      }
+    } catch (error) {
+      console.error('Error loading more sessions:', error);
+    }
+  };
+
   const handleAcceptRequest = async (requestId: number) => {
     try {
       const token = getAdminToken();
@@ -712,7 +850,7 @@ const LiveChatQueue: React.FC = () => {
       {/* All Sessions */}
       <div style={{ marginTop: '32px' }}>
         <h3 style={{ fontSize: '18px', fontWeight: '600', marginBottom: '16px', color: '#374151' }}>
-          All Sessions ({allSessions.length})
+          All Sessions ({Math.max(totalSessions, allSessions.length)})
         </h3>
         
         {allSessions.length === 0 ? (
@@ -774,6 +912,23 @@ const LiveChatQueue: React.FC = () => {
                 </div>
               </div>
             ))}
+            {sessionsCursor && (
+              <button
+                onClick={loadMoreSessions}
+                style={{
+                  padding: '10px',
+                  backgroundColor: '#f3f4f6',
+                  color: '#374151',
+                  border: '1px solid #e5e7eb',
+                  borderRadius: '8px',
+                  cursor: 'pointer',
+                  fontSize: '14px',
+                  fontWeight: '500'
+                }}
+              >
+                Load more sessions
+              </button>
+            )}
           </div>
         )}
       </div>
@@ -863,6 +1018,25 @@ const LiveChatQueue: React.FC = () => {
               overflowY: 'auto',
               backgroundColor: '#f9fafb'
             }}>
+              {hasEarlierMessages && (
+                <div style={{ textAlign: 'center', marginBottom: '15px' }}>
+                  <button
+                    onClick={loadEarlierMessages}
+                    style={{
+                      padding: '6px 14px',
+                      backgroundColor: '#f3f4f6',
+                      color: '#374151',
+                      border: '1px solid #e5e7eb',
+                      borderRadius: '8px',
+                      cursor: 'pointer',
+                      fontSize: '13px',
+                      fontWeight: '500'
+                    }}
+                  >
+                    Load earlier messages
+                  </button>
+                </div>
+              )}
               {messages.length === 0 ? (
                 <div style={{
                   textAlign: 'center',
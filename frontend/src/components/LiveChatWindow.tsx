@@ -9,6 +9,8 @@ interface ChatMessage {
   message_type: string;
   is_read: boolean;
   created_at: string;
+  // Shown from the WebSocket or sent from here, not yet confirmed by a fetch from the server
+  pending?: boolean;
 }
 
 interface LiveChatWindowProps {
@@ -34,7 +36,14 @@ const LiveChatWindow: React.FC<LiveChatWindowProps> = ({
   const [isTyping, setIsTyping] = useState(false);
   const [showFeedback, setShowFeedback] = useState(false);
   const [isChatEnded, setIsChatEnded] = useState(false);
+  const [hasEarlierMessages, setHasEarlierMessages] = useState(false);
   const messagesEndRef = useRef<HTMLDivElement>(null);
+  // Highest server message ID loaded so far; a reconnect fetches everything after it
+  const newestIdRef = useRef(0);
+  // True while older messages are being prepended, so the view doesn't jump to the bottom
+  const prependingRef = useRef(false);
+  // True once a WebSocket has been handed to us; any later one is a reconnect
+  const hadSocketRef = useRef(false);
 
   useEffect(() => {
     // Load existing messages
@@ -42,20 +51,91 @@ const LiveChatWindow: React.FC<LiveChatWindowProps> = ({
   }, [sessionId]);
 
   useEffect(() => {
+    if (prependingRef.current) {
+      prependingRef.current = false;
+      return;
+    }
     scrollToBottom();
   }, [messages]);
 
+  const messagesUrl = (params?: Record<string, string>) => {
+    const query = params ? `?${new URLSearchParams(params)}` : '';
+    return `http://localhost:8000/chat/sessions/${sessionId}/messages/public${query}`;
+  };
+
   const loadMessages = async () => {
     try {
-      const response = await fetch(`http://localhost:8000/chat/sessions/${sessionId}/messages/public`);
+      // Only the latest page; older messages load on demand
+      const response = await fetch(messagesUrl());
       const data = await response.json();
-      setMessages(data.messages || []);
+      const page: ChatMessage[] = data.messages || [];
+      newestIdRef.current = page.length ? page[page.length - 1].id : 0;
+      setHasEarlierMessages(!!data.has_more);
+      setMessages(page);
     } catch (error) {
       console.error('Error loading messages:', error);
       setMessages([]); // Set empty array to prevent undefined error
     }
   };
 
+  const loadEarlierMessages = async () => {
+    const oldest = messages.find(message => !message.pending);
+    if (!oldest) return;
+    try {
+      const response = await fetch(messagesUrl({ before_id: String(oldest.id) }));
+      if (response.ok) {
+        const data = await response.json();
+        prependingRef.current = true;
+        setMessages(prev => [...(data.messages || []), ...prev]);
+        setHasEarlierMessages(!!data.has_more);
+      }
+    } catch (error) {
+      console.error('Error loading earlier messages:', error);
+    }
+  };
+
+  // After a reconnect, fetch only what was written since the newest message we have
+  const loadMissedMessages = async () => {
+    try {
+      const missed: ChatMessage[] = [];
+      let hasMore = true;
+      while (hasMore) {
+        const afterId = missed.length ? missed[missed.length - 1].id : newestIdRef.current;
+        const response = await fetch(messagesUrl({ after_id: String(afterId) }));
+        if (!response.ok) return;
+        const data = await response.json();
+        missed.push(...(data.messages || []));
+        hasMore = !!data.has_more && (data.messages || []).length > 0;
+      }
+      if (!missed.length) return;
+      newestIdRef.current = missed[missed.length - 1].id;
+      setMessages(prev => {
+        // Stored copies replace the pending ones they confirm
+        const unconfirmed = [...missed];
+        const kept = prev.filter(message => {
+          if (!message.pending) return true;
+          const match = unconfirmed.findIndex(stored =>
+            stored.sender_type === message.sender_type && stored.message === message.message
+          );
+          if (match === -1) return true;
+          unconfirmed.splice(match, 1);
+          return false;
+        });
+        return [...kept.filter(message => !message.pending), ...missed, ...kept.filter(message => message.pending)];
+      });
+    } catch (error) {
+      console.error('Error loading missed messages:', error);
+    }
+  };
+
+  useEffect(() => {
+    if (!wsConnection) return;
+    if (hadSocketRef.current) {
+      loadMissedMessages();
+    }
+    hadSocketRef.current = true;
+  }, [wsConnection]);
+
   // Use the WebSocket connection from parent component
   useEffect(() => {
     if (wsConnection) {
@@ -70,7 +150,8 @@ const LiveChatWindow: React.FC<LiveChatWindowProps> = ({
             message: data.message,
             message_type: data.message_type || 'text',
             is_read: false,
-            created_at: new Date().toISOString()
+            created_at: new Date().toISOString(),
+            pending: true
           }]);
         } else if (data.type === 'typing') {
           setIsTyping(data.isTyping);
@@ -115,7 +196,8 @@ const LiveChatWindow: React.FC<LiveChatWindowProps> = ({
       message: messageText,
       message_type: 'text',
       is_read: false,
-      created_at: new Date().toISOString()
+      created_at: new Date().toISOString(),
+      pending: true
     };
     
     setMessages(prev => [...prev, newMessageObj]);
@@ -246,6 +328,24 @@ const LiveChatWindow: React.FC<LiveChatWindowProps> = ({
         overflowY: 'auto',
         backgroundColor: '#f9fafb'
       }}>
+        {hasEarlierMessages && (
+          <div style={{ textAlign: 'center', marginBottom: '12px' }}>
+            <button
+              onClick={loadEarlierMessages}
+              style={{
+                padding: '4px 12px',
+                backgroundColor: 'white',
+                color: '#374151',
+                border: '1px solid #e5e7eb',
+                borderRadius: '12px',
+                cursor: 'pointer',
+                fontSize: '12px'
+              }}
+            >
+              Load earlier messages
+            </button>
+          </div>
+        )}
         {(messages || []).map((message) => (
           <div
             key={message.id}